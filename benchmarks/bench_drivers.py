@@ -0,0 +1,159 @@
+"""
+Offline end-to-end benchmark of the driver ``read()`` paths.
+
+Upstream base URLs are pointed at a local stub server (``stub_server.py``)
+that replays the fixtures written by ``make_fixtures.py``, so runs are
+repeatable and need no network access. For every driver scenario the script
+reports the latency distribution of ``read()``, the requests and bytes
+served by the stub per read, and the allocations made during a read
+(tracemalloc peak and live blocks).
+
+The response cache is disabled unless ``--cache`` is given so every read
+exercises the full transport path.
+
+Usage::
+
+    python benchmarks/bench_drivers.py [--runs 10] [--drivers gauges,reaches] [--cache] [--json]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import make_fixtures as fixtures  # noqa: E402
+import stub_server  # noqa: E402
+
+UPSTREAM_HOSTS = [
+    "api.water.noaa.gov",
+    "maps.water.noaa.gov",
+    "mapservices.weather.noaa.gov",
+    "droughtmonitor.unl.edu",
+]
+
+
+def scenarios():
+    """``{name: factory}`` where each factory returns a fresh driver instance."""
+    from ciroh_plugins.drought.drought_map import DroughtMap
+    from ciroh_plugins.drought.drought_pie import DroughtDataGraph
+    from ciroh_plugins.drought.drought_plot import DroughtDataTimeSeries
+    from ciroh_plugins.drought.drought_table import DroughtDataTable
+    from ciroh_plugins.nwmps.gauges import NWMPSGaugesSeries
+    from ciroh_plugins.nwmps.reaches import NWMPSReachesSeries
+    from ciroh_plugins.nwmps.service import NWMPService
+
+    area = "-".join(fixtures.AREA)
+    return {
+        "gauges": lambda: NWMPSGaugesSeries(id=fixtures.GAUGE_ID),
+        "gauges_batch": lambda: NWMPSGaugesSeries(id=fixtures.BATCH_GAUGE_IDS),
+        "reaches": lambda: NWMPSReachesSeries(id=fixtures.REACH_ID),
+        "reaches_short_range": lambda: NWMPSReachesSeries(id=fixtures.REACH_ID, products="short_range"),
+        "service_gauges": lambda: NWMPService(f"{fixtures.RIV_GAUGES}/", fixtures.HUC_ID, 0),
+        "service_flows": lambda: NWMPService(f"{fixtures.NWM_FLOWS}/", fixtures.HUC_ID, 0),
+        "service_probability": lambda: NWMPService(f"{fixtures.NWM_PROB}/", fixtures.HUC_ID, 0),
+        "drought_map": lambda: DroughtMap(
+            fixtures.USDM_DATE,
+            "https://mapservices.weather.noaa.gov/raster/rest/services/obs/rfc_qpe/MapServer/",
+            **{"service.Layer": "1"},
+        ),
+        "drought_pie": lambda: DroughtDataGraph(area, fixtures.USDM_DATE),
+        "drought_table": lambda: DroughtDataTable(area, 1, "0"),
+        "drought_timeseries": lambda: DroughtDataTimeSeries(area, "usdm"),
+    }
+
+
+def use_fixture_boundary(directory):
+    """Serve the WBD boundary from the fixtures instead of the WBD service."""
+    from shapely.geometry import shape
+
+    from ciroh_plugins.nwmps import service
+
+    with open(os.path.join(directory, "huc_boundary.json")) as file:
+        geometry = shape(json.load(file)["geometry"])
+    service.get_huc_boundary = lambda huc_level, huc_id: geometry
+
+
+def measure(factory, server, runs):
+    factory().read()  # warm up imports, pools and the stub's layer indexes
+    latencies, requests, transferred, peaks, blocks = [], [], [], [], []
+    for _ in range(runs):
+        driver = factory()
+        server.reset_stats()
+        start = time.perf_counter()
+        driver.read()
+        latencies.append((time.perf_counter() - start) * 1000)
+        stats = server.snapshot()
+        requests.append(stats["requests"])
+        transferred.append(stats["bytes"])
+    for _ in range(max(1, runs // 5)):
+        driver = factory()
+        tracemalloc.start()
+        driver.read()
+        _, peak = tracemalloc.get_traced_memory()
+        blocks.append(sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename")))
+        tracemalloc.stop()
+        peaks.append(peak)
+    latencies.sort()
+    return {
+        "runs": runs,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[min(len(latencies) - 1, int(round(0.95 * (len(latencies) - 1))))],
+        "max_ms": latencies[-1],
+        "requests": statistics.median(requests),
+        "kb": statistics.median(transferred) / 1024,
+        "alloc_peak_mb": max(peaks) / 2**20,
+        "alloc_blocks": max(blocks),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--drivers", help="comma separated scenario names (default: all)")
+    parser.add_argument("--fixtures", default=fixtures.DEFAULT_FIXTURES)
+    parser.add_argument("--cache", action="store_true", help="keep the response cache enabled")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    options = parser.parse_args()
+
+    if not os.path.exists(os.path.join(options.fixtures, "huc_boundary.json")):
+        fixtures.generate(options.fixtures)
+    os.environ.setdefault("CIROH_PLUGINS_CACHE_DIR", tempfile.mkdtemp(prefix="ciroh-bench-"))
+    os.environ["HYRIVER_CACHE_DISABLE"] = "true"
+    if not options.cache:
+        os.environ["CIROH_PLUGINS_HTTP_CACHE"] = "0"
+
+    from ciroh_plugins.transport import set_upstream_overrides
+
+    server = stub_server.start(options.fixtures)
+    set_upstream_overrides(server.overrides(UPSTREAM_HOSTS))
+    use_fixture_boundary(options.fixtures)
+
+    available = scenarios()
+    names = options.drivers.split(",") if options.drivers else list(available)
+    results = {}
+    for name in names:
+        results[name] = measure(available[name], server, options.runs)
+        if not options.json:
+            r = results[name]
+            if len(results) == 1:
+                print(f"{'scenario':<22} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} "
+                      f"{'reqs':>5} {'KB':>9} {'peak MB':>8} {'blocks':>8}")
+            print(f"{name:<22} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['max_ms']:>8.1f} "
+                  f"{r['requests']:>5.0f} {r['kb']:>9.1f} {r['alloc_peak_mb']:>8.1f} {r['alloc_blocks']:>8}")
+    if options.json:
+        print(json.dumps(results, indent=2))
+    server.shutdown()
+    # async_retriever (used by pygeoogc) registers an atexit hook that can
+    # wait forever on its idle loop thread, so skip interpreter teardown.
+    sys.stdout.flush()
+    os._exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Cost of repeated refreshes of one gauge through the gauge store.
+
+Replays a sliding 30-day hourly window that gains one observation per
+refresh (the forecast is reissued every ``--reissue`` refreshes). For each
+refresh it times merging the decoded document into the store plus building
+the traces, and compares that with a store that keeps nothing, which
+rebuilds the whole series every time. Memory held by the store is reported
+at the end.
+
+Usage::
+
+    python benchmarks/bench_gauge_refresh.py [--refreshes 200] [--days 30]
+"""
+import argparse
+import copy
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from bench_gauge_traces import synthetic_stageflow  # noqa: E402
+
+
+def refreshes(days, count, reissue):
+    """Documents of successive refreshes: the window slides by one hour each time."""
+    full = synthetic_stageflow(days + count // 24 + 1)
+    observed = full["observed"]["data"]
+    hours = days * 24
+    documents = []
+    for i in range(count):
+        document = copy.deepcopy({name: {k: v for k, v in full[name].items() if k != "data"} for name in full})
+        document["observed"]["data"] = observed[i:i + hours]
+        document["forecast"]["data"] = full["forecast"]["data"]
+        document["forecast"]["issuedTime"] = f"issue-{i // reissue}"
+        documents.append(document)
+    return documents
+
+
+def measure(name, store, driver, documents):
+    times = []
+    for document in documents:
+        start = time.perf_counter()
+        series = store.update("BENCH1", document)
+        driver.create_traces(series)
+        times.append((time.perf_counter() - start) * 1000)
+    first, rest = times[:10], times[10:]
+    print(
+        f"{name:<10} first 10 p50 {statistics.median(first):6.2f} ms   "
+        f"later p50 {statistics.median(rest):6.2f} ms   max {max(rest):6.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--refreshes", type=int, default=200)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--reissue", type=int, default=6, help="refreshes between forecast issuances")
+    options = parser.parse_args()
+
+    from ciroh_plugins.nwmps.gauge_store import GaugeStore
+    from ciroh_plugins.nwmps.gauges import NWMPSGaugesSeries
+
+    documents = refreshes(options.days, options.refreshes, options.reissue)
+    driver = NWMPSGaugesSeries(id="BENCH1")
+    print(f"{options.refreshes} refreshes of a {options.days}-day hourly window")
+    measure("rebuild", GaugeStore(size=0), driver, documents)
+    store = GaugeStore(size=16)
+    measure("store", store, driver, documents)
+
+    tracemalloc.start()
+    store = GaugeStore(size=16)
+    held = []
+    for i, document in enumerate(documents):
+        store.update("BENCH1", document)
+        if i in (9, len(documents) - 1):
+            held.append(tracemalloc.get_traced_memory()[0])
+    tracemalloc.stop()
+    print(f"store memory after 10 refreshes {held[0] / 1024:7.1f} KB, after {len(documents)} {held[-1] / 1024:7.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
+    sys.stdout.flush()
+    os._exit(0)  # skip interpreter teardown, see bench_drivers.py
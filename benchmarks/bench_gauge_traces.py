@@ -0,0 +1,115 @@
+"""
+Micro-benchmark of gauge trace building on a synthetic 30-day hourly series.
+
+Compares the previous ``create_traces``, which parsed and reformatted every
+timestamp and built a hover string per point, with the current one, which
+passes the secondary values as ``customdata`` and formats hover labels in
+the browser through a single ``hovertemplate``. Reports the build time and
+the size of the serialized traces.
+
+Usage::
+
+    python benchmarks/bench_gauge_traces.py [--days 30] [--repeat 200]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+
+def synthetic_stageflow(days, missing_every=0):
+    """Hourly observed series over ``days`` plus a 7-day hourly forecast."""
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    def dataset(offset, hours):
+        points = []
+        for h in range(hours):
+            t = start + timedelta(hours=offset + h)
+            secondary = round(1.5 + 0.01 * (h % 240), 3)
+            if missing_every and h % missing_every == 0:
+                secondary = -999
+            points.append({
+                "validTime": t.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "generatedTime": t.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "primary": round(4.0 + 0.005 * (h % 480), 2),
+                "secondary": secondary,
+            })
+        return {
+            "primaryName": "Stage", "primaryUnits": "ft",
+            "secondaryName": "Flow", "secondaryUnits": "kcfs",
+            "data": points,
+        }
+
+    hours = days * 24
+    return {"observed": dataset(0, hours), "forecast": dataset(hours, 7 * 24)}
+
+
+def legacy_traces(data, name_prefix=""):
+    """``create_traces`` as it was: per-point strptime/strftime and hover text."""
+    traces = []
+    for dataset_name in ["observed", "forecast"]:
+        if dataset_name in data:
+            dataset = data[dataset_name]
+            data_points = dataset.get("data", [])
+            if data_points:
+                times = [d["validTime"] for d in data_points]
+                primary_values = [d.get("primary", None) for d in data_points]
+                secondary_values = [d.get("secondary", None) for d in data_points]
+                hover_text = []
+                for t, p, s in zip(times, primary_values, secondary_values):
+                    utc_time = datetime.strptime(t, "%Y-%m-%dT%H:%M:%SZ")
+                    formatted_time = utc_time.strftime("%a %B %d %Y %I:%M:%S %p")
+                    text = f"Time: {formatted_time}<br>{dataset.get('primaryUnits')}: {p}"
+                    if s is not None and s >= 0:
+                        text += f"<br>{dataset.get('secondaryUnits')}: {s}"
+                    hover_text.append(text)
+                traces.append({
+                    "x": times, "y": primary_values, "mode": "lines",
+                    "name": f"{name_prefix}{dataset_name.capitalize()}",
+                    "yaxis": "y1", "hoverinfo": "text", "text": hover_text,
+                })
+                traces.append({"x": times[0], "y": [0], "yaxis": "y2", "visible": False})
+    return traces
+
+
+def measure(name, build, data, repeat):
+    build(data)  # warm up (and import numpy)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        traces = build(data)
+        times.append((time.perf_counter() - start) * 1000)
+    size = len(json.dumps(traces))
+    print(
+        f"{name:<24} p50 {statistics.median(times):7.2f} ms   max {max(times):7.2f} ms   "
+        f"{size / 1024:7.1f} KB"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=200)
+    options = parser.parse_args()
+
+    from ciroh_plugins.nwmps.gauges import NWMPSGaugesSeries
+
+    driver = NWMPSGaugesSeries(id="BENCH1")
+    for label, missing_every in (("", 0), (" (missing flows)", 10)):
+        data = synthetic_stageflow(options.days, missing_every)
+        points = sum(len(data[name]["data"]) for name in data)
+        print(f"{options.days}-day hourly series, {points} points{label}")
+        measure("legacy", legacy_traces, data, options.repeat)
+        measure("hovertemplate", driver.create_traces, data, options.repeat)
+
+
+if __name__ == "__main__":
+    main()
+    sys.stdout.flush()
+    os._exit(0)  # skip interpreter teardown, see bench_drivers.py
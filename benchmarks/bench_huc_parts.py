@@ -0,0 +1,94 @@
+"""
+NWMPService feature statistics over a HUC made of many polygon parts.
+
+Cuts the fixture HUC into a grid of separate cells (like a coastal HUC made
+of dozens of islands) and reads its statistics from the full features,
+with the stub server adding ``--latency`` to every response. Each
+``max_concurrent_queries`` setting is timed; ``1`` queries the parts and
+pages one after the other like the original loop.
+
+Usage::
+
+    python benchmarks/bench_huc_parts.py [--grid 6] [--latency 0.1] [--concurrency 1,4,8]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import bench_drivers  # noqa: E402
+import make_fixtures as fixtures  # noqa: E402
+import stub_server  # noqa: E402
+
+
+def island_boundary(directory, grid):
+    """The fixture boundary cut into ``grid`` x ``grid`` cells with gaps between them."""
+    import json
+
+    from shapely.geometry import MultiPolygon, Polygon, box, shape
+
+    with open(os.path.join(directory, "huc_boundary.json")) as file:
+        boundary = shape(json.load(file)["geometry"])
+    minx, miny, maxx, maxy = boundary.bounds
+    width, height = (maxx - minx) / grid, (maxy - miny) / grid
+    parts = []
+    for i in range(grid):
+        for j in range(grid):
+            x, y = minx + i * width, miny + j * height
+            cell = boundary.intersection(box(x, y, x + width * 0.95, y + height * 0.95))
+            parts.extend(p for p in getattr(cell, "geoms", [cell]) if isinstance(p, Polygon) and not p.is_empty)
+    return MultiPolygon(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--grid", type=int, default=6)
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds added to every response")
+    parser.add_argument("--concurrency", default="1,4,8")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--fixtures", default=fixtures.DEFAULT_FIXTURES)
+    options = parser.parse_args()
+
+    if not os.path.exists(os.path.join(options.fixtures, "huc_boundary.json")):
+        fixtures.generate(options.fixtures)
+    os.environ.setdefault("CIROH_PLUGINS_CACHE_DIR", tempfile.mkdtemp(prefix="ciroh-bench-"))
+    os.environ["CIROH_PLUGINS_HTTP_CACHE"] = "0"
+    os.environ.setdefault("HYRIVER_CACHE_DISABLE", "true")
+
+    from ciroh_plugins.nwmps import service
+    from ciroh_plugins.transport import set_upstream_overrides
+
+    server = stub_server.start(options.fixtures, latency=options.latency)
+    set_upstream_overrides(server.overrides(bench_drivers.UPSTREAM_HOSTS))
+    geometry = island_boundary(options.fixtures, options.grid)
+    service.get_huc_boundary = lambda huc_level, huc_id: geometry
+
+    def read(concurrency):
+        driver = service.NWMPService(f"{fixtures.NWM_FLOWS}/", fixtures.HUC_ID, 0, metadata={"statistics": "features"})
+        driver.max_concurrent_queries = concurrency
+        return driver.read()
+
+    print(f"{len(geometry.geoms)} parts, {options.latency * 1000:.0f} ms per response")
+    print(f"{'concurrency':>11} {'p50 ms':>8} {'requests':>9} {'features':>9}")
+    for concurrency in [int(value) for value in options.concurrency.split(",")]:
+        read(concurrency)  # warm up
+        times = []
+        for _ in range(options.runs):
+            server.reset_stats()
+            start = time.perf_counter()
+            result = read(concurrency)
+            times.append((time.perf_counter() - start) * 1000)
+        features = sum(record["value"] for record in result["data"] or [])
+        print(f"{concurrency:>11} {statistics.median(times):>8.0f} {server.snapshot()['requests']:>9} {features:>9}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
+    sys.stdout.flush()
+    os._exit(0)  # skip interpreter teardown, see bench_drivers.py
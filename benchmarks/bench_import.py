@@ -0,0 +1,82 @@
+"""
+Import-time benchmark for the drought drivers.
+
+Each module is imported in a fresh interpreter with outbound connections
+blocked. The report shows the median import time, the number of connection
+attempts made while importing (expected to be 0) and, for reference, the
+time needed to build ``visualization_args`` afterwards.
+
+Usage::
+
+    python benchmarks/bench_import.py [--runs 5]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+MODULES = {
+    "ciroh_plugins.drought.drought_map": "DroughtMap",
+    "ciroh_plugins.drought.drought_pie": "DroughtDataGraph",
+    "ciroh_plugins.drought.drought_plot": "DroughtDataTimeSeries",
+    "ciroh_plugins.drought.drought_table": "DroughtDataTable",
+    "ciroh_plugins.drought.drought_map_layer_finder": "DroughtMapLayerFinder",
+}
+
+CHILD = r"""
+import json, socket, sys, time
+attempts = []
+def _blocked(*args, **kwargs):
+    attempts.append(args[1:2])
+    raise OSError("network disabled by bench_import")
+socket.socket.connect = _blocked
+socket.getaddrinfo = _blocked
+import intake.source.base  # shared dependency, excluded from the measurement
+start = time.perf_counter()
+module = __import__(sys.argv[1], fromlist=[sys.argv[2]])
+import_time = time.perf_counter() - start
+import_attempts = len(attempts)
+start = time.perf_counter()
+try:
+    getattr(module, sys.argv[2]).visualization_args
+    args_error = None
+except Exception as exc:
+    args_error = type(exc).__name__
+args_time = time.perf_counter() - start
+print(json.dumps({
+    "import": import_time,
+    "import_connections": import_attempts,
+    "args": args_time,
+    "args_error": args_error,
+}))
+"""
+
+
+def run(module, cls):
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD, module, cls],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    options = parser.parse_args()
+
+    print(f"{'module':<48} {'import ms':>10} {'conns':>6} {'args ms':>10}")
+    for module, cls in MODULES.items():
+        results = [run(module, cls) for _ in range(options.runs)]
+        import_ms = statistics.median(r["import"] for r in results) * 1000
+        args_ms = statistics.median(r["args"] for r in results) * 1000
+        connections = max(r["import_connections"] for r in results)
+        note = f"  ({results[-1]['args_error']} offline)" if results[-1]["args_error"] else ""
+        print(f"{module:<48} {import_ms:>10.1f} {connections:>6} {args_ms:>10.1f}{note}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Payload size and serialization cost of the plotly time series drivers.
+
+Reads each driver against the local stub server once per figure encoding
+(see ``ciroh_plugins.plotly_encoding``) and reports the size of the JSON
+figure, the time ``json.dumps`` takes to serialize it and the median
+``read()`` time, which includes building and encoding the traces. The
+``reaches_long_range`` scenario shows what the ``compact`` time axes save
+on a long_range reach (6-hourly mean and members).
+
+Usage::
+
+    python benchmarks/bench_payload.py [--runs 20] [--drivers gauges,reaches]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import make_fixtures as fixtures  # noqa: E402
+import stub_server  # noqa: E402
+
+
+def scenarios():
+    """``{name: factory(metadata)}`` returning a fresh driver instance."""
+    from ciroh_plugins.drought.drought_plot import DroughtDataTimeSeries
+    from ciroh_plugins.nwmps.gauges import NWMPSGaugesSeries
+    from ciroh_plugins.nwmps.reaches import NWMPSReachesSeries
+
+    area = "-".join(fixtures.AREA)
+    return {
+        "gauges": lambda metadata: NWMPSGaugesSeries(id=fixtures.GAUGE_ID, metadata=metadata),
+        "gauges_batch": lambda metadata: NWMPSGaugesSeries(id=fixtures.BATCH_GAUGE_IDS, metadata=metadata),
+        "reaches": lambda metadata: NWMPSReachesSeries(id=fixtures.REACH_ID, metadata=metadata),
+        "reaches_members": lambda metadata: NWMPSReachesSeries(
+            id=fixtures.REACH_ID, ensemble="members", metadata=metadata
+        ),
+        "reaches_long_range": lambda metadata: NWMPSReachesSeries(
+            id=fixtures.REACH_ID, products="long_range", ensemble="members", metadata=metadata
+        ),
+        "drought_timeseries": lambda metadata: DroughtDataTimeSeries(area, "usdm", metadata=metadata),
+    }
+
+
+def measure(factory, metadata, runs):
+    factory(metadata).read()  # warm up
+    reads, dumps = [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        figure = factory(metadata).read()
+        reads.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        payload = json.dumps(figure)
+        dumps.append((time.perf_counter() - start) * 1000)
+    return {
+        "kb": len(payload) / 1024,
+        "dumps_ms": statistics.median(dumps),
+        "read_ms": statistics.median(reads),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--drivers", help="comma separated scenario names (default: all)")
+    parser.add_argument("--fixtures", default=fixtures.DEFAULT_FIXTURES)
+    options = parser.parse_args()
+
+    if not os.path.exists(os.path.join(options.fixtures, "huc_boundary.json")):
+        fixtures.generate(options.fixtures)
+    os.environ.setdefault("CIROH_PLUGINS_CACHE_DIR", tempfile.mkdtemp(prefix="ciroh-bench-"))
+
+    from ciroh_plugins.plotly_encoding import ENCODINGS
+    from ciroh_plugins.transport import set_upstream_overrides
+
+    server = stub_server.start(options.fixtures)
+    set_upstream_overrides(server.overrides(["api.water.noaa.gov", "droughtmonitor.unl.edu"]))
+
+    available = scenarios()
+    names = options.drivers.split(",") if options.drivers else list(available)
+    print(f"{'scenario':<22} {'encoding':<8} {'KB':>9} {'dumps ms':>9} {'read ms':>8}")
+    for name in names:
+        for encoding in ENCODINGS:
+            r = measure(available[name], {"encoding": encoding}, options.runs)
+            print(f"{name:<22} {encoding:<8} {r['kb']:>9.1f} {r['dumps_ms']:>9.2f} {r['read_ms']:>8.1f}")
+    server.shutdown()
+    sys.stdout.flush()
+    os._exit(0)  # skip interpreter teardown, see bench_drivers.py
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Connection and wall time benchmark of the reach product fan-out.
+
+Compares the previous fan-out, which opened one ``httpx.AsyncClient`` per
+product and decoded every payload twice, with the current one, which runs
+``NWMPSReachesSeries.make_reach_api_calls`` on the shared event loop and its
+pooled client. Requests go to the local stub server, which counts new
+connections. The stub speaks HTTP/1.1 only. Against api.water.noaa.gov the
+shared client also negotiates HTTP/2 (when ``h2`` is installed), so its
+five requests share a single connection.
+
+Usage::
+
+    python benchmarks/bench_reach_fanout.py [--reads 50]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import make_fixtures as fixtures  # noqa: E402
+import stub_server  # noqa: E402
+
+PRODUCTS = ["analysis_assimilation", "short_range", "medium_range", "long_range", "medium_range_blend"]
+
+
+async def legacy_fanout(base_url, reach_id):
+    """The fan-out as it was: a fresh client per product, JSON decoded twice."""
+    import httpx
+
+    async def call(product):
+        async with httpx.AsyncClient(verify=False) as client:
+            response = await client.get(
+                f"{base_url}/reaches/{reach_id}/streamflow", params={"series": product}
+            )
+            response.json()
+            return response.json()
+
+    return await asyncio.gather(*(call(product) for product in PRODUCTS))
+
+
+def measure(name, fanout, server, reads):
+    fanout()  # warm up
+    server.reset_stats()
+    times = []
+    for _ in range(reads):
+        start = time.perf_counter()
+        fanout()
+        times.append((time.perf_counter() - start) * 1000)
+    stats = server.snapshot()
+    print(
+        f"{name:<8} p50 {statistics.median(times):7.1f} ms   max {max(times):7.1f} ms   "
+        f"{stats['connections'] / reads:5.2f} connections/read   {stats['requests'] / reads:4.1f} requests/read"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--reads", type=int, default=50)
+    parser.add_argument("--fixtures", default=fixtures.DEFAULT_FIXTURES)
+    options = parser.parse_args()
+
+    if not os.path.exists(os.path.join(options.fixtures, "huc_boundary.json")):
+        fixtures.generate(options.fixtures)
+    os.environ.setdefault("CIROH_PLUGINS_CACHE_DIR", tempfile.mkdtemp(prefix="ciroh-bench-"))
+
+    from ciroh_plugins.async_runner import run
+    from ciroh_plugins.nwmps.reaches import NWMPSReachesSeries
+    from ciroh_plugins.transport import resolve_url, set_upstream_overrides
+
+    server = stub_server.start(options.fixtures)
+    set_upstream_overrides(server.overrides(["api.water.noaa.gov"]))
+    base_url = resolve_url(fixtures.NWPS)
+
+    def legacy():
+        asyncio.run(legacy_fanout(base_url, fixtures.REACH_ID))
+
+    def shared():
+        driver = NWMPSReachesSeries(id=fixtures.REACH_ID)
+        run(driver.make_reach_api_calls(PRODUCTS))
+
+    measure("legacy", legacy, server, options.reads)
+    measure("shared", shared, server, options.reads)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
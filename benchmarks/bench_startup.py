@@ -0,0 +1,84 @@
+"""
+Startup benchmark for every ``intake.drivers`` entry point.
+
+Each driver class is loaded in a fresh interpreter and the script reports
+the median load time, the peak RSS of that interpreter and which heavy
+packages (pandas, geopandas, shapely, ...) were pulled in by the import.
+
+Usage::
+
+    python benchmarks/bench_startup.py [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ["numpy", "pandas", "shapely", "pyproj", "geopandas", "pygeoogc", "pygeoutils", "pygeohydro"]
+
+CHILD = r"""
+import importlib, json, resource, sys, time
+module_name, attr = sys.argv[1].split(":")
+start = time.perf_counter()
+getattr(importlib.import_module(module_name), attr)
+elapsed = time.perf_counter() - start
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if sys.platform == "darwin":
+    rss //= 1024
+print(json.dumps({
+    "time": elapsed,
+    "rss_kb": rss,
+    "heavy": [name for name in sys.argv[2].split(",") if name in sys.modules],
+}))
+"""
+
+
+def entry_points():
+    """Return ``{name: "module:attr"}`` from pyproject.toml."""
+    try:
+        import tomllib
+    except ImportError:  # Python < 3.11
+        from importlib.metadata import entry_points as installed
+
+        return {ep.name: ep.value for ep in installed(group="intake.drivers")
+                if ep.value.startswith("ciroh_plugins.")}
+    with open(os.path.join(ROOT, "pyproject.toml"), "rb") as file:
+        project = tomllib.load(file)["project"]
+    return project["entry-points"]["intake.drivers"]
+
+
+def run(target):
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD, target, ",".join(HEAVY_MODULES)],
+        check=True,
+        capture_output=True,
+        text=True,
+        cwd=ROOT,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    options = parser.parse_args()
+
+    baseline = [run("intake.source.base:DataSource") for _ in range(options.runs)]
+    print(
+        f"baseline (intake only): {statistics.median(r['time'] for r in baseline) * 1000:.0f} ms, "
+        f"{max(r['rss_kb'] for r in baseline) / 1024:.0f} MB"
+    )
+    print(f"{'entry point':<38} {'import ms':>10} {'RSS MB':>8}  heavy modules")
+    for name, target in entry_points().items():
+        results = [run(target) for _ in range(options.runs)]
+        elapsed = statistics.median(r["time"] for r in results) * 1000
+        rss = max(r["rss_kb"] for r in results) / 1024
+        heavy = ", ".join(results[-1]["heavy"]) or "-"
+        print(f"{name:<38} {elapsed:>10.0f} {rss:>8.0f}  {heavy}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+"""
+Fixtures for the offline benchmark stub (see ``stub_server.py``).
+
+Fixtures are stored under ``<fixtures>/<upstream host>/<path>.json``. A
+request whose query string matters (e.g. ``?series=short_range``) is stored
+as ``<path>@<query>.json``. ArcGIS ``.../MapServer/<layer>/query`` requests
+are answered dynamically from ``.../MapServer/<layer>/features.json``. The
+HUC boundary used by ``NWMPService`` is stored in ``huc_boundary.json``.
+
+By default deterministic synthetic payloads with the shape and typical size
+of the real upstream responses are generated. With ``--record`` the static
+endpoints are downloaded from the real upstreams instead (ArcGIS features
+are always synthetic).
+
+Usage::
+
+    python benchmarks/make_fixtures.py [--fixtures DIR] [--record] [--force]
+"""
+import argparse
+import json
+import math
+import os
+import random
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlencode, urlsplit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_FIXTURES = os.path.join(HERE, "fixtures")
+
+NWPS = "https://api.water.noaa.gov/nwps/v1"
+NDMC = "https://droughtmonitor.unl.edu"
+RIV_GAUGES = "https://mapservices.weather.noaa.gov/eventdriven/rest/services/water/riv_gauges/MapServer"
+NWM_FLOWS = "https://maps.water.noaa.gov/server/rest/services/nwm/ana_high_flow_magnitude/MapServer"
+NWM_PROB = "https://maps.water.noaa.gov/server/rest/services/nwm/srf_12hr_max_high_water_probability/MapServer"
+
+GAUGE_ID = "ANAW1"
+# Gauges of a batch (RFC overview) read; they share the ANAW1 payloads.
+BATCH_GAUGE_IDS = [f"BAT{i:02d}" for i in range(1, 41)]
+REACH_ID = "23001592"
+USDM_DATE = "20250923"
+AREA = ("state", "06")
+HUC_ID = "1711"
+# Three parts (mainland plus two islands) so MultiPolygon handling is exercised.
+HUC_BOUNDARY = {
+    "type": "MultiPolygon",
+    "coordinates": [
+        [[[-123.0, 47.0], [-121.0, 47.0], [-121.0, 49.0], [-123.0, 49.0], [-123.0, 47.0]]],
+        [[[-123.6, 48.2], [-123.2, 48.2], [-123.2, 48.6], [-123.6, 48.6], [-123.6, 48.2]]],
+        [[[-123.6, 47.4], [-123.3, 47.4], [-123.3, 47.7], [-123.6, 47.7], [-123.6, 47.4]]],
+    ],
+}
+EXTENT = {"xmin": -124.5, "ymin": 46.5, "xmax": -120.5, "ymax": 49.5}
+
+# Real endpoints fetched by --record (URL, params).
+RECORDABLE = [
+    (f"{NWPS}/gauges/{GAUGE_ID}", None),
+    (f"{NWPS}/gauges/{GAUGE_ID}/stageflow", None),
+    (f"{NWPS}/reaches/{REACH_ID}", None),
+] + [
+    (f"{NWPS}/reaches/{REACH_ID}/streamflow", {"series": series})
+    for series in ["analysis_assimilation", "short_range", "medium_range", "long_range", "medium_range_blend"]
+] + [
+    (f"{NDMC}/data/json/usdm_{USDM_DATE}.json", None),
+    (f"{NDMC}/Maps/CompareTwoWeeks.aspx/ReturnDates", None),
+    (f"{NDMC}/DmData/TimeSeries.aspx/ReturnBasicDmTimeSeries", None),
+    (f"{NDMC}/DmData/DataGraphs.aspx/ReturnTabularDMAreaPercent_{AREA[0]}", None),
+    (f"{NDMC}/DmData/DataTables.aspx/ReturnTabularDMAreaPercent_{AREA[0]}", None),
+    (f"{RIV_GAUGES}", {"f": "json"}),
+    (f"{RIV_GAUGES}/0", {"f": "json"}),
+    (f"{NWM_FLOWS}", {"f": "json"}),
+    (f"{NWM_FLOWS}/0", {"f": "json"}),
+    (f"{NWM_PROB}", {"f": "json"}),
+    (f"{NWM_PROB}/0", {"f": "json"}),
+]
+
+
+def fixture_path(directory, url, params=None):
+    parts = urlsplit(url)
+    path = os.path.join(directory, parts.netloc, parts.path.strip("/"))
+    if params:
+        path = f"{path}@{urlencode(sorted(params.items()))}"
+    return f"{path}.json"
+
+
+def _write(directory, url, payload, params=None, force=False):
+    path = fixture_path(directory, url, params)
+    if os.path.exists(path) and not force:
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as file:
+        json.dump(payload, file)
+
+
+def _iso(value):
+    return value.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _series(rng, start, step, count, base, key):
+    data = []
+    value = base
+    for i in range(count):
+        value = max(0.0, value + rng.gauss(0, base * 0.02))
+        data.append({"validTime": _iso(start + i * step), key: round(value, 2)})
+    return data
+
+
+def nwps_fixtures(rng, now):
+    stage_units = {"primaryName": "Stage", "primaryUnits": "ft", "secondaryName": "Flow", "secondaryUnits": "kcfs"}
+    observed_start = now - timedelta(days=30)
+    observed = []
+    for i in range(30 * 24 * 4):
+        t = observed_start + timedelta(minutes=15 * i)
+        stage = 8 + 2 * math.sin(i / 300) + rng.random() * 0.1
+        observed.append({
+            "validTime": _iso(t), "generatedTime": _iso(t + timedelta(minutes=5)),
+            "primary": round(stage, 2), "secondary": round(stage * 1.7, 2),
+        })
+    forecast = []
+    for i in range(7 * 24):
+        t = now + timedelta(hours=i)
+        stage = 8 + 2 * math.sin(i / 40)
+        forecast.append({
+            "validTime": _iso(t), "generatedTime": _iso(now),
+            "primary": round(stage, 2), "secondary": round(stage * 1.7, 2),
+        })
+    stageflow = {
+        "observed": {"issuedTime": _iso(now), "wfo": "SEW", "timeZone": "UTC", **stage_units, "data": observed},
+        "forecast": {"issuedTime": _iso(now), "wfo": "SEW", "timeZone": "UTC", **stage_units, "data": forecast},
+    }
+    gauge = {
+        "lid": GAUGE_ID, "name": "Synthetic River at Benchmark", "reachId": REACH_ID,
+        "flood": {
+            "stageUnits": "ft", "flowUnits": "kcfs",
+            "categories": {
+                "action": {"stage": 10.0, "flow": 17.0},
+                "minor": {"stage": 11.0, "flow": 19.0},
+                "moderate": {"stage": 13.0, "flow": 22.0},
+                "major": {"stage": 15.0, "flow": 26.0},
+            },
+        },
+    }
+    reach = {"reachId": REACH_ID, "name": "Synthetic River", "latitude": 48.0, "longitude": -122.0}
+
+    def simulation(start, step, count, base):
+        return {"referenceTime": _iso(now), "units": "ft³/s", "data": _series(rng, start, step, count, base, "flow")}
+
+    hour = timedelta(hours=1)
+    streamflow = {
+        "analysis_assimilation": {"analysisAssimilation": {"series": simulation(now - 24 * hour, hour, 24, 1200)}},
+        "short_range": {"shortRange": {"series": simulation(now, hour, 18, 1200)}},
+        "medium_range": {"mediumRange": {
+            "series": simulation(now, hour, 240, 1200),
+            **{f"member{m}": simulation(now, hour, 240 if m == 1 else 204, 1200) for m in range(1, 7)},
+        }},
+        "long_range": {"longRange": {
+            "mean": simulation(now, 6 * hour, 120, 1100),
+            **{f"member{m}": simulation(now, 6 * hour, 120, 1100) for m in range(1, 5)},
+        }},
+        "medium_range_blend": {"mediumRangeBlend": {"series": simulation(now, hour, 240, 1200)}},
+    }
+    for payload in streamflow.values():
+        payload["reach"] = reach
+    return gauge, stageflow, reach, streamflow
+
+
+def drought_fixtures(rng):
+    features = []
+    for dm in range(5):
+        polygons = []
+        for p in range(50):
+            cx, cy = rng.uniform(-120, -80), rng.uniform(30, 45)
+            ring = [
+                [round(cx + math.cos(a) * 0.5, 5), round(cy + math.sin(a) * 0.5, 5)]
+                for a in (2 * math.pi * k / 200 for k in range(200))
+            ]
+            ring.append(ring[0])
+            polygons.append([ring])
+        features.append({
+            "type": "Feature",
+            "properties": {"OBJECTID": dm + 1, "DM": dm},
+            "geometry": {"type": "MultiPolygon", "coordinates": polygons},
+        })
+    geojson = {"type": "FeatureCollection", "features": features}
+
+    first = datetime(2000, 1, 4)
+    weeks = [first + timedelta(days=7 * i) for i in range(1343)]
+    dates = {"d": [{"Value": d.strftime("%Y%m%d"), "Text": f"{d:%B} {d.day}, {d.year}"} for d in reversed(weeks)]}
+
+    def levels():
+        d4 = rng.uniform(0, 5)
+        d3 = d4 + rng.uniform(0, 10)
+        d2 = d3 + rng.uniform(0, 15)
+        d1 = d2 + rng.uniform(0, 15)
+        d0 = d1 + rng.uniform(0, 20)
+        return {k: round(v, 2) for k, v in zip(["D0", "D1", "D2", "D3", "D4"], [d0, d1, d2, d3, d4])}
+
+    timeseries = {"d": [
+        {"__type": "DmData.TimeSeries", "ReleaseID": i, "FileDate": d.strftime("%Y%m%d"),
+         "MapDate": d.strftime("%Y%m%d"), "Date": d.strftime("%Y-%m-%d"), "AreaOfInterest": "CA",
+         "None": 10.0, **levels(), "DSCI": rng.randint(0, 500)}
+        for i, d in enumerate(weeks)
+    ]}
+    graph = {"d": [{
+        "__type": "DmData.DataGraphs", **levels(), "FileDate": USDM_DATE, "NONE": 12.0, "ReleaseID": 1343,
+        "dsci": 210, "mapDate": USDM_DATE, "statisticFormatId": 2, "usName": "California",
+    }]}
+    table = {"d": [
+        {"MapDate": d.strftime("%Y%m%d"), "Name": "California", "None": 10.0, **levels(),
+         "ValidStart": d.strftime("%Y-%m-%d"), "ValidEnd": (d + timedelta(days=6)).strftime("%Y-%m-%d"),
+         "StatisticFormatID": 1}
+        for d in reversed(weeks)
+    ]}
+    return geojson, dates, timeseries, graph, table
+
+
+def _service_info(name):
+    return {
+        "currentVersion": 11.1, "mapName": name,
+        "layers": [{"id": 0, "name": name}],
+        "supportedQueryFormats": "JSON, geoJSON, PBF",
+        "fullExtent": {**EXTENT, "spatialReference": {"wkid": 4326, "latestWkid": 4326}},
+        "units": "esriDecimalDegrees", "maxRecordCount": 2000,
+    }
+
+
+def _layer_info(name, field, field_type, renderer):
+    return {
+        "id": 0, "name": name, "type": "Feature Layer", "maxRecordCount": 2000,
+        "fields": [
+            {"name": "OBJECTID", "type": "esriFieldTypeOID", "alias": "OBJECTID"},
+            {"name": field, "type": field_type, "alias": field},
+            {"name": "name", "type": "esriFieldTypeString", "alias": "name"},
+        ],
+        "advancedQueryCapabilities": {"supportsStatistics": True, "supportsOrderBy": True},
+        "drawingInfo": {"renderer": renderer},
+    }
+
+
+def _features(rng, count, field, values, geometry):
+    features = []
+    for oid in range(1, count + 1):
+        x, y = rng.uniform(EXTENT["xmin"], EXTENT["xmax"]), rng.uniform(EXTENT["ymin"], EXTENT["ymax"])
+        if geometry == "Point":
+            geom = {"type": "Point", "coordinates": [round(x, 5), round(y, 5)]}
+        else:
+            geom = {"type": "LineString", "coordinates": [
+                [round(x + 0.002 * k, 5), round(y + 0.001 * math.sin(k), 5)] for k in range(20)
+            ]}
+        features.append({
+            "type": "Feature", "id": oid,
+            "properties": {"OBJECTID": oid, field: values(), "name": f"feature {oid}"},
+            "geometry": geom,
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+
+def arcgis_fixtures(rng):
+    color = {"action": [255, 255, 0, 255], "minor": [255, 153, 0, 255], "moderate": [255, 0, 0, 255],
+             "major": [204, 51, 255, 255], "normal": [0, 255, 0, 255], "no_forecast": [102, 153, 204, 255]}
+    statuses = list(color)
+    gauges = (
+        _service_info("Observed River Stages"),
+        _layer_info("Observed River Stages", "status", "esriFieldTypeString", {
+            "type": "uniqueValue", "field1": "status",
+            "uniqueValueInfos": [{"value": s, "label": s.replace("_", " ").title(), "symbol": {"color": c}}
+                                 for s, c in color.items()],
+        }),
+        _features(rng, 800, "status", lambda: rng.choice(statuses), "Point"),
+    )
+    recur = ["2", "5", "10", "25", "50", ">50"]
+    flows = (
+        _service_info("High Flow Magnitude"),
+        _layer_info("High Flow Magnitude", "recur_cat", "esriFieldTypeString", {
+            "type": "uniqueValue", "field1": "recur_cat",
+            "uniqueValueInfos": [{"value": r, "label": f"{r} year", "symbol": {"color": [0, 40 * i, 255, 255]}}
+                                 for i, r in enumerate(recur)],
+        }),
+        _features(rng, 20000, "recur_cat", lambda: rng.choice(recur), "LineString"),
+    )
+    breaks = [(25, "0-25%"), (50, "26-50%"), (75, "51-75%"), (100, "76-100%")]
+    probability = (
+        _service_info("High Water Probability"),
+        _layer_info("High Water Probability", "srf_prob", "esriFieldTypeDouble", {
+            "type": "classBreaks", "field": "srf_prob", "minValue": 0,
+            "classBreakInfos": [{"classMaxValue": m, "label": label, "symbol": {"color": [0, 0, 60 * i, 255]}}
+                                for i, (m, label) in enumerate(breaks)],
+        }),
+        _features(rng, 20000, "srf_prob", lambda: round(rng.uniform(0, 100), 1), "LineString"),
+    )
+    return {RIV_GAUGES: gauges, NWM_FLOWS: flows, NWM_PROB: probability}
+
+
+def generate(directory=DEFAULT_FIXTURES, force=False, seed=42):
+    """Write the synthetic fixtures (existing files are kept unless ``force``)."""
+    rng = random.Random(seed)
+    now = datetime(2025, 9, 30, 12, tzinfo=timezone.utc)
+    gauge, stageflow, reach, streamflow = nwps_fixtures(rng, now)
+    _write(directory, f"{NWPS}/gauges/{GAUGE_ID}", gauge, force=force)
+    _write(directory, f"{NWPS}/gauges/{GAUGE_ID}/stageflow", stageflow, force=force)
+    for gauge_id in BATCH_GAUGE_IDS:
+        _write(directory, f"{NWPS}/gauges/{gauge_id}", {**gauge, "lid": gauge_id}, force=force)
+        _write(directory, f"{NWPS}/gauges/{gauge_id}/stageflow", stageflow, force=force)
+    _write(directory, f"{NWPS}/reaches/{REACH_ID}", reach, force=force)
+    for series, payload in streamflow.items():
+        _write(directory, f"{NWPS}/reaches/{REACH_ID}/streamflow", payload, {"series": series}, force)
+
+    geojson, dates, timeseries, graph, table = drought_fixtures(rng)
+    _write(directory, f"{NDMC}/data/json/usdm_{USDM_DATE}.json", geojson, force=force)
+    _write(directory, f"{NDMC}/Maps/CompareTwoWeeks.aspx/ReturnDates", dates, force=force)
+    _write(directory, f"{NDMC}/DmData/TimeSeries.aspx/ReturnBasicDmTimeSeries", timeseries, force=force)
+    _write(directory, f"{NDMC}/DmData/DataGraphs.aspx/ReturnTabularDMAreaPercent_{AREA[0]}", graph, force=force)
+    _write(directory, f"{NDMC}/DmData/DataTables.aspx/ReturnTabularDMAreaPercent_{AREA[0]}", table, force=force)
+
+    for url, (service, layer, features) in arcgis_fixtures(rng).items():
+        _write(directory, url, service, force=force)
+        _write(directory, f"{url}/0", layer, force=force)
+        _write(directory, f"{url}/0/features", features, force=force)
+    boundary_path = os.path.join(directory, "huc_boundary.json")
+    if force or not os.path.exists(boundary_path):
+        with open(boundary_path, "w") as file:
+            json.dump({"huc_id": HUC_ID, "geometry": HUC_BOUNDARY}, file)
+    return directory
+
+
+def record(directory=DEFAULT_FIXTURES):
+    """Download the static endpoints from the real upstreams."""
+    import httpx
+
+    params_for = {
+        "TimeSeries": {"area": f'"{AREA[1]}"', "type": f'"{AREA[0]}"', "statstype": 1},
+        "DataGraphs": {"area": f'"{AREA[1]}"', "dt": f'"{USDM_DATE}"', "statstype": 2},
+        "DataTables": {"area": f"'{AREA[1]}'", "statstype": "'1'", "diff": "'0'"},
+    }
+    with httpx.Client(verify=False, timeout=120, follow_redirects=True) as client:
+        for url, params in RECORDABLE:
+            request_params = dict(params or {})
+            for key, extra in params_for.items():
+                if key in url:
+                    request_params.update(extra)
+            response = client.get(url, params=request_params, headers={"Content-Type": "application/json"})
+            if response.status_code != 200:
+                print(f"skipped {url}: HTTP {response.status_code}")
+                continue
+            _write(directory, url, response.json(), params, force=True)
+            print(f"recorded {url} ({len(response.content)} bytes)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES)
+    parser.add_argument("--record", action="store_true", help="download static fixtures from the real upstreams")
+    parser.add_argument("--force", action="store_true", help="overwrite existing synthetic fixtures")
+    options = parser.parse_args()
+    if options.record:
+        record(options.fixtures)
+    generate(options.fixtures, force=options.force)
+    print(f"fixtures written to {options.fixtures}")
+
+
+if __name__ == "__main__":
+    main()
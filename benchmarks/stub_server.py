@@ -0,0 +1,274 @@
+"""
+Local stand-in for the NOAA / NDMC upstreams used by the benchmarks.
+
+The server replays fixtures written by ``make_fixtures.py``. Requests are
+expected under ``/<upstream host>/<path>`` so that e.g.
+``https://api.water.noaa.gov`` can be overridden with
+``http://127.0.0.1:<port>/api.water.noaa.gov`` (see
+``ciroh_plugins.transport.set_upstream_overrides``).
+
+ArcGIS ``query`` requests are evaluated against the layer's
+``features.json``: ``returnIdsOnly`` applies the spatial filter with
+shapely, ``objectIds`` selects features, ``outFields`` and
+``returnGeometry`` trim the payload, and ``outStatistics`` (``count``
+only) grouped by ``groupByFieldsForStatistics`` aggregates the matches.
+
+The server counts requests, connections and bytes sent so that benchmarks
+can report transfer volumes. ``latency`` (seconds, default 0) delays every
+response to stand in for the round trip to the real upstreams.
+
+Usage::
+
+    python benchmarks/stub_server.py [--port 8765] [--fixtures DIR]
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from make_fixtures import DEFAULT_FIXTURES
+
+SPATIAL_PREDICATES = {
+    "esriSpatialRelIntersects": "intersects",
+    "esriSpatialRelEnvelopeIntersects": "intersects",
+    "esriSpatialRelIndexIntersects": "intersects",
+    "esriSpatialRelContains": "contains",
+    "esriSpatialRelWithin": "within",
+}
+
+
+class FeatureLayer:
+    """Features of one ArcGIS layer fixture, indexed by object id."""
+
+    def __init__(self, path):
+        from shapely.geometry import shape
+
+        with open(path) as file:
+            collection = json.load(file)
+        self.features = {f["properties"]["OBJECTID"]: f for f in collection["features"]}
+        self.oids = list(self.features)
+        self.geometries = [shape(self.features[oid]["geometry"]) for oid in self.oids]
+        self._tree = None
+
+    def select_oids(self, params):
+        from shapely import STRtree
+        from shapely.geometry import box
+
+        geometry = params.get("geometry")
+        if not geometry:
+            return self.oids
+        geometry = json.loads(geometry)
+        if "rings" in geometry:
+            query = _polygon(geometry["rings"])
+        elif "xmin" in geometry:
+            query = box(geometry["xmin"], geometry["ymin"], geometry["xmax"], geometry["ymax"])
+        else:
+            return self.oids
+        predicate = SPATIAL_PREDICATES.get(params.get("spatialRel", ""), "intersects")
+        if self._tree is None:
+            self._tree = STRtree(self.geometries)
+        hits = self._tree.query(query, predicate=predicate)
+        return sorted(self.oids[i] for i in hits)
+
+    def attributes(self, oid, out_fields):
+        properties = self.features[oid]["properties"]
+        if out_fields in (None, "", "*"):
+            return dict(properties)
+        fields = [f.strip() for f in out_fields.split(",")]
+        return {f: properties.get(f) for f in fields if f in properties}
+
+    def statistics(self, oids, params):
+        field = params.get("groupByFieldsForStatistics", "")
+        counts = {}
+        for oid in oids:
+            value = self.features[oid]["properties"].get(field) if field else None
+            counts[value] = counts.get(value, 0) + 1
+        features = []
+        for statistic in json.loads(params["outStatistics"]):
+            if statistic.get("statisticType") != "count":
+                return {"error": {"code": 400, "message": "Only count statistics are stubbed"}}
+            name = statistic["outStatisticFieldName"]
+            for value, count in counts.items():
+                attributes = {field: value} if field else {}
+                features.append({"attributes": {**attributes, name: count}})
+        return {"features": features}
+
+    def query(self, params):
+        # ``where`` clauses are not evaluated, only the spatial filter is.
+        oids = self.select_oids(params)
+        if params.get("outStatistics"):
+            return self.statistics(oids, params)
+        if params.get("returnIdsOnly", "false").lower() == "true":
+            return {"objectIdFieldName": "OBJECTID", "objectIds": oids}
+        if params.get("objectIds"):
+            wanted = {int(i) for i in params["objectIds"].split(",") if i}
+            oids = [oid for oid in oids if oid in wanted]
+        out_fields = params.get("outFields", params.get("outfields"))
+        return_geometry = params.get("returnGeometry", "true").lower() == "true"
+        if params.get("f", "json").lower() == "geojson":
+            return {
+                "type": "FeatureCollection",
+                "features": [
+                    {
+                        "type": "Feature",
+                        "id": oid,
+                        "properties": self.attributes(oid, out_fields),
+                        "geometry": self.features[oid]["geometry"] if return_geometry else None,
+                    }
+                    for oid in oids
+                ],
+            }
+        features = []
+        for oid in oids:
+            feature = {"attributes": self.attributes(oid, out_fields)}
+            if return_geometry:
+                feature["geometry"] = _esri_geometry(self.features[oid]["geometry"])
+            features.append(feature)
+        return {"objectIdFieldName": "OBJECTID", "features": features}
+
+
+def _polygon(rings):
+    """Shapely geometry of Esri rings: clockwise exteriors, each followed by its holes."""
+    from shapely.geometry import LinearRing, MultiPolygon, Polygon
+
+    parts = []
+    for ring in rings:
+        if not LinearRing(ring).is_ccw or not parts:
+            parts.append((ring, []))
+        else:
+            parts[-1][1].append(ring)
+    polygons = [Polygon(shell, holes) for shell, holes in parts]
+    return polygons[0] if len(polygons) == 1 else MultiPolygon(polygons)
+
+
+def _esri_geometry(geometry):
+    if geometry["type"] == "Point":
+        x, y = geometry["coordinates"]
+        return {"x": x, "y": y}
+    if geometry["type"] == "LineString":
+        return {"paths": [geometry["coordinates"]]}
+    return {"rings": [ring for polygon in geometry["coordinates"] for ring in polygon]}
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, fixtures=DEFAULT_FIXTURES, latency=0.0):
+        super().__init__(address, StubHandler)
+        self.fixtures = fixtures
+        self.latency = latency
+        self.layers = {}
+        self.stats_lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self.stats_lock:
+            self.requests = 0
+            self.connections = 0
+            self.bytes_sent = 0
+
+    def snapshot(self):
+        with self.stats_lock:
+            return {"requests": self.requests, "connections": self.connections, "bytes": self.bytes_sent}
+
+    def layer(self, path):
+        if path not in self.layers:
+            self.layers[path] = FeatureLayer(path)
+        return self.layers[path]
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def overrides(self, hosts):
+        """``{origin: replacement}`` pointing each upstream host at this server."""
+        return {f"https://{host}": f"{self.base_url}/{host}" for host in hosts}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Send headers and body in one segment; otherwise Nagle's algorithm and
+    # delayed ACKs add ~40 ms to every request on a kept-alive connection.
+    disable_nagle_algorithm = True
+    wbufsize = 64 * 1024
+
+    def setup(self):
+        super().setup()
+        with self.server.stats_lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _params(self):
+        parts = urlsplit(self.path)
+        params = dict(parse_qsl(parts.query, keep_blank_values=True))
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            body = self.rfile.read(length).decode("utf-8")
+            params.update(parse_qsl(body, keep_blank_values=True))
+        return parts.path.strip("/"), params
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        # Count before writing so a client that has its response is never
+        # ahead of the counters.
+        with self.server.stats_lock:
+            self.server.requests += 1
+            self.server.bytes_sent += len(body)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self):
+        path, params = self._params()
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        base = os.path.join(self.server.fixtures, path)
+        if path.endswith("/query"):
+            features = os.path.join(os.path.dirname(base), "features.json")
+            if os.path.exists(features):
+                self._send(200, self.server.layer(features).query(params))
+                return
+        candidates = []
+        relevant = {k: v for k, v in params.items() if k != "f"}
+        if relevant:
+            candidates.append(f"{base}@{urlencode(sorted(relevant.items()))}.json")
+        candidates.append(f"{base}.json")
+        for candidate in candidates:
+            if os.path.exists(candidate):
+                with open(candidate) as file:
+                    self._send(200, json.load(file))
+                return
+        self._send(404, {"error": {"code": 404, "message": f"No fixture for /{path}"}})
+
+    do_GET = _handle
+    do_POST = _handle
+
+
+def start(fixtures=DEFAULT_FIXTURES, port=0, latency=0.0):
+    """Start a server on a daemon thread and return it."""
+    server = StubServer(("127.0.0.1", port), fixtures, latency)
+    threading.Thread(target=server.serve_forever, name="stub-upstream", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    options = parser.parse_args()
+    server = StubServer(("127.0.0.1", options.port), options.fixtures, options.latency)
+    print(f"serving {options.fixtures} on {server.base_url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
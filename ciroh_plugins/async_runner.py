@@ -0,0 +1,157 @@
+"""
+One long-lived event loop shared by every driver that runs coroutines from
+synchronous code.
+
+The loop runs on a daemon thread started on first use, so sync ``read()``
+wrappers neither create (and leak) a loop per instance nor clash with an
+event loop already running in the caller's thread. The shared loop also
+keeps a single pooled ``AsyncClient`` alive across reads (see
+:mod:`ciroh_plugins.transport`).
+
+Coroutines run in a copy of the caller's context, so context variables such
+as the timing breakdown of :mod:`ciroh_plugins.instrumentation` carry over.
+
+Inside :func:`calling_thread_loop` coroutines run in the calling thread
+instead, on a private loop, for profilers that only see one thread.
+"""
+import asyncio
+import atexit
+import concurrent.futures
+import contextlib
+import contextvars
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_loop = None
+_thread = None
+# (loop, thread id) set by calling_thread_loop()
+_private_loop = contextvars.ContextVar("ciroh_plugins_private_loop", default=None)
+
+
+def _serve(loop, ready):
+    asyncio.set_event_loop(loop)
+    loop.call_soon(ready.set)
+    loop.run_forever()
+
+
+def get_loop():
+    """Return the shared loop, starting its thread on first use."""
+    global _loop, _thread
+    if _loop is None or not _thread.is_alive():
+        with _lock:
+            if _loop is None or not _thread.is_alive():
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+                thread = threading.Thread(
+                    target=_serve, args=(loop, ready), name="ciroh-plugins-loop", daemon=True
+                )
+                thread.start()
+                ready.wait()
+                _loop, _thread = loop, thread
+    return _loop
+
+
+def run(coro, timeout=None):
+    """
+    Run ``coro`` on the shared loop and return its result, blocking the
+    calling thread (or on the private loop of :func:`calling_thread_loop`).
+    Must not be called from a coroutine running on the shared loop itself
+    (use ``await`` there).
+    """
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    private = _private_loop.get()
+    if private is not None and private[1] == threading.get_ident() and running is None:
+        return private[0].run_until_complete(asyncio.wait_for(coro, timeout))
+    loop = get_loop()
+    if running is loop:
+        coro.close()
+        raise RuntimeError("run() called from the shared loop; await the coroutine instead")
+    future = asyncio.run_coroutine_threadsafe(coro, loop)
+    try:
+        return future.result(timeout)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise
+
+
+_DONE = object()
+
+
+async def _anext(agen):
+    try:
+        return await agen.__anext__()
+    except StopAsyncIteration:
+        return _DONE
+
+
+def iterate(agen):
+    """
+    Yield the items of the async generator ``agen`` in the calling thread,
+    advancing it with :func:`run`. Only the generator's own awaits run on the
+    loop, so work done on each item never holds up other coroutines there;
+    tasks the generator started keep running between items. The generator
+    is closed if the caller stops early.
+    """
+    try:
+        while True:
+            item = run(_anext(agen))
+            if item is _DONE:
+                return
+            yield item
+    finally:
+        run(agen.aclose())
+
+
+@contextlib.contextmanager
+def calling_thread_loop():
+    """
+    Make :func:`run` execute coroutines in the calling thread, on a loop
+    private to the block (closed with its HTTP clients on exit). Used while
+    a read is cProfiled, as cProfile only records the thread it runs in.
+    """
+    loop = asyncio.new_event_loop()
+    token = _private_loop.set((loop, threading.get_ident()))
+    try:
+        yield loop
+    finally:
+        _private_loop.reset(token)
+        try:
+            from .transport import aclose_loop_clients
+
+            loop.run_until_complete(aclose_loop_clients())
+            loop.run_until_complete(loop.shutdown_asyncgens())
+        finally:
+            loop.close()
+
+
+def shutdown(timeout=5):
+    """Stop the shared loop and wait for its thread to finish."""
+    global _loop, _thread
+    with _lock:
+        loop, thread = _loop, _thread
+        _loop = _thread = None
+    if loop is None:
+        return
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout)
+    if not thread.is_alive():
+        loop.close()
+
+
+def _reset_after_fork():
+    # The loop thread does not survive a fork; children start a new one.
+    global _loop, _thread, _lock
+    _lock = threading.Lock()
+    _loop = _thread = None
+
+
+atexit.register(shutdown)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
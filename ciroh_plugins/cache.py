@@ -0,0 +1,444 @@
+"""
+Two-tier (memory + disk) cache for upstream HTTP responses.
+
+Responses are cached per URL with a time-to-live picked from
+``TTL_RULES``. Stale entries that carry an ``ETag`` or ``Last-Modified``
+header are revalidated with a conditional request, so an unchanged payload
+costs a ``304`` instead of a full download. Both tiers are bounded by a byte
+budget and evict the least recently used entries first.
+
+Settings are read from the environment:
+
+``CIROH_PLUGINS_CACHE_DIR``
+    Root directory for on-disk caches (default ``$XDG_CACHE_HOME/ciroh_plugins``
+    or ``~/.cache/ciroh_plugins``).
+``CIROH_PLUGINS_HTTP_CACHE``
+    Set to ``0`` to disable the response cache.
+``CIROH_PLUGINS_HTTP_CACHE_MEMORY_BYTES``
+    Memory tier budget (default 64 MB).
+``CIROH_PLUGINS_HTTP_CACHE_DISK_BYTES``
+    Disk tier budget (default 512 MB).
+``CIROH_PLUGINS_METADATA_TTL``
+    Seconds gauge and reach descriptions are kept in the metadata cache
+    before being revalidated (default 86400).
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+import httpx
+
+from . import transport
+from .async_runner import run
+from .instrumentation import stage
+
+logger = logging.getLogger(__name__)
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+FOREVER = None
+DEFAULT_TTL = 300
+METADATA_TTL = _env_int("CIROH_PLUGINS_METADATA_TTL", 86400)
+
+# (pattern searched in the full URL, ttl in seconds or FOREVER); first match wins.
+TTL_RULES = [
+    # Weekly USDM maps are immutable once released.
+    (re.compile(r"droughtmonitor\.unl\.edu/data/json/usdm_\d{8}\.json"), FOREVER),
+    # NWPS observations and forecasts move every few minutes.
+    (re.compile(r"/gauges/[^/?]+/stageflow"), 300),
+    (re.compile(r"/reaches/[^/?]+/streamflow"), 300),
+    # Gauge and reach descriptions rarely change.
+    (re.compile(r"/(gauges|reaches)/[^/?]+(\?|$)"), 3600),
+    # ArcGIS MapServer layer descriptions (renderer, fields, ...).
+    (re.compile(r"/MapServer/\d+(\?|$)"), 86400),
+]
+
+
+def cache_dir(*parts):
+    """Return (and create) a directory under the plugin cache root."""
+    root = os.environ.get("CIROH_PLUGINS_CACHE_DIR")
+    if not root:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+            os.path.expanduser("~"), ".cache"
+        )
+        root = os.path.join(base, "ciroh_plugins")
+    path = os.path.join(root, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def atomic_write_json(path, data):
+    """Write ``data`` as JSON to ``path`` via a temporary file and rename."""
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as file:
+            json.dump(data, file)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class FileLock:
+    """
+    Non-blocking inter-process lock backed by an exclusively created file.
+
+    ``acquire()`` returns ``False`` instead of waiting when another process
+    holds the lock. Locks older than ``stale_after`` seconds are assumed to
+    belong to a crashed process and are broken.
+    """
+
+    def __init__(self, path, stale_after=300):
+        self.path = path
+        self.stale_after = stale_after
+        self.locked = False
+
+    def acquire(self):
+        for _ in range(2):
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    age = time.time() - os.path.getmtime(self.path)
+                except OSError:
+                    continue
+                if age < self.stale_after:
+                    return False
+                try:
+                    os.remove(self.path)
+                except OSError:
+                    return False
+                continue
+            with os.fdopen(fd, "w") as file:
+                file.write(str(os.getpid()))
+            self.locked = True
+            return True
+        return False
+
+    def release(self):
+        if self.locked:
+            self.locked = False
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+def ttl_for(url):
+    for pattern, ttl in TTL_RULES:
+        if pattern.search(url):
+            return ttl
+    return DEFAULT_TTL
+
+
+class CachedResponse:
+    """Minimal response object returned for both cached and fresh payloads."""
+
+    def __init__(self, url, status_code, content, headers=None, from_cache=False):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self.from_cache = from_cache
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class _Entry:
+    __slots__ = ("url", "content", "headers", "expires_at")
+
+    def __init__(self, url, content, headers, expires_at):
+        self.url = url
+        self.content = content
+        self.headers = headers
+        self.expires_at = expires_at
+
+    @property
+    def size(self):
+        return len(self.content)
+
+    def is_fresh(self, now):
+        return self.expires_at is None or now < self.expires_at
+
+    def validators(self):
+        headers = {}
+        if self.headers.get("etag"):
+            headers["If-None-Match"] = self.headers["etag"]
+        if self.headers.get("last-modified"):
+            headers["If-Modified-Since"] = self.headers["last-modified"]
+        return headers
+
+
+class ResponseCache:
+    """LRU memory tier in front of an LRU, size-bounded disk tier."""
+
+    def __init__(self, directory=None, memory_bytes=None, disk_bytes=None, name="http"):
+        self._directory = directory
+        self.name = name
+        self.memory_bytes = (
+            memory_bytes
+            if memory_bytes is not None
+            else _env_int("CIROH_PLUGINS_HTTP_CACHE_MEMORY_BYTES", 64 * 2**20)
+        )
+        self.disk_bytes = (
+            disk_bytes
+            if disk_bytes is not None
+            else _env_int("CIROH_PLUGINS_HTTP_CACHE_DISK_BYTES", 512 * 2**20)
+        )
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._disk_size = None
+        self._lock = threading.Lock()
+
+    @property
+    def directory(self):
+        if self._directory is None:
+            self._directory = cache_dir(self.name)
+        return self._directory
+
+    @staticmethod
+    def key(url, params=None):
+        if params:
+            url = f"{url}?{urlencode(sorted(params.items()))}"
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.cache")
+
+    # memory tier
+    def _memory_get(self, key):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+            return entry
+
+    def _memory_put(self, key, entry):
+        if entry.size > self.memory_bytes:
+            return
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_size -= old.size
+            self._memory[key] = entry
+            self._memory_size += entry.size
+            while self._memory_size > self.memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_size -= evicted.size
+
+    # disk tier
+    def _disk_get(self, key):
+        try:
+            path = self._path(key)
+            with open(path, "rb") as file:
+                meta = json.loads(file.readline())
+                content = file.read()
+            os.utime(path)  # mark as recently used for LRU eviction
+        except (OSError, ValueError):
+            return None
+        return _Entry(meta["url"], content, meta["headers"], meta["expires_at"])
+
+    def _disk_put(self, key, entry):
+        if entry.size > self.disk_bytes:
+            return
+        meta = json.dumps(
+            {"url": entry.url, "headers": entry.headers, "expires_at": entry.expires_at}
+        ).encode("utf-8")
+        try:
+            path = self._path(key)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as file:
+                file.write(meta + b"\n")
+                file.write(entry.content)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write cache entry for {entry.url}: {e}")
+            return
+        with self._lock:
+            if self._disk_size is not None:
+                self._disk_size += len(meta) + 1 + entry.size
+        self._evict_disk()
+
+    def _evict_disk(self):
+        with self._lock:
+            if self._disk_size is not None and self._disk_size <= self.disk_bytes:
+                return
+            files = []
+            for item in os.scandir(self.directory):
+                if item.name.endswith(".cache"):
+                    try:
+                        stat = item.stat()
+                    except OSError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, item.path))
+            total = sum(size for _, size, _ in files)
+            for _, size, path in sorted(files):
+                if total <= self.disk_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                total -= size
+            self._disk_size = total
+
+    def _store(self, key, entry):
+        self._memory_put(key, entry)
+        self._disk_put(key, entry)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_size = 0
+            self._disk_size = None
+        for item in os.scandir(self.directory):
+            if item.name.endswith(".cache"):
+                try:
+                    os.remove(item.path)
+                except OSError:
+                    pass
+
+    def get(self, url, params=None, headers=None, ttl=None):
+        """Blocking :meth:`aget`, run on the shared event loop."""
+        return run(self.aget(url, params=params, headers=headers, ttl=ttl))
+
+    async def aget(self, url, params=None, headers=None, ttl=None):
+        """
+        Return a :class:`CachedResponse` for ``url``, hitting the network only
+        when the cached copy is missing or stale.
+
+        The lookup is recorded as a ``cache`` stage whose ``cache`` field is
+        ``hit``, ``revalidated``, ``stale`` or ``miss``.
+        """
+        with stage("cache", url=str(url)) as event:
+            key, ttl, entry, response = self._lookup(url, params, ttl, event)
+            if response is None:
+                try:
+                    fresh = await transport.aget(
+                        url, params=params, headers=self._request_headers(headers, entry)
+                    )
+                except httpx.HTTPError:
+                    if entry is None:
+                        raise
+                    response = self._serve_stale(url, entry, event)
+                else:
+                    response = self._update(key, url, ttl, entry, fresh, event)
+            event["bytes"] = len(response.content)
+            return response
+
+    def _lookup(self, url, params, ttl, event):
+        """Return ``(key, ttl, entry, response)``; ``response`` is set on a fresh hit."""
+        key = self.key(url, params)
+        ttl = ttl_for(url) if ttl is None else ttl
+        entry = self._memory_get(key)
+        if entry is None:
+            entry = self._disk_get(key)
+            if entry is not None:
+                self._memory_put(key, entry)
+        if entry is not None and entry.is_fresh(time.time()):
+            event["cache"] = "hit"
+            return key, ttl, entry, CachedResponse(url, 200, entry.content, entry.headers, True)
+        return key, ttl, entry, None
+
+    @staticmethod
+    def _request_headers(headers, entry):
+        request_headers = dict(headers or {})
+        if entry is not None:
+            request_headers.update(entry.validators())
+        return request_headers
+
+    @staticmethod
+    def _serve_stale(url, entry, event):
+        logger.warning(f"Serving stale cached response for {url}")
+        event["cache"] = "stale"
+        return CachedResponse(url, 200, entry.content, entry.headers, True)
+
+    def _update(self, key, url, ttl, entry, response, event):
+        now = time.time()
+        expires_at = None if ttl is FOREVER else now + ttl
+        if response.status_code == 304 and entry is not None:
+            entry.expires_at = expires_at
+            self._store(key, entry)
+            event["cache"] = "revalidated"
+            return CachedResponse(url, 200, entry.content, entry.headers, True)
+        event["cache"] = "miss"
+        if response.status_code != 200:
+            return CachedResponse(url, response.status_code, response.content)
+
+        validators = {
+            name: response.headers[name]
+            for name in ("etag", "last-modified", "content-type")
+            if name in response.headers
+        }
+        entry = _Entry(url, response.content, validators, expires_at)
+        self._store(key, entry)
+        return CachedResponse(url, 200, entry.content, entry.headers)
+
+
+_default_cache = None
+_metadata_cache = None
+
+
+def get_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ResponseCache()
+    return _default_cache
+
+
+def get_metadata_cache():
+    """
+    Separate, smaller tier for gauge/reach descriptions (names, flood
+    categories). They change far less often than the forecasts, so they
+    live longer and are not evicted by large stageflow payloads.
+    """
+    global _metadata_cache
+    if _metadata_cache is None:
+        _metadata_cache = ResponseCache(
+            memory_bytes=_env_int("CIROH_PLUGINS_METADATA_CACHE_MEMORY_BYTES", 8 * 2**20),
+            disk_bytes=_env_int("CIROH_PLUGINS_METADATA_CACHE_DISK_BYTES", 64 * 2**20),
+            name="metadata",
+        )
+    return _metadata_cache
+
+
+def cached_get(url, params=None, headers=None, ttl=None, cache=None):
+    """GET ``url`` through ``cache`` (the shared response cache by default)."""
+    return run(acached_get(url, params=params, headers=headers, ttl=ttl, cache=cache))
+
+
+async def acached_get(url, params=None, headers=None, ttl=None, cache=None):
+    """Async GET of ``url`` through ``cache`` (the shared response cache by default)."""
+    if os.environ.get("CIROH_PLUGINS_HTTP_CACHE", "1") == "0":
+        response = await transport.aget(url, params=params, headers=headers)
+        return CachedResponse(url, response.status_code, response.content, response.headers)
+    cache = cache or get_cache()
+    return await cache.aget(url, params=params, headers=headers, ttl=ttl)
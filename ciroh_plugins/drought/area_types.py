@@ -0,0 +1,191 @@
+"""
+Catalog of the drought monitor area types (states, counties, HUCs, ...).
+
+The catalog ships as ``data/drought_area_types.json.gz`` in a packed form
+where each group stores its value prefix once::
+
+    {"version": 1, "groups": [[group_label, key, [[code, label], ...]], ...]}
+
+so ``["County", "county", [["45001", "Abbeville County (SC)"]]]`` expands to
+the option ``{"value": "county-45001", "label": "Abbeville County (SC)"}``.
+The catalog is loaded once per process and exposes a prefix index for
+paged, filtered queries.
+"""
+import gzip
+import json
+import os
+import threading
+from bisect import bisect_left
+
+DATA_DIR_PATH = os.path.join(os.path.dirname(__file__), "data")
+CATALOG_PATH = os.path.join(DATA_DIR_PATH, "drought_area_types.json.gz")
+CATALOG_VERSION = 1
+
+
+def _normalize(text):
+    return " ".join(str(text).casefold().split())
+
+
+class AreaTypeCatalog:
+    """Area type options grouped by kind, with a sorted prefix index."""
+
+    def __init__(self, groups):
+        # groups: [(group_label, key, [(code, label), ...]), ...]
+        self.groups = [(label, key, list(options)) for label, key, options in groups]
+        self._dropdown = None
+        self._entries = []  # (group index, value, label)
+        self._by_value = {}
+        self._group_ranges = []
+        group_lookup = {}
+        for group_index, (group_label, key, options) in enumerate(self.groups):
+            group_lookup[_normalize(group_label)] = group_index
+            group_lookup[_normalize(key)] = group_index
+            start = len(self._entries)
+            self._group_ranges.append(range(start, start + len(options)))
+            for code, label in options:
+                value = f"{key}-{code}"
+                self._by_value[value] = len(self._entries)
+                self._entries.append((group_index, value, label))
+        self._group_lookup = group_lookup
+        self._index_keys = None
+        self._index_entries = None
+
+    def _build_index(self):
+        # Sorted (normalized key, entry index) pairs. Every entry is indexed
+        # by its label and by its code, so "san" finds "San Diego County (CA)"
+        # and "4500" finds the South Carolina counties.
+        keys = []
+        for i, (_, value, label) in enumerate(self._entries):
+            keys.append((_normalize(label), i))
+            keys.append((_normalize(value.split("-", 1)[1]), i))
+        keys.sort()
+        self._index_entries = [i for _, i in keys]
+        self._index_keys = [key for key, _ in keys]
+
+    @classmethod
+    def from_dropdown(cls, dropdown):
+        """Build a catalog from the ``[{"label", "options"}]`` dropdown format."""
+        groups = []
+        for group in dropdown:
+            options = group["options"]
+            key = options[0]["value"].split("-", 1)[0] if options else ""
+            groups.append(
+                (
+                    group["label"],
+                    key,
+                    [(o["value"].split("-", 1)[1], o["label"]) for o in options],
+                )
+            )
+        return cls(groups)
+
+    @classmethod
+    def load(cls, path=CATALOG_PATH):
+        with gzip.open(path, "rt", encoding="utf-8") as file:
+            data = json.load(file)
+        if data.get("version") != CATALOG_VERSION:
+            raise ValueError(f"Unsupported area type catalog version: {data.get('version')}")
+        return cls(data["groups"])
+
+    def save(self, path=CATALOG_PATH):
+        """Write the catalog in its packed, compressed form."""
+        data = {
+            "version": CATALOG_VERSION,
+            "groups": [
+                [label, key, [list(option) for option in options]]
+                for label, key, options in self.groups
+            ],
+        }
+        payload = json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+        with gzip.GzipFile(path, "wb", compresslevel=9, mtime=0) as file:
+            file.write(payload.encode("utf-8"))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, value):
+        return value in self._by_value
+
+    def group_labels(self):
+        return [label for label, _, _ in self.groups]
+
+    def label_for(self, value):
+        i = self._by_value.get(value)
+        return None if i is None else self._entries[i][2]
+
+    def dropdown(self):
+        """Full dropdown in the format expected by ``visualization_args``."""
+        if self._dropdown is None:
+            self._dropdown = [
+                {
+                    "label": group_label,
+                    "options": [
+                        {"value": f"{key}-{code}", "label": label}
+                        for code, label in options
+                    ],
+                }
+                for group_label, key, options in self.groups
+            ]
+        return self._dropdown
+
+    def _group_index(self, group):
+        if group is None:
+            return None
+        index = self._group_lookup.get(_normalize(group))
+        if index is None:
+            raise KeyError(f"Unknown area type group: {group}")
+        return index
+
+    def _matches(self, prefix):
+        """Entry indices whose label or code starts with ``prefix``, in catalog order."""
+        if self._index_keys is None:
+            self._build_index()
+        prefix = _normalize(prefix)
+        start = bisect_left(self._index_keys, prefix)
+        matches = set()
+        for i in range(start, len(self._index_keys)):
+            if not self._index_keys[i].startswith(prefix):
+                break
+            matches.add(self._index_entries[i])
+        return sorted(matches)
+
+    def query(self, group=None, prefix=None, offset=0, limit=50):
+        """
+        Return one page of options filtered by group and/or prefix.
+
+        ``group`` accepts a group label (``"County"``) or key (``"county"``).
+        The result is ``{"total", "offset", "limit", "options"}`` where
+        ``options`` uses the usual ``{"value", "label"}`` shape.
+        """
+        group_index = self._group_index(group)
+        if prefix:
+            candidates = self._matches(prefix)
+        elif group_index is not None:
+            candidates = self._group_ranges[group_index]
+        else:
+            candidates = range(len(self._entries))
+        if group_index is not None and prefix:
+            candidates = [i for i in candidates if self._entries[i][0] == group_index]
+        total = len(candidates)
+        page = candidates[offset:offset + limit] if limit is not None else candidates[offset:]
+        return {
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+            "options": [
+                {"value": self._entries[i][1], "label": self._entries[i][2]} for i in page
+            ],
+        }
+
+
+_catalog = None
+_lock = threading.Lock()
+
+
+def get_area_type_catalog():
+    """Return the process-wide catalog, loading it on first use."""
+    global _catalog
+    if _catalog is None:
+        with _lock:
+            if _catalog is None:
+                _catalog = AreaTypeCatalog.load()
+    return _catalog
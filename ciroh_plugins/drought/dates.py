@@ -0,0 +1,292 @@
+"""
+U.S. Drought Monitor release dates.
+
+USDM maps are valid every Tuesday since 2000-01-04 and are published on the
+following Thursday, so the full list of release dates can be computed
+locally. The ``ReturnDates`` endpoint is only consulted in the background to
+catch anomalies (skipped or extra weeks).
+
+The upstream list is persisted under the plugin cache directory
+(``CIROH_PLUGINS_CACHE_DIR``) and shared by every worker process. A stale
+list is served immediately, extended with the releases the weekly schedule
+predicts, while a single worker (guarded by a lock file) refreshes it.
+``CIROH_PLUGINS_USDM_DATES_MAX_AGE`` sets how long, in seconds, the
+persisted list is considered fresh (default one day).
+"""
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta
+
+import httpx
+
+from ..cache import FileLock, atomic_write_json, cache_dir
+from ..transport import get as http_get
+
+logger = logging.getLogger(__name__)
+
+FIRST_RELEASE = date(2000, 1, 4)
+RELEASE_INTERVAL = timedelta(days=7)
+# Maps valid on Tuesday are published on Thursday.
+PUBLICATION_LAG = timedelta(days=2)
+DATE_FORMAT = "%Y%m%d"
+RETURN_DATES_URL = "https://droughtmonitor.unl.edu/Maps/CompareTwoWeeks.aspx/ReturnDates"
+DATES_CACHE_FILE = "usdm_dates.json"
+try:
+    DATES_MAX_AGE = float(os.environ.get("CIROH_PLUGINS_USDM_DATES_MAX_AGE", 86400))
+except ValueError:
+    DATES_MAX_AGE = 86400.0
+# Minimum delay between two refresh attempts made by the same process.
+REFRESH_RETRY_INTERVAL = 900
+
+
+def to_date(value):
+    """Parse a ``YYYYMMDD`` string (or pass through a date/datetime)."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value).strip(), DATE_FORMAT).date()
+
+
+def latest_release_date(today=None):
+    """Return the most recent USDM map published on or before ``today``."""
+    today = today or date.today()
+    available = today - PUBLICATION_LAG
+    if available < FIRST_RELEASE:
+        return None
+    weeks = (available - FIRST_RELEASE).days // RELEASE_INTERVAL.days
+    return FIRST_RELEASE + weeks * RELEASE_INTERVAL
+
+
+def iter_release_dates(start=FIRST_RELEASE, end=None, reverse=False):
+    """Yield release dates between ``start`` and ``end`` (inclusive)."""
+    end = end or latest_release_date()
+    if end is None:
+        return
+    interval = RELEASE_INTERVAL.days
+    first_week = max(-(-(start - FIRST_RELEASE).days // interval), 0)
+    last_week = (end - FIRST_RELEASE).days // interval
+    weeks = (
+        range(last_week, first_week - 1, -1) if reverse else range(first_week, last_week + 1)
+    )
+    for week in weeks:
+        yield FIRST_RELEASE + week * RELEASE_INTERVAL
+
+
+def format_label(value):
+    return f"{value:%B} {value.day}, {value.year}"
+
+
+class UsdmDateIndex:
+    """Sorted USDM release dates with binary-search lookups."""
+
+    def __init__(self, dates):
+        self.dates = sorted(set(dates))
+        self._options = None
+
+    @classmethod
+    def computed(cls, today=None):
+        return cls(iter_release_dates(end=latest_release_date(today)))
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __contains__(self, value):
+        try:
+            value = to_date(value)
+        except (TypeError, ValueError):
+            return False
+        i = bisect_left(self.dates, value)
+        return i < len(self.dates) and self.dates[i] == value
+
+    @property
+    def latest(self):
+        return self.dates[-1] if self.dates else None
+
+    def floor(self, value):
+        """Return the release in effect on ``value`` (latest release <= value)."""
+        i = bisect_right(self.dates, to_date(value))
+        return self.dates[i - 1] if i else None
+
+    def nearest(self, value):
+        """Return the release date closest to ``value``."""
+        if not self.dates:
+            return None
+        value = to_date(value)
+        i = bisect_left(self.dates, value)
+        candidates = self.dates[max(i - 1, 0):i + 1]
+        return min(candidates, key=lambda d: abs(d - value))
+
+    def validate(self, value):
+        """
+        Return ``value`` as a ``YYYYMMDD`` release date, snapping dates that
+        are not a release to the map in effect on that day.
+        """
+        requested = to_date(value)
+        release = self.floor(requested) or self.nearest(requested)
+        if release is None:
+            raise ValueError("No USDM release dates are available")
+        if release != requested:
+            logger.warning(
+                f"{requested:%Y-%m-%d} is not a USDM release date, using {release:%Y-%m-%d}"
+            )
+        return release.strftime(DATE_FORMAT)
+
+    def options(self):
+        """Dropdown options, newest first (built once per index)."""
+        if self._options is None:
+            self._options = [
+                {"value": d.strftime(DATE_FORMAT), "label": format_label(d)}
+                for d in reversed(self.dates)
+            ]
+        return self._options
+
+
+_index = None
+_index_day = None
+_index_mtime = None
+_fetched_at = None
+_next_refresh = 0.0
+_lock = threading.Lock()
+
+
+def dates_cache_path():
+    return os.path.join(cache_dir("drought"), DATES_CACHE_FILE)
+
+
+def load_cached_dates(path):
+    """Return ``(dates, fetched_at)`` from the persisted list, if any."""
+    try:
+        with open(path) as file:
+            data = json.load(file)
+        return [to_date(value) for value in data["dates"]], data["fetched_at"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None, None
+
+
+def store_cached_dates(path, dates):
+    atomic_write_json(
+        path,
+        {"fetched_at": time.time(), "dates": [d.strftime(DATE_FORMAT) for d in dates]},
+    )
+
+
+def fetch_upstream_dates():
+    """Return the release dates published by ``ReturnDates``."""
+    response = http_get(RETURN_DATES_URL, headers={"Content-Type": "application/json"})
+    response.raise_for_status()
+    return [to_date(item["Value"]) for item in response.json().get("d", [])]
+
+
+def reconcile(index):
+    """Compare ``index`` with the upstream list and return the upstream index."""
+    upstream = UsdmDateIndex(fetch_upstream_dates())
+    computed = set(index.dates)
+    published = set(upstream.dates)
+    extra = sorted(published - computed)
+    missing = sorted(d for d in computed - published if d <= (upstream.latest or d))
+    if extra or missing:
+        logger.warning(
+            f"USDM release dates differ from the weekly schedule: "
+            f"extra={[d.isoformat() for d in extra]} missing={[d.isoformat() for d in missing]}"
+        )
+    return upstream
+
+
+def _is_stale(fetched_at):
+    return fetched_at is None or time.time() - fetched_at > DATES_MAX_AGE
+
+
+def _build_index(today, path):
+    computed = UsdmDateIndex.computed(today)
+    cached, fetched_at = load_cached_dates(path) if path else (None, None)
+    if not cached:
+        return computed, None
+    # Releases published since the last refresh come from the schedule.
+    newer = [d for d in computed.dates if d > max(cached)]
+    return UsdmDateIndex(cached + newer), fetched_at
+
+
+def refresh_cached_dates(today, path):
+    """
+    Refresh the persisted list from upstream unless another process is
+    already doing it or has just done it.
+    """
+    lock = FileLock(f"{path}.lock")
+    if not lock.acquire():
+        return False
+    try:
+        _, fetched_at = load_cached_dates(path)
+        if not _is_stale(fetched_at):
+            return False
+        upstream = reconcile(UsdmDateIndex.computed(today))
+        if upstream.dates:
+            store_cached_dates(path, upstream.dates)
+        return True
+    except (httpx.HTTPError, OSError, ValueError, KeyError) as e:
+        logger.warning(f"Could not refresh USDM release dates: {e}")
+        return False
+    finally:
+        lock.release()
+
+
+def get_date_index(reconcile_upstream=True):
+    """
+    Return the process-wide :class:`UsdmDateIndex`.
+
+    The index is rebuilt when the day changes or when another worker has
+    rewritten the persisted list. If that list is stale, a refresh is started
+    on a daemon thread and the current index is returned without waiting.
+    """
+    global _index, _index_day, _index_mtime, _fetched_at, _next_refresh
+    today = date.today()
+    try:
+        path = dates_cache_path()
+        mtime = os.path.getmtime(path) if os.path.exists(path) else None
+    except OSError:
+        path, mtime = None, None
+
+    with _lock:
+        if _index is None or _index_day != today or _index_mtime != mtime:
+            _index, _fetched_at = _build_index(today, path)
+            _index_day = today
+            _index_mtime = mtime
+        start_refresh = (
+            reconcile_upstream
+            and path is not None
+            and _is_stale(_fetched_at)
+            and time.monotonic() >= _next_refresh
+        )
+        if start_refresh:
+            _next_refresh = time.monotonic() + REFRESH_RETRY_INTERVAL
+        index = _index
+    if start_refresh:
+        threading.Thread(
+            target=refresh_cached_dates,
+            args=(today, path),
+            name="usdm-date-refresh",
+            daemon=True,
+        ).start()
+    return index
+
+
+def release_date(value):
+    """
+    ``value`` as a ``YYYYMMDD`` release date (see :meth:`UsdmDateIndex.validate`).
+    Values that are not ``YYYYMMDD`` dates fall back to the latest release
+    with a warning, so a driver can always be constructed.
+    """
+    index = get_date_index()
+    try:
+        return index.validate(value)
+    except ValueError as e:
+        latest = index.latest
+        if latest is None:
+            logger.error(f"Invalid USDM date {value!r} and no release dates to fall back to: {e}")
+            return value
+        logger.warning(f"Invalid USDM date {value!r}, using the latest release {latest:%Y-%m-%d}: {e}")
+        return latest.strftime(DATE_FORMAT)
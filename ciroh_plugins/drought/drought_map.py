@@ -1,6 +1,10 @@
 from intake.source import base
 import json
 import os
+from ..instrumentation import timed_read
+from ..profiling import profiled_read
+from ..utilities import cached_classproperty, classproperty
+from .dates import release_date
 from .utilities import get_drought_dates, get_geojson, get_service_dropdown, DATA_SERVICES
 
 
@@ -8,14 +12,23 @@ class DroughtMap(base.DataSource):
     container = "python"
     version = "0.0.4"
     name = "drought_map"
-    visualization_args = {}
     visualization_group = "Drought_Monitor"
     visualization_label = "Drought Map"
     visualization_type = "map"
-    visualization_args = {
-        "date": get_drought_dates(),
-        "service": get_service_dropdown(),
-    }
+
+    @classproperty
+    def visualization_args(cls):
+        # Built on every access so new USDM releases show up; only the
+        # static service options are cached.
+        return {
+            "date": get_drought_dates(),
+            "service": cls.service_options,
+        }
+
+    @cached_classproperty
+    def service_options(cls):
+        return get_service_dropdown()
+
     visualization_description = (
         "Provide various map services for the temperature, precipitation and drought. "
     )
@@ -26,7 +39,7 @@ class DroughtMap(base.DataSource):
     _user_parameters = []
 
     def __init__(self, date, service, metadata=None, **kwargs):
-        self.date = date
+        self.date = release_date(date)
         self.service_url = service
         if service.endswith('/'):
             self.service_url = service[:-1]
@@ -35,6 +48,8 @@ class DroughtMap(base.DataSource):
             self.layer = kwargs["service.Layer"]
         super(DroughtMap, self).__init__(metadata=metadata)
 
+    @profiled_read
+    @timed_read
     def read(self):
         geojson = self.get_usdm_layer()
         geojson['crs'] = {"type": "name", "properties": {"name": "EPSG:4326"}}
@@ -1,4 +1,6 @@
 from intake.source import base
+from ..instrumentation import timed_read
+from ..profiling import profiled_read
 import logging
 from .utilities import get_layers_dropdown
 
@@ -37,6 +39,8 @@ class DroughtMapLayerFinder(base.DataSource):
         self.service_key = self.service_url.split('/')[-2]
         super().__init__(metadata=metadata)
 
+    @profiled_read
+    @timed_read
     def read(self):
         """
         Read data from NWMP service and return a dictionary with title, data, and description.
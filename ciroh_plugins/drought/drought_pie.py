@@ -1,5 +1,10 @@
 from intake.source import base
 import httpx
+from ..instrumentation import decode_json, timed_read
+from ..profiling import profiled_read
+from ..transport import get as http_get
+from ..utilities import cached_classproperty, classproperty
+from .dates import release_date
 from .utilities import (
     get_drought_area_type_dropdown,
     get_drought_dates,
@@ -22,10 +27,20 @@ class DroughtDataGraph(base.DataSource):
         "outlook",
     ]
     visualization_description = "A pie chart depicting the percentage of drought coverage within a specified area"
-    visualization_args = {
-        "area_type": get_drought_area_type_dropdown(),
-        "date": get_drought_dates(),
-    }
+
+    @classproperty
+    def visualization_args(cls):
+        # Built on every access so new USDM releases show up; only the
+        # static area type options are cached.
+        return {
+            "area_type": cls.area_type_options,
+            "date": get_drought_dates(),
+        }
+
+    @cached_classproperty
+    def area_type_options(cls):
+        return get_drought_area_type_dropdown()
+
     visualization_group = "Drought_Monitor"
     visualization_label = "U.S. Drought Monitor Data Graph"
     visualization_type = "plotly"
@@ -36,10 +51,12 @@ class DroughtDataGraph(base.DataSource):
         self.api_base_url = "https://droughtmonitor.unl.edu/DmData/DataGraphs.aspx/ReturnTabularDMAreaPercent"
         self.area_type = area_type.split("-")[0]
         self.area = area_type.split("-")[1]
-        self.date = date
+        self.date = release_date(date)
         self.statistic_type = 2
         super(DroughtDataGraph, self).__init__(metadata=metadata)
 
+    @profiled_read
+    @timed_read
     def read(self):
         data = self.get_pie_data()
         layout = self.create_layout()
@@ -76,19 +93,17 @@ class DroughtDataGraph(base.DataSource):
 
     def get_pie_data(self):
         try:
-            client = httpx.Client(verify=False)
             params = {
                 "area": f'"{self.area}"',
                 "dt": f'"{self.date}"',
                 "statstype": self.statistic_type,
             }
-            response = client.get(
-                url=f"{self.api_base_url}_{self.area_type}",
-                timeout=None,
+            response = http_get(
+                f"{self.api_base_url}_{self.area_type}",
                 params=params,
                 headers={"Content-Type": "application/json"},
             )
-            data = response.json()
+            data = decode_json(response)
             unparsed_stats_data = data.get("d", [])
             labels = self._get_labels(unparsed_stats_data)
             values = self._get_values(unparsed_stats_data)
@@ -1,5 +1,10 @@
 from intake.source import base
 import httpx
+from ..instrumentation import decode_json, stage, timed_read
+from ..plotly_encoding import encode_figure, plotly_encoding
+from ..profiling import profiled_read
+from ..transport import get as http_get
+from ..utilities import cached_classproperty
 from .utilities import get_drought_area_type_dropdown, get_drought_index
 import logging
 
@@ -19,10 +24,14 @@ class DroughtDataTimeSeries(base.DataSource):
         "observed",
     ]
     visualization_description = "An interactive chart that depicts drought level percentage of areas within a specified domain"
-    visualization_args = {
-        "area_type": get_drought_area_type_dropdown(),
-        "data_index": get_drought_index(),
-    }
+
+    @cached_classproperty
+    def visualization_args(cls):
+        return {
+            "area_type": get_drought_area_type_dropdown(),
+            "data_index": get_drought_index(),
+        }
+
     visualization_group = "Drought_Monitor"
     visualization_label = "U.S. Drought Monitor Data Time Series"
     visualization_type = "plotly"
@@ -36,31 +45,32 @@ class DroughtDataTimeSeries(base.DataSource):
         self.statistic_type = 1
         super(DroughtDataTimeSeries, self).__init__(metadata=metadata)
 
+    @profiled_read
+    @timed_read
     def read(self):
         data = self._get_data_time_series()
-        traces = (
-            self.create_usdm_traces(data)
-            if self.data_index == "usdm"
-            else self.create_dsci_traces(data)
-        )
+        with stage("build_traces"):
+            traces = (
+                self.create_usdm_traces(data)
+                if self.data_index == "usdm"
+                else self.create_dsci_traces(data)
+            )
         layout = self.create_layout()
-        return {"data": traces, "layout": layout}
+        return encode_figure({"data": traces, "layout": layout}, plotly_encoding(self))
 
     def _get_data_time_series(self):
         try:
-            client = httpx.Client(verify=False)
             params = {
                 "area": f'"{self.area}"',
                 "type": f'"{self.area_type}"',
                 "statstype": self.statistic_type,
             }
-            response = client.get(
-                url=f"{self.api_base_url}",
-                timeout=None,
+            response = http_get(
+                f"{self.api_base_url}",
                 params=params,
                 headers={"Content-Type": "application/json"},
             )
-            data = response.json()
+            data = decode_json(response)
             unparsed_timeseries = data.get("d", [])
             if len(unparsed_timeseries) < 1:
                 return []
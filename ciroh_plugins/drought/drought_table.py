@@ -1,5 +1,9 @@
 from intake.source import base
 import httpx
+from ..instrumentation import decode_json, timed_read
+from ..profiling import profiled_read
+from ..transport import get as http_get
+from ..utilities import cached_classproperty
 from .utilities import (
     get_drought_area_type_dropdown,
     get_drought_statistic_type,
@@ -23,11 +27,15 @@ class DroughtDataTable(base.DataSource):
         "outlook",
     ]
     visualization_description = "A table indicating the drought indices and other information for a specific area and data type"
-    visualization_args = {
-        "area_type": get_drought_area_type_dropdown(),
-        "statistic_type": get_drought_statistic_type(),
-        "data_type": get_drought_data_type(),
-    }
+
+    @cached_classproperty
+    def visualization_args(cls):
+        return {
+            "area_type": get_drought_area_type_dropdown(),
+            "statistic_type": get_drought_statistic_type(),
+            "data_type": get_drought_data_type(),
+        }
+
     visualization_group = "Drought_Monitor"
     visualization_label = "U.S. Drought Monitor Data Table"
     visualization_type = "custom"
@@ -47,6 +55,8 @@ class DroughtDataTable(base.DataSource):
         self.data_type = data_type
         super(DroughtDataTable, self).__init__(metadata=metadata)
 
+    @profiled_read
+    @timed_read
     def read(self):
         table_data = self.get_data_table()
         return {
@@ -60,19 +70,17 @@ class DroughtDataTable(base.DataSource):
 
     def get_data_table(self):
         try:
-            client = httpx.Client(verify=False)
             params = {
                 "area": f"'{self.area}'",
                 "statstype": f"'{self.statistic_type[0]}'",
                 "diff": f"'{self.data_type}'",
             }
-            r = client.get(
-                url=f"{self.api_base_url}_{self.area_type}",
-                timeout=None,
+            r = http_get(
+                f"{self.api_base_url}_{self.area_type}",
                 params=params,
                 headers={"Content-Type": "application/json"},
             )
-            data = r.json()
+            data = decode_json(r)
             return data.get("d", [])
         except httpx.HTTPError as exc:
             logger.error(f"Error while requesting {exc.request.url!r}: {exc}")
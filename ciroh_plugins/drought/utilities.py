@@ -2,7 +2,10 @@ import httpx
 import logging
 import os
 import json
-from datetime import datetime, date
+from ..cache import cached_get
+from ..instrumentation import decode_json
+from .area_types import get_area_type_catalog
+from .dates import get_date_index
 
 
 DATA_DIR_PATH = f'{os.path.dirname(__file__)}/data'
@@ -38,9 +41,15 @@ def get_drought_statistic_type():
 
 
 def get_drought_area_type_dropdown():
-    with open(f'{DATA_DIR_PATH}/drought_area_types.json') as file:
-        drought_area_types = json.load(file)
-    return drought_area_types
+    return get_area_type_catalog().dropdown()
+
+
+def search_drought_area_types(group=None, prefix=None, offset=0, limit=50):
+    """
+    Page through the area types, e.g. ``search_drought_area_types("County", "San")``.
+    See ``AreaTypeCatalog.query`` for the result format.
+    """
+    return get_area_type_catalog().query(group=group, prefix=prefix, offset=offset, limit=limit)
 
 
 def get_drought_data_type():
@@ -80,62 +89,23 @@ def get_drought_index():
 
 
 def get_drought_dates():
-    DATE_FORMAT = '%Y%m%d'
-    today = date.today()
-    today_str = today.strftime(DATE_FORMAT)
-    today_day_name = today.strftime('%A')
-
-    need_new_data = True
-    filename = f'drought_plugin_dates-{today_str}.json'
-    for file in os.listdir(DATA_DIR_PATH):
-        if file.startswith('drought_plugin_dates'):
-            old_date = datetime.strptime(file.split('-')[1].split('.')[0], DATE_FORMAT)
-            day_diff = (datetime.strptime(today_str, DATE_FORMAT) - old_date).days
-            # dates update every Tuesday
-            if day_diff < 7 and (today_str != old_date and today_day_name != 'Tuesday'):
-                need_new_data = False
-                filename = file
-                break
-            else:  # delete old data file
-                os.remove(os.path.join(DATA_DIR_PATH, file))
-
-    print(f'Getting dates for drought:{" does not" if not need_new_data else ""} need new data')
-    filepath = os.path.join(DATA_DIR_PATH, filename)
-    if not need_new_data:
-        with open(filepath, 'r') as file:
-            dropdown_items = json.load(file)
-    else:
-        api_endpoint = "https://droughtmonitor.unl.edu/Maps/CompareTwoWeeks.aspx/ReturnDates"
-        client = httpx.Client(verify=False)
-        response = client.get(
-            f"{api_endpoint}", headers={"Content-Type": "application/json"}
-        )
-        data = response.json()
-        dropdown_item = {"label": "Drought Dates", "options": []}
-        for item in data.get("d", []):
-            dropdown_item["options"].append(
-                {"value": f'{item.get("Value")}', "label": item.get("Text")}
-            )
-        dropdown_items = [dropdown_item]
-        with open(filepath, "w") as file:
-            json.dump(dropdown_items, file)
-
-    return dropdown_items
+    """
+    USDM release dates dropdown, newest first. Dates are computed from the
+    weekly release schedule and reconciled against the upstream list in the
+    background (see ``dates.get_date_index``).
+    """
+    return [{"label": "Drought Dates", "options": get_date_index().options()}]
 
 
 def get_geojson(url):
     try:
-        with httpx.Client(verify=False) as client:
-            r = client.get(
-                url=url,
-                timeout=None,
-            )
-            if r.status_code != 200:
-                logger.error(f"Error: {r.status_code}")
-                logger.error(r.text)
-                return None
-            else:
-                return r.json()
+        r = cached_get(url)
+        if r.status_code != 200:
+            logger.error(f"Error: {r.status_code}")
+            logger.error(r.text)
+            return None
+        else:
+            return decode_json(r)
     except httpx.HTTPError as exc:
         logger.error(f"Error while requesting {exc.request.url!r}: {exc}")
         return None
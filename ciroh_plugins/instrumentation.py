@@ -0,0 +1,224 @@
+"""
+Hook based instrumentation of upstream requests and CPU stages.
+
+Code under measurement wraps a unit of work in :func:`stage`::
+
+    with stage("http", method="GET", url=url) as event:
+        response = client.get(url)
+        event["status"] = response.status_code
+        event["bytes"] = len(response.content)
+
+Each finished stage produces an event dict holding ``stage``,
+``duration_ms`` and whatever fields were set along the way (``url``,
+``bytes``, ``status``, ``cache``, ``retries``, ``error``, ...). Events are
+handed to every registered hook (:func:`add_hook`) and appended to the
+breakdown of the ``read()`` being timed, if any. With no hook and no timed
+read the stages are not timed at all.
+
+:class:`Collector` is a hook keeping recent events and per-stage totals that
+can be scraped or logged. ``CIROH_PLUGINS_INSTRUMENTATION=1`` installs the
+process-wide collector returned by :func:`get_collector` at import.
+
+Drivers decorate ``read`` with :func:`timed_read`; creating a driver with
+``metadata={"timings": True}`` adds a ``"timings"`` breakdown next to the
+payload returned by ``read()``.
+"""
+import contextvars
+import functools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_hooks = ()
+# Events of the read() currently being timed in this context, or None.
+_breakdown = contextvars.ContextVar("ciroh_plugins_breakdown", default=None)
+
+
+def add_hook(hook):
+    """Call ``hook(event)`` for every finished stage."""
+    global _hooks
+    with _lock:
+        if hook not in _hooks:
+            _hooks = _hooks + (hook,)
+
+
+def remove_hook(hook):
+    global _hooks
+    with _lock:
+        _hooks = tuple(h for h in _hooks if h is not hook)
+
+
+def emit(event):
+    """Deliver a finished ``event`` to the current breakdown and the hooks."""
+    records = _breakdown.get()
+    if records is not None:
+        records.append(event)
+    for hook in _hooks:
+        try:
+            hook(event)
+        except Exception as e:
+            logger.error(f"Instrumentation hook {hook!r} failed: {e}")
+
+
+@contextmanager
+def stage(name, **fields):
+    """Time the enclosed block as stage ``name``; yields the event dict."""
+    if not _hooks and _breakdown.get() is None:
+        yield fields
+        return
+    event = {"stage": name, **fields}
+    start = time.perf_counter()
+    try:
+        yield event
+    except BaseException as exc:
+        event.setdefault("error", type(exc).__name__)
+        raise
+    finally:
+        event["duration_ms"] = (time.perf_counter() - start) * 1000
+        emit(event)
+
+
+def decode_json(response):
+    """``response.json()`` recorded as a ``json_decode`` stage."""
+    with stage("json_decode", url=str(response.url), bytes=len(response.content)):
+        return response.json()
+
+
+def summarize(events):
+    """Aggregate ``events`` into ``{stage: {count, duration_ms, bytes, ...}}``."""
+    totals = {}
+    for event in events:
+        total = totals.setdefault(
+            event["stage"], {"count": 0, "duration_ms": 0.0, "bytes": 0, "errors": 0}
+        )
+        total["count"] += 1
+        total["duration_ms"] += event.get("duration_ms", 0.0)
+        total["bytes"] += event.get("bytes") or 0
+        if "error" in event:
+            total["errors"] += 1
+        if event.get("retries"):
+            total["retries"] = total.get("retries", 0) + event["retries"]
+        if "cache" in event:
+            cache = total.setdefault("cache", {})
+            cache[event["cache"]] = cache.get(event["cache"], 0) + 1
+    return totals
+
+
+class Collector:
+    """Hook keeping the most recent events and running per-stage totals."""
+
+    def __init__(self, maxlen=1000):
+        self.events = deque(maxlen=maxlen)
+        self.totals = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        with self._lock:
+            self.events.append(event)
+            for name, total in summarize([event]).items():
+                current = self.totals.setdefault(name, {})
+                for key, value in total.items():
+                    if isinstance(value, dict):
+                        counts = current.setdefault(key, {})
+                        for k, v in value.items():
+                            counts[k] = counts.get(k, 0) + v
+                    else:
+                        current[key] = current.get(key, 0) + value
+
+    def recent(self, count=None):
+        with self._lock:
+            events = list(self.events)
+        return events if count is None else events[-count:]
+
+    def summary(self):
+        with self._lock:
+            return {
+                name: {k: dict(v) if isinstance(v, dict) else v for k, v in total.items()}
+                for name, total in self.totals.items()
+            }
+
+    def clear(self):
+        with self._lock:
+            self.events.clear()
+            self.totals.clear()
+
+    def log(self, level=logging.INFO):
+        """Write one line per stage to this module's logger."""
+        for name, total in sorted(self.summary().items()):
+            logger.log(
+                level,
+                f"{name}: {total['count']} calls, {total['duration_ms']:.1f} ms, "
+                f"{total['bytes']} bytes, {total['errors']} errors"
+                + (f", cache {total['cache']}" if "cache" in total else ""),
+            )
+
+
+_collector = None
+
+
+def get_collector():
+    """Return the process-wide collector, registering it as a hook on first use."""
+    global _collector
+    if _collector is None:
+        with _lock:
+            if _collector is None:
+                _collector = Collector()
+        add_hook(_collector)
+    return _collector
+
+
+def read_option(source, name, default=None):
+    """
+    Return option ``name`` from the metadata a driver was created with.
+
+    Some drivers replace ``self.metadata`` with upstream metadata during
+    ``read()``, so the captured constructor arguments are checked first.
+    """
+    captured = getattr(source, "_captured_init_kwargs", {}).get("metadata")
+    for metadata in (captured, getattr(source, "metadata", None)):
+        if isinstance(metadata, dict) and name in metadata:
+            return metadata[name]
+    return default
+
+
+def timed_read(read):
+    """
+    Decorator for ``DataSource.read``: with the ``timings`` metadata option
+    set, the returned payload gains a ``"timings"`` entry holding the total
+    duration, per-stage totals and the individual events of the read.
+    """
+
+    @functools.wraps(read)
+    def wrapper(self, *args, **kwargs):
+        if not read_option(self, "timings"):
+            return read(self, *args, **kwargs)
+        events = []
+        token = _breakdown.set(events)
+        start = time.perf_counter()
+        try:
+            result = read(self, *args, **kwargs)
+        finally:
+            total_ms = (time.perf_counter() - start) * 1000
+            _breakdown.reset(token)
+        if isinstance(result, dict):
+            result = {
+                **result,
+                "timings": {
+                    "total_ms": total_ms,
+                    "stages": summarize(events),
+                    "events": events,
+                },
+            }
+        return result
+
+    return wrapper
+
+
+if os.environ.get("CIROH_PLUGINS_INSTRUMENTATION", "0") not in ("", "0"):
+    get_collector()
@@ -0,0 +1,238 @@
+"""
+ArcGIS REST ``query`` requests for the statistics of :class:`~.service.NWMPService`.
+
+pygeoogc's ``ArcGISRESTful`` always downloads whole features, one polygon
+part and one page at a time. When a HUC summary only needs counts or a
+single attribute, these helpers ask the query endpoint for just that, and
+when it does need the features they query the parts and pages
+concurrently. Requests go through the shared transport (pooled client,
+upstream overrides, timings).
+"""
+import asyncio
+import json
+import logging
+
+import httpx
+
+from ..instrumentation import decode_json
+from ..transport import arequest, request
+
+logger = logging.getLogger(__name__)
+
+
+class ArcGISQueryError(Exception):
+    """Error reported in the body of an ArcGIS query response."""
+
+
+class IncompletePagesError(ArcGISQueryError):
+    """Raised by :func:`query_pages` after the other pages when some of them failed."""
+
+    def __init__(self, failed, total):
+        super().__init__(f"{failed} of {total} pages failed")
+        self.failed = failed
+        self.total = total
+
+
+def polygon_parts(geometry):
+    """The polygons of a shapely Polygon or MultiPolygon."""
+    from shapely.geometry import MultiPolygon
+
+    return list(geometry.geoms) if isinstance(geometry, MultiPolygon) else [geometry]
+
+
+def esri_polygon(geometry):
+    """
+    Esri JSON polygon of a shapely (Multi)Polygon in WGS 84. Every part
+    becomes a clockwise exterior ring followed by its counterclockwise
+    holes, so a MultiPolygon is sent as one geometry.
+    """
+    from shapely.geometry.polygon import orient
+
+    rings = []
+    for polygon in polygon_parts(geometry):
+        polygon = orient(polygon, sign=-1.0)
+        for ring in [polygon.exterior, *polygon.interiors]:
+            rings.append([[x, y] for x, y, *_ in ring.coords])
+    return {"rings": rings, "spatialReference": {"wkid": 4326}}
+
+
+def spatial_filter(geometry, spatial_relation="esriSpatialRelContains"):
+    """Query parameters selecting the features related to ``geometry``."""
+    return {
+        "geometry": json.dumps(esri_polygon(geometry), separators=(",", ":")),
+        "geometryType": "esriGeometryPolygon",
+        "inSR": 4326,
+        "spatialRel": spatial_relation,
+    }
+
+
+def object_id_field(layer_info):
+    """Name of the object id field of a layer (``OBJECTID`` if not described)."""
+    if layer_info.get("objectIdField"):
+        return layer_info["objectIdField"]
+    for field in layer_info.get("fields") or []:
+        if field.get("type") == "esriFieldTypeOID":
+            return field["name"]
+    return "OBJECTID"
+
+
+def supports_statistics(layer_info):
+    """Whether the layer advertises ``outStatistics`` support (assumed if unknown)."""
+    advanced = layer_info.get("advancedQueryCapabilities") or {}
+    return advanced.get("supportsStatistics", layer_info.get("supportsStatistics", True)) is not False
+
+
+def decode_page(response):
+    """The decoded JSON of a query response, raising on HTTP and ArcGIS errors."""
+    response.raise_for_status()
+    payload = decode_json(response)
+    if "error" in payload:
+        error = payload["error"]
+        raise ArcGISQueryError(f"{error.get('code')}: {error.get('message')} {error.get('details') or ''}".strip())
+    return payload
+
+
+def query(layer_url, params):
+    """
+    POST ``params`` to the layer's ``query`` endpoint (geometries easily
+    exceed URL limits) and return the decoded JSON response.
+    """
+    return decode_page(request("POST", f"{layer_url.rstrip('/')}/query", data={"f": "json", **params}))
+
+
+async def aquery(layer_url, params):
+    """Async counterpart of :func:`query`."""
+    return decode_page(await arequest("POST", f"{layer_url.rstrip('/')}/query", data={"f": "json", **params}))
+
+
+def _attribute(attributes, name):
+    # Servers may return field names in a different case than requested.
+    if name in attributes:
+        return attributes[name]
+    lowered = name.lower()
+    for key, value in attributes.items():
+        if key.lower() == lowered:
+            return value
+    raise KeyError(name)
+
+
+def count_by(layer_url, geometry, field, count_field="OBJECTID", spatial_relation="esriSpatialRelContains"):
+    """
+    ``{value of field: feature count}`` over the features related to
+    ``geometry``, computed by the server with ``outStatistics`` grouped by
+    ``field``. No feature is transferred.
+    """
+    statistics = [{
+        "statisticType": "count",
+        "onStatisticField": count_field,
+        "outStatisticFieldName": "feature_count",
+    }]
+    payload = query(layer_url, {
+        **spatial_filter(geometry, spatial_relation),
+        "where": "1=1",
+        "outStatistics": json.dumps(statistics),
+        "groupByFieldsForStatistics": field,
+        "returnGeometry": "false",
+    })
+    counts = {}
+    for feature in payload.get("features", []):
+        attributes = feature.get("attributes") or {}
+        value = _attribute(attributes, field)
+        counts[value] = counts.get(value, 0) + int(_attribute(attributes, "feature_count") or 0)
+    return counts
+
+
+def page_size(layer_info, default=1000):
+    """Features per request: the layer's ``maxRecordCount``."""
+    try:
+        return max(1, int(layer_info.get("maxRecordCount") or default))
+    except (TypeError, ValueError):
+        return default
+
+
+async def object_ids(layer_url, geometry, spatial_relation="esriSpatialRelContains"):
+    """Object ids of the features related to ``geometry`` (not limited by ``maxRecordCount``)."""
+    payload = await aquery(layer_url, {
+        **spatial_filter(geometry, spatial_relation),
+        "where": "1=1",
+        "returnIdsOnly": "true",
+    })
+    return payload.get("objectIds") or []
+
+
+async def object_ids_by_part(layer_url, geometry, spatial_relation="esriSpatialRelContains", concurrency=4):
+    """
+    Sorted, unique object ids of the features related to any polygon of
+    ``geometry``, queried part by part with up to ``concurrency`` parts in
+    flight. A part whose query fails is logged and skipped.
+    """
+    import numpy as np
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def part_ids(part):
+        async with semaphore:
+            try:
+                return await object_ids(layer_url, part, spatial_relation)
+            except (httpx.HTTPError, ArcGISQueryError, ValueError) as e:
+                logger.error(f"Error fetching object ids for a geometry: {e}")
+                return []
+
+    parts = await asyncio.gather(*(part_ids(part) for part in polygon_parts(geometry)))
+    return np.unique(np.concatenate([np.asarray(ids, dtype=np.int64) for ids in parts])).tolist()
+
+
+async def query_pages(layer_url, oids, params, size=1000, concurrency=4, decode=True):
+    """
+    Yield the decoded responses to ``params`` for the features ``oids``, one
+    page of ``size`` ids per request with up to ``concurrency`` requests in
+    flight, in the order they complete. Responses are only decoded when
+    consumed, so at most one page is held decoded at a time. With
+    ``decode=False`` the responses themselves are yielded, for callers that
+    decode them (:func:`decode_page`) outside the event loop.
+
+    A page that fails is logged and the other pages keep going; once they
+    have all been yielded, :class:`IncompletePagesError` tells the caller
+    the result is partial.
+    """
+    url = f"{layer_url.rstrip('/')}/query"
+
+    async def fetch(start):
+        ids = ",".join(str(oid) for oid in oids[start:start + size])
+        return await arequest("POST", url, data={"f": "json", **params, "objectIds": ids})
+
+    total = len(range(0, len(oids), size))
+    starts = iter(range(0, len(oids), size))
+    pending = set()
+    failed = 0
+    try:
+        while True:
+            for start in starts:
+                pending.add(asyncio.ensure_future(fetch(start)))
+                if len(pending) >= concurrency:
+                    break
+            if not pending:
+                break
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                try:
+                    payload = task.result()
+                    if decode:
+                        payload = decode_page(payload)
+                    else:
+                        payload.raise_for_status()
+                except (httpx.HTTPError, ArcGISQueryError, ValueError) as e:
+                    failed += 1
+                    logger.error(f"Error fetching a page of {layer_url}: {e!r}")
+                    continue
+                yield payload
+    finally:
+        for task in pending:
+            task.cancel()
+    if failed:
+        raise IncompletePagesError(failed, total)
+
+
+def field_values(payload, field):
+    """The ``field`` value of every feature of a query response."""
+    return [_attribute(feature.get("attributes") or {}, field) for feature in payload.get("features", [])]
@@ -0,0 +1,152 @@
+"""
+Process-wide store of the latest stageflow series of each gauge.
+
+The NWPS API always returns a gauge's whole observed window (about 30 days)
+and forecast, while a refresh a few minutes later usually adds one or two
+observations. The store keeps every gauge's series as NumPy columns and,
+on each refresh, only converts the observations newer than the last one it
+holds. Observations that fell out of the upstream window are dropped. The
+forecast block is rebuilt only when its ``issuedTime`` changes. Trace
+building then works on whole columns instead of on every point's dict.
+
+``CIROH_PLUGINS_GAUGE_STORE_SIZE`` bounds the number of gauges kept (least
+recently refreshed first out, ``0`` disables retention).
+"""
+import os
+import threading
+from collections import OrderedDict
+
+DATASETS = ("observed", "forecast")
+
+
+class SeriesBlock:
+    """
+    One dataset (observed or forecast) of a gauge: its ``validTime``
+    strings, primary and secondary values (NaN where missing) and the
+    dataset's other fields (units, names, ``issuedTime``), which
+    :meth:`get` reads like the upstream dict.
+    """
+
+    __slots__ = ("times", "primary", "secondary", "meta")
+
+    def __init__(self, times, primary, secondary, meta):
+        self.times = times
+        self.primary = primary
+        self.secondary = secondary
+        self.meta = meta
+
+    def __len__(self):
+        return len(self.times)
+
+    def get(self, key, default=None):
+        return self.meta.get(key, default)
+
+    @classmethod
+    def from_points(cls, points, meta):
+        import numpy as np
+
+        points = [point for point in points if "validTime" in point]
+        return cls(
+            np.array([point["validTime"] for point in points], dtype=str),
+            np.array([point.get("primary") for point in points], dtype=float),
+            np.array([point.get("secondary") for point in points], dtype=float),
+            meta,
+        )
+
+    @classmethod
+    def from_dataset(cls, dataset):
+        meta = {key: value for key, value in dataset.items() if key != "data"}
+        return cls.from_points(dataset.get("data") or [], meta)
+
+    def merge(self, dataset):
+        """
+        Return this block updated with the observations of ``dataset`` newer
+        than the last one held, trimmed to the window ``dataset`` covers.
+        """
+        import numpy as np
+
+        points = dataset.get("data") or []
+        if not len(self) or not points or "validTime" not in points[-1]:
+            return SeriesBlock.from_dataset(dataset)
+        last = self.times[-1]
+        if points[-1]["validTime"] < last or points[0].get("validTime", "") > last:
+            # Upstream went back in time or skipped past everything we hold.
+            return SeriesBlock.from_dataset(dataset)
+
+        # Points are in time order, so the new ones are at the tail.
+        start = len(points)
+        while start and points[start - 1].get("validTime", "") > last:
+            start -= 1
+        meta = {key: value for key, value in dataset.items() if key != "data"}
+        new = SeriesBlock.from_points(points[start:], meta)
+        keep = int(np.searchsorted(self.times, points[0]["validTime"]))
+        if not len(new) and not keep:
+            return SeriesBlock(self.times, self.primary, self.secondary, meta)
+        return SeriesBlock(
+            np.concatenate([self.times[keep:], new.times]),
+            np.concatenate([self.primary[keep:], new.primary]),
+            np.concatenate([self.secondary[keep:], new.secondary]),
+            meta,
+        )
+
+
+class GaugeStore:
+    """LRU mapping of gauge id to ``{"observed": SeriesBlock, "forecast": SeriesBlock}``."""
+
+    def __init__(self, size=256):
+        self.size = size
+        self._series = OrderedDict()
+        self._lock = threading.Lock()
+
+    def update(self, gauge_id, stageflow):
+        """Merge the stageflow document of ``gauge_id`` and return its series."""
+        with self._lock:
+            previous = self._series.get(gauge_id, {})
+        series = {}
+        for name in DATASETS:
+            dataset = stageflow.get(name)
+            if not isinstance(dataset, dict):
+                continue
+            block = previous.get(name)
+            if block is None:
+                series[name] = SeriesBlock.from_dataset(dataset)
+            elif name == "forecast":
+                if dataset.get("issuedTime") != block.get("issuedTime") or not dataset.get("issuedTime"):
+                    series[name] = SeriesBlock.from_dataset(dataset)
+                else:
+                    series[name] = block
+            else:
+                series[name] = block.merge(dataset)
+        if self.size > 0:
+            with self._lock:
+                self._series[gauge_id] = series
+                self._series.move_to_end(gauge_id)
+                while len(self._series) > self.size:
+                    self._series.popitem(last=False)
+        return series
+
+    def get(self, gauge_id):
+        with self._lock:
+            return self._series.get(gauge_id)
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+def _store_size():
+    try:
+        return int(os.environ.get("CIROH_PLUGINS_GAUGE_STORE_SIZE", 256))
+    except ValueError:
+        return 256
+
+
+_store = None
+
+
+def get_gauge_store():
+    """Return the process-wide gauge store."""
+    global _store
+    if _store is None:
+        _store = GaugeStore(_store_size())
+    return _store
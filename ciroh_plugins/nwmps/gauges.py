@@ -1,13 +1,22 @@
 from intake.source import base
+import asyncio
 import httpx
-from .utilities import get_metadata_from_api
-from datetime import datetime
+from ..async_runner import run
+from ..instrumentation import decode_json, stage, timed_read
+from ..plotly_encoding import encode_figure, json_values, plotly_encoding
+from ..profiling import profiled_read
+from ..transport import aget as http_aget
+from .gauge_store import SeriesBlock, get_gauge_store
+from .utilities import aget_metadata_from_api
 import logging
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# d3-time-format of the hover time, e.g. "Mon January 06 2025 01:00:00 PM".
+HOVER_TIME_FORMAT = "%a %B %d %Y %I:%M:%S %p"
+
 
 # This will be used for the TimeSeries of the NWM data
 class NWMPSGaugesSeries(base.DataSource):
@@ -26,42 +35,153 @@ class NWMPSGaugesSeries(base.DataSource):
         "rfc",
     ]
     visualization_description = "An interactive chart of observed and forecasted streamflows (if available) for RFC gauges. Gauge action and above stages are also available in the plot"
-    visualization_args = {"id": "text"}
+    visualization_args = {
+        "id": "text",
+        "figures": [
+            {
+                "label": "Figures",
+                "options": [
+                    {"label": "Combined", "value": "combined"},
+                    {"label": "One per gauge", "value": "separate"},
+                ],
+            }
+        ],
+    }
     visualization_group = "NWMP"
     visualization_label = "NWMP Gauges Time Series"
     visualization_type = "plotly"
     visualization_attribution = "NOAA"
+    # Gauges fetched at once in batch mode (each one issues two requests).
+    max_concurrent_gauges = 10
 
-    def __init__(self, id, metadata=None):
+    def __init__(self, id, figures="combined", metadata=None):
+        """
+        ``id`` is a gauge LID, a list of LIDs or a comma separated string of
+        LIDs. With several gauges, ``figures`` selects one ``"combined"``
+        figure or one figure per gauge (``"separate"``).
+        """
         self.api_base_url = "https://api.water.noaa.gov/nwps/v1"
-        self.id = id
+        self.ids = parse_gauge_ids(id)
+        self.id = ",".join(self.ids)
+        self.figures = figures
         self.data = None
         self.metadata = None
         super(NWMPSGaugesSeries, self).__init__(metadata=metadata)
 
+    @profiled_read
+    @timed_read
     def read(self):
-        self.data = self.get_gauge_data()
-        self.metadata = get_metadata_from_api(self.api_base_url, self.id, "gauges")
-        traces = self.create_traces()
-        flood_data = self.metadata.get("flood", {})
-        shapes, annotations = self.create_flood_events(flood_data)
-        secondary_range = self.get_secondary_data_range(self.data)
-        layout = self.create_layout(shapes, annotations, secondary_range)
+        # Only the requests run on the shared loop; the figures are built in
+        # this thread so a large batch never holds up the I/O of other drivers.
+        return self.build_figure(run(self.fetch_gauges(self.ids)))
+
+    async def read_async(self):
+        """
+        Fetch the stageflow and metadata of every gauge concurrently, so a
+        single gauge costs the slower of its two requests instead of both.
+        """
+        results = await self.fetch_gauges(self.ids)
+        return await asyncio.to_thread(self.build_figure, results)
+
+    def build_figure(self, results):
+        """
+        Merge the stageflows of :meth:`fetch_gauges` into the gauge store and
+        return the encoded figure (or figures) of the gauges.
+        """
+        store = get_gauge_store()
+        with stage("gauge_store"):
+            results = [
+                (gauge_id, None if data is None else store.update(gauge_id, data), metadata)
+                for gauge_id, data, metadata in results
+            ]
+        if len(self.ids) == 1:
+            _, self.data, self.metadata = results[0]
+            self.data = self.data or {}
+            self.metadata = self.metadata or {}
+            figure = self.create_figure(self.id, self.data, self.metadata)
+        else:
+            figure = self.create_batch_figures(results)
+        return encode_figure(figure, plotly_encoding(self))
+
+    def create_batch_figures(self, results):
+        """Build the combined or per-gauge figures of a batch read."""
+        gauges = []
+        for gauge_id, data, metadata in results:
+            if data is None or metadata is None:
+                logger.warning(f"Skipping gauge {gauge_id}: no data or metadata")
+                continue
+            gauges.append((gauge_id, data, metadata))
+
+        if self.figures == "separate":
+            return {
+                "figures": [
+                    self.create_figure(gauge_id, data, metadata)
+                    for gauge_id, data, metadata in gauges
+                ]
+            }
+        return self.create_combined_figure(gauges)
+
+    async def fetch_gauges(self, gauge_ids):
+        """
+        Return ``[(gauge_id, stageflow, metadata)]`` fetched concurrently
+        (see :meth:`build_figure` for the merge into the gauge store).
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrent_gauges)
+
+        async def fetch(gauge_id):
+            async with semaphore:
+                data, metadata = await asyncio.gather(
+                    self.aget_gauge_data(gauge_id),
+                    aget_metadata_from_api(self.api_base_url, gauge_id, "gauges"),
+                )
+            return gauge_id, data, metadata
+
+        return await asyncio.gather(*(fetch(gauge_id) for gauge_id in gauge_ids))
+
+    def create_figure(self, gauge_id, data, metadata):
+        with stage("build_traces"):
+            traces = self.create_traces(data)
+        shapes, annotations = self.create_flood_events(metadata.get("flood", {}))
+        secondary_range = self.get_secondary_data_range(data)
+        layout = self.create_layout(
+            shapes, annotations, secondary_range, data, metadata, gauge_id
+        )
+        return {"data": traces, "layout": layout}
+
+    def create_combined_figure(self, gauges):
+        """
+        One figure with the series of every gauge. Flood stages differ per
+        gauge, so the flood category lines are left out.
+        """
+        traces = []
+        secondary_values = []
+        with stage("build_traces"):
+            for gauge_id, data, _metadata in gauges:
+                traces.extend(self.create_traces(data, name_prefix=f"{gauge_id} "))
+                secondary_values.extend(self.get_secondary_data_range(data))
+        secondary_range = (
+            (min(secondary_values), max(secondary_values)) if secondary_values else (0, 1)
+        )
+        data = gauges[0][1] if gauges else {}
+        layout = self.create_layout([], [], secondary_range, data, {}, self.id)
+        layout["title"] = "<b>Gauges</b>: {} <br><sub>IDs:{}</sub>".format(
+            len(gauges), ", ".join(gauge_id for gauge_id, _, _ in gauges)
+        )
         return {"data": traces, "layout": layout}
 
-    def get_gauge_data(self):
+    def get_gauge_data(self, gauge_id=None):
+        """Blocking :meth:`aget_gauge_data`, run on the shared event loop."""
+        return run(self.aget_gauge_data(gauge_id or self.id))
+
+    async def aget_gauge_data(self, gauge_id):
         try:
-            with httpx.Client(verify=False) as client:
-                r = client.get(
-                    url=f"{self.api_base_url}/gauges/{self.id}/stageflow",
-                    timeout=None,
-                )
-                if r.status_code != 200:
-                    logger.error(f"Error: {r.status_code}")
-                    logger.error(r.text)
-                    return None
-                else:
-                    return r.json()
+            r = await http_aget(f"{self.api_base_url}/gauges/{gauge_id}/stageflow")
+            if r.status_code != 200:
+                logger.error(f"Error: {r.status_code}")
+                logger.error(r.text)
+                return None
+            else:
+                return decode_json(r)
         except httpx.HTTPError as exc:
             logger.error(f"Error while requesting {exc.request.url!r}: {exc}")
             return None
@@ -69,38 +189,58 @@ class NWMPSGaugesSeries(base.DataSource):
             logger.error(f"Unexpected error: {e}")
             return None
 
-    def create_traces(self):
+    def create_traces(self, data=None, name_prefix=""):
+        """
+        One line per dataset (observed, forecast) of ``data``, a stageflow
+        document or its :class:`~.gauge_store.SeriesBlock` columns. Hover
+        labels come from a single ``hovertemplate`` formatted by plotly in
+        the browser, with the secondary values (e.g. flow) passed as
+        ``customdata``.
+        """
+        data = self.data if data is None else data
         traces = []
         datasets = ["observed", "forecast"]
 
         for dataset_name in datasets:
-            if dataset_name in self.data:
-                dataset = self.data[dataset_name]
-                data_points = dataset.get("data", [])
-
-                if data_points:
-                    times = [d["validTime"] for d in data_points]
-                    primary_values = [d.get("primary", None) for d in data_points]
-                    secondary_values = [d.get("secondary", None) for d in data_points]
-
-                    hover_text = []
-                    for t, p, s in zip(times, primary_values, secondary_values):
-                        utc_time = datetime.strptime(t, "%Y-%m-%dT%H:%M:%SZ")
-                        formatted_time = utc_time.strftime("%a %B %d %Y %I:%M:%S %p")
-                        text = f"Time: {formatted_time}<br>{dataset.get('primaryUnits')}: {p}"
-                        if s is not None and s >= 0:
-                            text += f"<br>{dataset.get('secondaryUnits')}: {s}"
-                        hover_text.append(text)
+            if dataset_name in data:
+                dataset = as_block(data[dataset_name])
+
+                if len(dataset):
+                    times = dataset.times.tolist()
+                    primary_values = json_values(dataset.primary)
+
+                    # Negative secondary values are missing-value flags.
+                    secondary = dataset.secondary
+                    valid = secondary >= 0
+                    hovertemplate = (
+                        f"Time: %{{x|{HOVER_TIME_FORMAT}}}"
+                        f"<br>{dataset.get('primaryUnits')}: %{{y}}"
+                    )
+                    if valid.all():
+                        customdata = secondary.tolist()
+                        hovertemplate += f"<br>{dataset.get('secondaryUnits')}: %{{customdata}}"
+                    elif valid.any():
+                        # A template cannot skip a line per point, so the
+                        # secondary line is passed whole where it applies.
+                        prefix = f"<br>{dataset.get('secondaryUnits')}: "
+                        customdata = [
+                            f"{prefix}{s}" if ok else ""
+                            for s, ok in zip(secondary.tolist(), valid.tolist())
+                        ]
+                        hovertemplate += "%{customdata}"
+                    else:
+                        customdata = None
 
                     trace = {
                         "x": times,
                         "y": primary_values,
                         "mode": "lines",
-                        "name": dataset_name.capitalize(),
+                        "name": f"{name_prefix}{dataset_name.capitalize()}",
                         "yaxis": "y1",
-                        "hoverinfo": "text",
-                        "text": hover_text,
+                        "hovertemplate": hovertemplate + "<extra></extra>",
                     }
+                    if customdata is not None:
+                        trace["customdata"] = customdata
 
                     traces.append(trace)
                     traceFake = {
@@ -167,23 +307,21 @@ class NWMPSGaugesSeries(base.DataSource):
 
     @staticmethod
     def get_secondary_data_range(data):
-        secondary_values = []
-        datasets = ["observed", "forecast"]
+        import numpy as np
 
-        for dataset_name in datasets:
-            if dataset_name in data:
-                dataset = data[dataset_name]
-                data_points = dataset.get("data", [])
-                for d in data_points:
-                    s = d.get("secondary", None)
-                    if s is not None:
-                        secondary_values.append(s)
-
-        if not secondary_values:
+        secondary_values = [
+            as_block(data[dataset_name]).secondary
+            for dataset_name in ["observed", "forecast"]
+            if dataset_name in data
+        ]
+        secondary_values = np.concatenate(secondary_values) if secondary_values else np.empty(0)
+        secondary_values = secondary_values[~np.isnan(secondary_values)]
+
+        if not secondary_values.size:
             return (0, 1)
         else:
-            min_secondary = min(secondary_values)
-            max_secondary = max(secondary_values)
+            min_secondary = float(secondary_values.min())
+            max_secondary = float(secondary_values.max())
             padding = (
                 (max_secondary - min_secondary) * 0.1
                 if max_secondary != min_secondary
@@ -200,25 +338,36 @@ class NWMPSGaugesSeries(base.DataSource):
         else:
             raise ValueError("data_type must be 'primary' or 'secondary'")
 
-    def create_layout(self, shapes, annotations, secondary_range):
+    def create_layout(
+        self,
+        shapes,
+        annotations,
+        secondary_range,
+        data=None,
+        metadata=None,
+        gauge_id=None,
+    ):
+        data = self.data if data is None else data
+        metadata = self.metadata if metadata is None else metadata
+        gauge_id = gauge_id or self.id
         primary_name = ""
         primary_units = ""
         secondary_name = ""
         secondary_units = ""
 
-        if "observed" in self.data:
+        if "observed" in data:
             primary_name, primary_units = self.extract_names_units(
-                self.data["observed"], "primary"
+                data["observed"], "primary"
             )
             secondary_name, secondary_units = self.extract_names_units(
-                self.data["observed"], "secondary"
+                data["observed"], "secondary"
             )
-        elif "forecast" in self.data:
+        elif "forecast" in data:
             primary_name, primary_units = self.extract_names_units(
-                self.data["forecast"], "primary"
+                data["forecast"], "primary"
             )
             secondary_name, secondary_units = self.extract_names_units(
-                self.data["forecast"], "secondary"
+                data["forecast"], "secondary"
             )
         else:
             primary_name = "Primary"
@@ -228,7 +377,7 @@ class NWMPSGaugesSeries(base.DataSource):
 
         layout = {
             "title": "<b>Gauge</b>: {} <br><sub>ID:{}</sub>".format(
-                self.metadata.get("name", "Unknown"), self.id
+                metadata.get("name", "Unknown"), gauge_id
             ),
             "xaxis": {"tickformat": "%I %p<br>%b %d"},
             "yaxis": {
@@ -254,3 +403,22 @@ class NWMPSGaugesSeries(base.DataSource):
         }
 
         return layout
+
+
+def parse_gauge_ids(value):
+    """Normalize a LID, a list of LIDs or ``"LID1,LID2"`` into a list of LIDs."""
+    if isinstance(value, str):
+        value = value.split(",")
+    ids = []
+    for gauge_id in value:
+        gauge_id = str(gauge_id).strip()
+        if gauge_id and gauge_id not in ids:
+            ids.append(gauge_id)
+    if not ids:
+        raise ValueError("At least one gauge id is required")
+    return ids
+
+
+def as_block(dataset):
+    """A stageflow dataset as :class:`~.gauge_store.SeriesBlock` columns."""
+    return dataset if isinstance(dataset, SeriesBlock) else SeriesBlock.from_dataset(dataset)
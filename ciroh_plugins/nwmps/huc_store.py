@@ -0,0 +1,326 @@
+"""
+Local store of HUC boundaries, GeoParquet files per HUC level.
+
+``get_huc_boundary`` used to build a ``pygeohydro.WBD`` client and query the
+WBD service on every ``NWMPService.read()`` and ``get_centroid_huc`` call.
+Boundaries now come from the store when the HUC is there, and HUCs fetched
+from WBD are added to it, so repeated reads cost a disk lookup (a dict
+lookup once the level is loaded). Each row keeps the boundary in WGS 84
+with its centroid and bounding box, and every loaded level has an STRtree
+over its boundaries for spatial lookups (:meth:`HucStore.find`).
+
+Each level is a directory (``huc2/`` ... ``huc12/``) holding a compacted
+``base.parquet`` and small ``part-*.parquet`` files. Adding HUCs writes one
+new part (never rewriting the stored ones), processes load only the parts
+they have not seen yet, and once ``COMPACT_PARTS`` parts pile up they are
+merged into the base.
+
+A level can also be filled at once from a WBD download (e.g. the
+``WBDHU8`` layer of the national geodatabase)::
+
+    from ciroh_plugins.nwmps.huc_store import get_huc_store
+
+    get_huc_store().import_file("huc8", "WBD_National_GDB.gdb", layer="WBDHU8")
+
+Boundaries are not refreshed (WBD changes a few times a year); delete a
+level's directory to rebuild it.
+
+Settings are read from the environment:
+
+``CIROH_PLUGINS_HUC_STORE_DIR``
+    Directory of the level directories (default ``<cache dir>/huc``).
+``CIROH_PLUGINS_HUC_STORE``
+    Set to ``0`` to always query the WBD service.
+"""
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+from ..cache import FileLock, cache_dir
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ["huc", "centroid_x", "centroid_y", "minx", "miny", "maxx", "maxy", "geometry"]
+BASE_FILE = "base.parquet"
+# Part files of a level merged into its base once this many have been written.
+COMPACT_PARTS = 32
+
+
+class HucLevel:
+    """The boundaries of one HUC level, by HUC code."""
+
+    def __init__(self, frame, files=None):
+        self.frame = frame.drop_duplicates("huc", keep="last").reset_index(drop=True)
+        # {file name: mtime} of the files ``frame`` was read from.
+        self.files = dict(files or {})
+        self.positions = {huc: i for i, huc in enumerate(self.frame["huc"].tolist())}
+        self._tree = None
+
+    def __len__(self):
+        return len(self.frame)
+
+    def row(self, huc_id):
+        i = self.positions.get(str(huc_id))
+        return None if i is None else self.frame.iloc[i]
+
+    @property
+    def tree(self):
+        """STRtree over the boundaries, built on first use."""
+        if self._tree is None:
+            from shapely import STRtree
+
+            self._tree = STRtree(self.frame.geometry.values)
+        return self._tree
+
+    def find(self, geometry, predicate="intersects"):
+        """HUC codes whose boundary satisfies ``predicate`` with ``geometry``."""
+        indices = self.tree.query(geometry, predicate=predicate)
+        return sorted(self.frame["huc"].values[indices].tolist())
+
+
+def prepare(frame, huc_level, id_column=None):
+    """
+    Rows of ``frame`` (a GeoDataFrame holding a ``huc_level`` code column,
+    as WBD returns it) in the store's layout: WGS 84 boundaries with their
+    centroid and bounding box, one row per HUC.
+    """
+    import geopandas as gpd
+    import numpy as np
+    import shapely
+
+    if id_column is None:
+        columns = {column.lower(): column for column in frame.columns}
+        id_column = columns.get(huc_level.lower(), "huc")
+    if id_column not in frame:
+        raise ValueError(f"No {huc_level} column among {list(frame.columns)}")
+    if frame.crs is not None and frame.crs.to_epsg() != 4326:
+        frame = frame.to_crs(4326)
+    geometries = np.asarray(frame.geometry.values)
+    centroids = shapely.centroid(geometries)
+    bounds = shapely.bounds(geometries)
+    prepared = gpd.GeoDataFrame(
+        {
+            "huc": frame[id_column].astype(str).values,
+            "centroid_x": shapely.get_x(centroids),
+            "centroid_y": shapely.get_y(centroids),
+            "minx": bounds[:, 0],
+            "miny": bounds[:, 1],
+            "maxx": bounds[:, 2],
+            "maxy": bounds[:, 3],
+        },
+        geometry=geometries,
+        crs=4326,
+    )
+    prepared = prepared[~prepared.geometry.isna()]
+    return prepared.drop_duplicates("huc", keep="last")
+
+
+class HucStore:
+    """HUC boundaries kept in ``directory`` and loaded per level on first use."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._levels = {}
+        self._lock = threading.Lock()
+
+    def path(self, huc_level):
+        """Directory of the files of ``huc_level``."""
+        return os.path.join(self.directory, huc_level)
+
+    def _files(self, huc_level):
+        """``{file name: mtime}`` of the stored files of ``huc_level``, base first, then parts by age."""
+        path = self.path(huc_level)
+        try:
+            names = [name for name in os.listdir(path) if name.endswith(".parquet")]
+        except OSError:
+            return {}
+        files = {}
+        for name in sorted(names, key=lambda name: (name != BASE_FILE, name)):
+            try:
+                files[name] = os.path.getmtime(os.path.join(path, name))
+            except OSError:
+                continue  # compacted away meanwhile
+        return files
+
+    def level(self, huc_level):
+        """
+        The :class:`HucLevel` of ``huc_level``, or None if nothing is stored.
+        Parts written by other processes since the last call are read and
+        appended; the whole level is only read again after a compaction.
+        """
+        files = self._files(huc_level)
+        with self._lock:
+            level = self._levels.get(huc_level)
+            if not files or (level is not None and all(level.files.get(n) == m for n, m in files.items())):
+                return level
+            import pandas as pd
+
+            unchanged = level is not None and all(files.get(n) == m for n, m in level.files.items())
+            names = [n for n in files if n not in level.files] if unchanged else list(files)
+            frames = [self._read(os.path.join(self.path(huc_level), name)) for name in names]
+            frames = [frame for frame in frames if frame is not None]
+            if unchanged:
+                frames.insert(0, level.frame)
+            if not frames:
+                return level
+            loaded = dict(level.files) if unchanged else {}
+            loaded.update((name, files[name]) for name in names)
+            level = HucLevel(pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0], loaded)
+            self._levels[huc_level] = level
+        return level
+
+    @staticmethod
+    def _read(path):
+        """The rows stored in ``path``, or None if it cannot be read (a compaction then drops it)."""
+        import geopandas as gpd
+
+        try:
+            return gpd.read_parquet(path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read HUC store file {path}: {e}")
+            return None
+
+    def get(self, huc_level, huc_id):
+        """The boundary of ``huc_id``, or None if it is not stored."""
+        level = self.level(huc_level)
+        row = level.row(huc_id) if level is not None else None
+        return None if row is None else row.geometry
+
+    def centroid(self, huc_level, huc_id):
+        """``[x, y]`` of the stored centroid of ``huc_id``, or None."""
+        level = self.level(huc_level)
+        row = level.row(huc_id) if level is not None else None
+        return None if row is None else [float(row["centroid_x"]), float(row["centroid_y"])]
+
+    def bounds(self, huc_level, huc_id):
+        """``(minx, miny, maxx, maxy)`` of ``huc_id``, or None."""
+        level = self.level(huc_level)
+        row = level.row(huc_id) if level is not None else None
+        return None if row is None else tuple(float(row[key]) for key in ("minx", "miny", "maxx", "maxy"))
+
+    def find(self, huc_level, geometry, predicate="intersects"):
+        """Stored HUC codes of ``huc_level`` whose boundary satisfies ``predicate`` with ``geometry``."""
+        level = self.level(huc_level)
+        return level.find(geometry, predicate) if level is not None else []
+
+    def add(self, huc_level, frame, id_column=None):
+        """
+        Add the boundaries of ``frame`` to ``huc_level``, replacing stored
+        HUCs with the same code. Only the new rows are written, as a part
+        file; the level is compacted once ``COMPACT_PARTS`` parts exist.
+        The rows are kept in memory even if they cannot be written.
+        Returns the number of HUCs added.
+        """
+        import pandas as pd
+
+        rows = prepare(frame, huc_level, id_column)[COLUMNS]
+        name = f"part-{time.time_ns():020d}-{uuid.uuid4().hex[:8]}.parquet"
+        try:
+            self._write(rows, os.path.join(self.path(huc_level), name))
+            written = {name: os.path.getmtime(os.path.join(self.path(huc_level), name))}
+        except OSError as e:
+            logger.warning(f"Could not write {huc_level} boundaries to the HUC store: {e}")
+            written = {}
+        with self._lock:
+            level = self._levels.get(huc_level)
+            if level is None:
+                self._levels[huc_level] = HucLevel(rows, written)
+            else:
+                merged = pd.concat([level.frame, rows], ignore_index=True)
+                self._levels[huc_level] = HucLevel(merged, {**level.files, **written})
+        if written and sum(name != BASE_FILE for name in self._files(huc_level)) >= COMPACT_PARTS:
+            self.compact(huc_level)
+        return len(rows)
+
+    def _write(self, frame, path):
+        """Write ``frame`` to ``path`` through a temporary file, so readers never see a partial file."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        os.close(fd)
+        try:
+            frame.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def compact(self, huc_level):
+        """
+        Merge the part files of ``huc_level`` into its base file. Skipped
+        (returns False) while another process is compacting the level.
+        """
+        import pandas as pd
+
+        directory = self.path(huc_level)
+        lock = FileLock(os.path.join(directory, "compact.lock"))
+        if not lock.acquire():
+            return False
+        try:
+            files = self._files(huc_level)
+            frames = [self._read(os.path.join(directory, name)) for name in files]
+            frames = [frame for frame in frames if frame is not None]
+            if not frames:
+                return False
+            merged = pd.concat(frames, ignore_index=True)
+            merged = merged.drop_duplicates("huc", keep="last").sort_values("huc")
+            self._write(merged[COLUMNS].reset_index(drop=True), os.path.join(directory, BASE_FILE))
+            for name in files:
+                if name != BASE_FILE:
+                    try:
+                        os.remove(os.path.join(directory, name))
+                    except OSError:
+                        pass
+        except OSError as e:
+            logger.warning(f"Could not compact the {huc_level} HUC store: {e}")
+            return False
+        finally:
+            lock.release()
+        return True
+
+    def import_file(self, huc_level, path, layer=None, id_column=None):
+        """
+        Add every boundary of a file GeoPandas can read (WBD geodatabase,
+        GeoPackage, shapefile, GeoParquet) to ``huc_level`` and compact the
+        level. Returns the number of HUCs imported.
+        """
+        import geopandas as gpd
+
+        if str(path).endswith(".parquet"):
+            frame = gpd.read_parquet(path)
+        else:
+            frame = gpd.read_file(path, layer=layer)
+        count = self.add(huc_level, frame, id_column)
+        self.compact(huc_level)
+        logger.info(f"Imported {count} {huc_level} boundaries from {path}")
+        return count
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_huc_store():
+    """
+    Return the process-wide HUC store, or None if it is disabled or its
+    directory cannot be created.
+    """
+    global _store
+    if os.environ.get("CIROH_PLUGINS_HUC_STORE", "1") == "0":
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                try:
+                    directory = os.environ.get("CIROH_PLUGINS_HUC_STORE_DIR") or cache_dir("huc")
+                    os.makedirs(directory, exist_ok=True)
+                except OSError as e:
+                    logger.warning(f"HUC store disabled, cannot create its directory: {e}")
+                    return None
+                _store = HucStore(directory)
+    return _store
@@ -1,4 +1,6 @@
 from intake.source import base
+from ..instrumentation import timed_read
+from ..profiling import profiled_read
 from .utilities import get_services_dropdown, DATA_SERVICES
 
 
@@ -31,6 +33,8 @@ class NWMPMap(base.DataSource):
             self.layer = kwargs["service.Layer"]
         super(NWMPMap, self).__init__(metadata=metadata)
 
+    @profiled_read
+    @timed_read
     def read(self):
         service = DATA_SERVICES[self.service_key]
         layer_name = service["name"]
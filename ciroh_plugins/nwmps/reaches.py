@@ -1,13 +1,30 @@
 from intake.source import base
-import httpx
 import asyncio
-from .utilities import get_metadata_from_api
+from ..async_runner import run
+from ..instrumentation import decode_json, stage, timed_read
+from ..plotly_encoding import encode_figure, json_values, plotly_encoding
+from ..profiling import profiled_read
+from ..transport import aget as http_aget
+from .utilities import aget_metadata_from_api
 import logging
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+PRODUCTS = (
+    "analysis_assimilation",
+    "short_range",
+    "medium_range",
+    "long_range",
+    "medium_range_blend",
+)
+ENSEMBLE_MODES = ("summary", "members")
+# Fill colors of the ensemble bands, by product.
+BAND_COLORS = {"medium_range": "31, 119, 180", "long_range": "44, 160, 44"}
+DEFAULT_BAND_COLOR = "99, 110, 250"
+STAT_DECIMALS = 3
+
 
 class NWMPSReachesSeries(base.DataSource):
     container = "python"
@@ -25,23 +42,49 @@ class NWMPSReachesSeries(base.DataSource):
     visualization_description = "An interactive chart that depicts the analysis and configuration, short range, medium range, and long range streamflow forecasts from the National Water Model"
     visualization_args = {
         "id": "text",
+        "products": [
+            {
+                "label": "Products",
+                "options": [{"label": "All products", "value": "all"}]
+                + [
+                    {"label": product.replace("_", " ").title(), "value": product}
+                    for product in PRODUCTS
+                ],
+            }
+        ],
+        "ensemble": [
+            {
+                "label": "Ensemble members",
+                "options": [
+                    {"label": "Summary bands", "value": "summary"},
+                    {"label": "All members", "value": "members"},
+                ],
+            }
+        ],
     }
     visualization_group = "NWMP"
     visualization_label = "NWMP Reaches Time Series"
     visualization_type = "plotly"
     visualization_attribution = "NOAA"
 
-    def __init__(self, id, metadata=None):
+    def __init__(self, id, products="all", ensemble="summary", metadata=None):
+        """
+        ``products`` limits the initial figure to some of the NWM series
+        (a list or a comma separated string, ``"all"`` by default). The
+        other series can be fetched later by key with :meth:`read_series`.
+
+        ``ensemble="summary"`` draws the members of the medium and long range
+        ensembles as min/max and quartile bands around the median;
+        ``"members"`` draws one line per member.
+        """
+        if ensemble not in ENSEMBLE_MODES:
+            raise ValueError(f"Unknown ensemble mode {ensemble!r}, expected one of {ENSEMBLE_MODES}")
         self.api_base_url = "https://api.water.noaa.gov/nwps/v1"
         self.id = id
         self.metadata = None
-        self.reach_data = {
-            "analysis_assimilation": None,
-            "short_range": None,
-            "medium_range": None,
-            "long_range": None,
-            "medium_range_blend": None,
-        }
+        self.products = parse_products(products)
+        self.ensemble = ensemble
+        self.reach_data = {product: None for product in PRODUCTS}
         self.matching_forecast = {
             "analysis_assimilation": "analysisAssimilation",
             "short_range": "shortRange",
@@ -49,26 +92,75 @@ class NWMPSReachesSeries(base.DataSource):
             "long_range": "longRange",
             "medium_range_blend": "mediumRangeBlend",
         }
-        self.loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(self.loop)
         super(NWMPSReachesSeries, self).__init__(metadata=metadata)
 
+    @profiled_read
+    @timed_read
     def read(self):
-        self.metadata = get_metadata_from_api(self.api_base_url, self.id, "reaches")
+        # Only the requests run on the shared loop; the figure is built in
+        # this thread so it never holds up the I/O of other drivers.
+        run(self.fetch())
+        return self.build_figure()
+
+    async def read_async(self):
+        """Native async read for hosts that already run an event loop."""
+        await self.fetch()
+        return await asyncio.to_thread(self.build_figure)
+
+    async def fetch(self):
+        """Fetch the reach metadata, then the series of the selected products."""
+        self.metadata = await aget_metadata_from_api(self.api_base_url, self.id, "reaches")
         if self.metadata is not None:
-            self.getData()
-        traces = self.create_plotly_data()
+            await self.make_reach_api_calls(self.products)
+        else:
+            self.metadata = {}
+
+    def build_figure(self):
+        """The encoded figure of the fetched products."""
+        with stage("build_traces"):
+            traces = self.create_plotly_data(self.products)
         layout = self.create_plotly_layout()
-        return {"data": traces, "layout": layout}
+        figure = {"data": traces, "layout": layout}
+        if len(self.products) < len(PRODUCTS):
+            figure["series"] = {
+                "loaded": list(self.products),
+                "available": [p for p in PRODUCTS if p not in self.products],
+            }
+        return encode_figure(figure, plotly_encoding(self))
 
-    def create_plotly_data(self):
+    def read_series(self, key):
+        """
+        Return ``{"data": traces}`` for product ``key`` (e.g. ``"long_range"``),
+        fetching it first if it is not loaded yet.
+        """
+        if key not in PRODUCTS:
+            raise ValueError(f"Unknown product {key!r}, expected one of {PRODUCTS}")
+        if self.reach_data[key] is None:
+            run(self.reach_api_call(key))
+        return self.build_series(key)
+
+    async def read_series_async(self, key):
+        if key not in PRODUCTS:
+            raise ValueError(f"Unknown product {key!r}, expected one of {PRODUCTS}")
+        if self.reach_data[key] is None:
+            await self.reach_api_call(key)
+        return await asyncio.to_thread(self.build_series, key)
+
+    def build_series(self, key):
+        with stage("build_traces"):
+            figure = {"data": self.create_plotly_data([key])}
+        return encode_figure(figure, plotly_encoding(self))
+
+    def create_plotly_data(self, products=None):
         """
         Process the data object to create a list of traces for Plotly.js.
+        Each trace carries its product under ``meta.key``. In ``summary``
+        mode, products with several ensemble members get band traces
+        (see :func:`summarize_members`) instead of one trace per member.
         """
         traces = []
-        for product_name, product in self.reach_data.items():
-            if product_name == "reach":
-                continue
+        for product_name in products or self.products:
+            product = self.reach_data.get(product_name)
 
             if product is None or not isinstance(product, dict):
                 logger.warning(
@@ -76,6 +168,7 @@ class NWMPSReachesSeries(base.DataSource):
                 )
                 continue
 
+            members = []
             for simulation_name, simulation in product.items():
                 if simulation is None or not isinstance(simulation, dict):
                     logger.warning(
@@ -90,6 +183,10 @@ class NWMPSReachesSeries(base.DataSource):
                     )
                     continue
 
+                if self.ensemble == "summary" and simulation_name.startswith("member"):
+                    members.append(data_points)
+                    continue
+
                 x = [
                     point.get("validTime")
                     for point in data_points
@@ -110,11 +207,63 @@ class NWMPSReachesSeries(base.DataSource):
                     "mode": "lines",
                     "name": f"{product_name} {simulation_name}",
                     "line": {"width": 2},
+                    "meta": {"key": product_name},
                 }
                 traces.append(trace)
 
+            if members:
+                traces.extend(self.create_ensemble_traces(product_name, members))
+
         return traces
 
+    def create_ensemble_traces(self, product_name, members):
+        """
+        Band traces for the ensemble ``members`` (lists of data points) of a
+        product: a min/max band, an interquartile band and the median line.
+        Bands are drawn by filling each upper bound down to the lower bound
+        trace right before it.
+        """
+        times, stats = summarize_members(members)
+        if times is None:
+            logger.warning(f"No valid ensemble members in product '{product_name}'. Skipping.")
+            return []
+        x = times.tolist()
+        color = BAND_COLORS.get(product_name, DEFAULT_BAND_COLOR)
+        common = {
+            "x": x,
+            "type": "scatter",
+            "mode": "lines",
+            "legendgroup": product_name,
+            "meta": {"key": product_name},
+        }
+        bound = {"line": {"width": 0}, "showlegend": False}
+        return [
+            {**common, **bound, "y": json_values(stats["min"]), "name": f"{product_name} members min"},
+            {
+                **common,
+                "y": json_values(stats["max"]),
+                "name": f"{product_name} members min-max",
+                "line": {"width": 0},
+                "fill": "tonexty",
+                "fillcolor": f"rgba({color}, 0.15)",
+            },
+            {**common, **bound, "y": json_values(stats["q25"]), "name": f"{product_name} members 25%"},
+            {
+                **common,
+                "y": json_values(stats["q75"]),
+                "name": f"{product_name} members 25-75%",
+                "line": {"width": 0},
+                "fill": "tonexty",
+                "fillcolor": f"rgba({color}, 0.35)",
+            },
+            {
+                **common,
+                "y": json_values(stats["median"]),
+                "name": f"{product_name} members median",
+                "line": {"width": 2, "color": f"rgb({color})"},
+            },
+        ]
+
     def create_plotly_layout(self, yaxis_title="Flow"):
         """
         Create a layout dictionary for Plotly.js based on the data object.
@@ -169,23 +318,22 @@ class NWMPSReachesSeries(base.DataSource):
 
     async def reach_api_call(self, product):
         try:
-            async with httpx.AsyncClient(verify=False) as client:
-                response = await client.get(
-                    url=f"{self.api_base_url}/reaches/{self.id}/streamflow",
-                    params={"series": product},
-                    timeout=None,
+            response = await http_aget(
+                f"{self.api_base_url}/reaches/{self.id}/streamflow",
+                params={"series": product},
+            )
+            logger.info(f"Request URL: {product} {response.status_code}")
+
+            if response.status_code != 200:
+                logger.error(f"Error: {response.status_code}")
+                logger.error(response.text)
+                return None
+            else:
+                payload = decode_json(response)
+                self.reach_data[product] = payload.get(
+                    self.matching_forecast[product], None
                 )
-                logger.info(f"Request URL: {product} {response.status_code}")
-
-                if response.status_code != 200:
-                    logger.error(f"Error: {response.status_code}")
-                    logger.error(response.text)
-                    return None
-                else:
-                    self.reach_data[product] = response.json().get(
-                        self.matching_forecast[product], None
-                    )
-                    return response.json()
+                return payload
         except Exception as e:
             logger.error(e)
             return None
@@ -200,9 +348,68 @@ class NWMPSReachesSeries(base.DataSource):
 
     def getData(self):
         try:
-            products = self.reach_data.keys()
-            results = self.loop.run_until_complete(self.make_reach_api_calls(products))
+            products = self.products
+            results = run(self.make_reach_api_calls(products))
             return results
         except Exception as e:
             logger.error(e)
             return None
+
+
+def parse_products(value):
+    """Normalize ``"all"``, a product name, ``"a,b"`` or a list into product names."""
+    if value is None or value == "all":
+        return list(PRODUCTS)
+    if isinstance(value, str):
+        value = value.split(",")
+    products = []
+    for product in value:
+        product = str(product).strip()
+        if product == "all":
+            return list(PRODUCTS)
+        if product not in PRODUCTS:
+            raise ValueError(f"Unknown product {product!r}, expected one of {PRODUCTS}")
+        if product not in products:
+            products.append(product)
+    return products or list(PRODUCTS)
+
+
+def summarize_members(members):
+    """
+    Align ensemble members (lists of ``{"validTime", "flow"}`` points) on the
+    union of their valid times and return ``(times, stats)``, where ``stats``
+    maps ``min``, ``q25``, ``median``, ``q75`` and ``max`` to arrays over
+    ``times``. Times a member does not cover are ignored for that member.
+    Returns ``(None, None)`` when no member has any point.
+    """
+    import numpy as np
+
+    series = []
+    for points in members:
+        x = [point["validTime"] for point in points if "validTime" in point]
+        y = [point.get("flow") for point in points if "validTime" in point]
+        if x:
+            series.append((np.asarray(x), np.asarray(y, dtype=float)))
+    if not series:
+        return None, None
+
+    # The API returns every validTime as an ISO 8601 UTC string of the same
+    # shape, so sorting the strings sorts the times.
+    times = np.unique(np.concatenate([x for x, _ in series]))
+    values = np.full((len(series), len(times)), np.nan)
+    for row, (x, y) in zip(values, series):
+        row[np.searchsorted(times, x)] = y
+
+    # np.nanpercentile loops over the columns in Python; sorting once
+    # (NaNs sort last) and interpolating between the ranks is vectorized.
+    values.sort(axis=0)
+    count = np.sum(~np.isnan(values), axis=0)
+    ranks = np.array([0, 0.25, 0.5, 0.75, 1])[:, None] * np.maximum(count - 1, 0)
+    low = np.floor(ranks).astype(int)
+    high = np.ceil(ranks).astype(int)
+    below = np.take_along_axis(values, low, axis=0)
+    above = np.take_along_axis(values, high, axis=0)
+    q = below + (above - below) * (ranks - low)
+    # Interpolated quartiles would otherwise carry ~15 digits into the JSON.
+    q = np.round(q, STAT_DECIMALS)
+    return times, dict(zip(("min", "q25", "median", "q75", "max"), q))
@@ -1,9 +1,24 @@
-import pandas as pd
-from shapely.geometry import MultiPolygon
-from pygeoogc import ArcGISRESTful
-import pygeoutils as geoutils
-from pygeoogc.exceptions import ZeroMatchedError
 from intake.source import base
+import asyncio
+from collections import Counter
+import httpx
+from ..async_runner import iterate, run
+from ..instrumentation import read_option, stage, timed_read
+from ..profiling import profiled_read
+from ..transport import resolve_url
+from .arcgis import (
+    ArcGISQueryError,
+    IncompletePagesError,
+    count_by,
+    decode_page,
+    field_values,
+    object_id_field,
+    object_ids,
+    object_ids_by_part,
+    page_size,
+    query_pages,
+    supports_statistics,
+)
 from .utilities import (
     get_services_dropdown,
     DATA_SERVICES,
@@ -12,13 +27,29 @@ from .utilities import (
     rgb_to_hex,
     get_huc_boundary,
 )
-import numpy as np
 import logging
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# pandas, numpy, shapely and the pygeo* packages take seconds and hundreds of
+# MB to import, so they are imported inside the methods that need them and
+# only load when read() actually runs.
+
+# How the per-label counts are computed, cheapest first. read() starts at
+# the ``statistics`` metadata option (default "server") and falls back to
+# the next strategy when one does not apply to the layer or fails:
+#   server      outStatistics counts grouped by the filter attribute
+#   attributes  the filter attribute of every feature, without geometry
+#   features    every feature with its geometry, as a GeoDataFrame
+STATISTICS_STRATEGIES = ("server", "attributes", "features")
+# Features per request when downloading them with their geometry. Decoding a
+# page of 2000 reaches as GeoJSON peaks at about 25 MB, so pages are kept
+# smaller than ``maxRecordCount``. The ``page_size`` metadata option
+# overrides this and the attribute pages (``maxRecordCount``).
+FEATURE_PAGE_SIZE = 500
+
 
 class NWMPService(base.DataSource):
     """
@@ -42,6 +73,9 @@ class NWMPService(base.DataSource):
     visualization_label = "NWMP Data Service"
     visualization_type = "card"
     visualization_attribution = "NOAA"
+    # ArcGIS queries in flight at once: polygon parts of a HUC, then pages
+    # of object ids (also bounded per host by the shared transport).
+    max_concurrent_queries = 8
 
     def __init__(self, service, huc_id, layer_id, metadata=None):
         """
@@ -58,6 +92,8 @@ class NWMPService(base.DataSource):
         self.title = None
         self.description = None
 
+    @profiled_read
+    @timed_read
     def read(self):
         """
         Read data from NWMP service and return a dictionary with title, data, and description.
@@ -69,16 +105,23 @@ class NWMPService(base.DataSource):
         self.layer_info = get_layer_info(self.service_url, self.layer_id)
 
         self.title = self.make_title()
-        geometry = get_huc_boundary(self.huc_level, self.huc_id)
-        if geometry is None:
-            df = pd.DataFrame()
-        else:
-            df = self.get_river_features(self.service_url, geometry)
-        if not df.empty:
-            df = self.add_symbols(df)
-            stats = self.get_statistics(df)
-        else:
-            stats = {}
+        with stage("huc_boundary", huc_id=str(self.huc_id)):
+            geometry = get_huc_boundary(self.huc_level, self.huc_id)
+        stats = None
+        strategy = read_option(self, "statistics", "server")
+        if strategy not in STATISTICS_STRATEGIES:
+            logger.warning(f"Unknown statistics strategy {strategy!r}, expected one of {STATISTICS_STRATEGIES}")
+            strategy = "server"
+        strategies = STATISTICS_STRATEGIES[STATISTICS_STRATEGIES.index(strategy):]
+        if geometry is not None and "server" in strategies:
+            stats = self.get_pushdown_statistics(self.service_url, geometry)
+        if geometry is not None and stats is None and "attributes" in strategies:
+            stats = self.get_attribute_statistics(self.service_url, geometry)
+        if stats is None:
+            if geometry is None:
+                stats = {}
+            else:
+                stats = self.get_feature_statistics(self.service_url, geometry)
 
         return {
             "title": self.title,
@@ -149,6 +192,9 @@ class NWMPService(base.DataSource):
         """
         Assign labels and colors to a DataFrame based on a value column and a symbol list.
         """
+        import numpy as np
+        import pandas as pd
+
         bins = [0] + [item["classMaxValue"] for item in symbol_list[:-1]] + [np.inf]
         labels = [item["label"] for item in symbol_list]
         colors = [item["symbol"]["color"] for item in symbol_list]
@@ -156,9 +202,10 @@ class NWMPService(base.DataSource):
         label_to_color = dict(zip(labels, colors))
         df[value_column] = pd.to_numeric(df[value_column], errors="coerce")
 
-        df[label_column] = pd.cut(
-            df[value_column], bins=bins, labels=labels, right=True, include_lowest=True
-        )
+        with stage("pd_cut", rows=len(df)):
+            df[label_column] = pd.cut(
+                df[value_column], bins=bins, labels=labels, right=True, include_lowest=True
+            )
 
         label_to_color_hex = {
             label: rgb_to_hex(color) for label, color in label_to_color.items()
@@ -190,34 +237,238 @@ class NWMPService(base.DataSource):
 
     def get_river_features(self, url, geometry):
         """Fetch river features from the service within the given geometry."""
-        hr = ArcGISRESTful(url, self.layer_id)
-        dfs = []
-        geometries = (
-            geometry.geoms if isinstance(geometry, MultiPolygon) else [geometry]
-        )
-        for geom in geometries:
-            try:
-                oids = hr.oids_bygeom(geom, spatial_relation="esriSpatialRelContains")
-                if oids:
-                    resp = hr.get_features(oids)
-                    df_temp = geoutils.json2geodf(resp)
-                    dfs.append(df_temp)
-                else:
-                    logger.warning("No OIDs found for the geometry.")
-            except ZeroMatchedError:
-                logger.warning(
-                    "ZeroMatchedError: No features found within the given geometry."
+        import pandas as pd
+
+        # The shared loop only fetches; pages are parsed in this thread.
+        dfs = [self.page_frame(response) for response in iterate(self.feature_pages(url, geometry))]
+        dfs = [df for df in dfs if df is not None]
+        if dfs:
+            return pd.concat(dfs, ignore_index=True)
+        return pd.DataFrame()
+
+    async def aget_river_features(self, url, geometry):
+        import pandas as pd
+
+        dfs = [
+            await asyncio.to_thread(self.page_frame, response)
+            async for response in self.feature_pages(url, geometry)
+        ]
+        dfs = [df for df in dfs if df is not None]
+        if dfs:
+            return pd.concat(dfs, ignore_index=True)
+        return pd.DataFrame()
+
+    async def feature_pages(self, url, geometry):
+        """
+        Yield the responses holding the features within ``geometry``, one
+        page at a time, undecoded (see :meth:`page_frame`). The object ids
+        of the polygon parts are queried concurrently and deduplicated, then
+        the pages are downloaded concurrently, up to
+        ``max_concurrent_queries`` requests at once. Failed parts and pages
+        are logged and skipped like before; the pages that did arrive are
+        still yielded.
+        """
+        layer_url = f"{resolve_url(url).rstrip('/')}/{self.layer_id}"
+        with stage("arcgis_oids", url=layer_url) as event:
+            oids = await object_ids_by_part(
+                layer_url, geometry, concurrency=self.max_concurrent_queries
+            )
+            event["rows"] = len(oids)
+        if not oids:
+            logger.warning("No river features found in any of the geometries.")
+            return
+        size = self.get_page_size(min(FEATURE_PAGE_SIZE, page_size(self.layer_info)))
+        params = {"outFields": "*", "returnGeometry": "true", "outSR": 4326, "f": "geojson"}
+        pages = query_pages(layer_url, oids, params, size, self.max_concurrent_queries, decode=False)
+        try:
+            async for response in pages:
+                yield response
+        except IncompletePagesError as e:
+            logger.error(f"Error fetching features for a geometry: {e}")
+
+    @staticmethod
+    def page_frame(response):
+        """GeoDataFrame of a page of :meth:`feature_pages`, or None (logged) if it cannot be decoded."""
+        import pygeoutils as geoutils
+
+        try:
+            payload = decode_page(response)
+        except (httpx.HTTPError, ArcGISQueryError, ValueError) as e:
+            logger.error(f"Error decoding a page of {response.request.url}: {e!r}")
+            return None
+        with stage("json2geodf") as event:
+            df = geoutils.json2geodf(payload)
+            event["rows"] = len(df)
+        return df
+
+    def get_pushdown_statistics(self, url, geometry):
+        """
+        Count the features per label on the ArcGIS server (``outStatistics``
+        grouped by the layer's filter attribute, no geometry) and map the
+        few aggregate rows to labels and colors.
+
+        Returns None when the layer cannot be summarized this way (class
+        break symbology needs raw values) or the query fails, so the caller
+        falls back to downloading the features.
+        """
+        filter_attr = self.get_color_attribute()
+        value_attr = self.get_drawing_info_value_attr(self.service_name, self.layer_id)
+        if not filter_attr or value_attr != "value" or not supports_statistics(self.layer_info):
+            return None
+        symbols = get_drawing_info(self.layer_info, self.service_name, self.layer_id)
+        if not symbols:
+            return None
+
+        layer_url = f"{resolve_url(url).rstrip('/')}/{self.layer_id}"
+        try:
+            with stage("arcgis_statistics", url=layer_url) as event:
+                counts = count_by(
+                    layer_url, geometry, filter_attr, object_id_field(self.layer_info)
                 )
+                event["groups"] = len(counts)
+        except (httpx.HTTPError, ArcGISQueryError, KeyError, ValueError) as e:
+            logger.warning(f"Statistics pushdown failed, fetching the features instead: {e}")
+            return None
+
+        symbol_dict = {str(item["value"]): item for item in symbols}
+        totals = {}
+        for value, count in counts.items():
+            label, color = self.get_label_and_color_for_value(str(value), symbol_dict)
+            if label is None or not count:
                 continue
-            except Exception as e:
-                logger.error(f"Error fetching features for a geometry: {e}")
+            key = (label, rgb_to_hex(color))
+            totals[key] = totals.get(key, 0) + count
+        return self.statistics_records(totals, symbols)
+
+    def get_attribute_statistics(self, url, geometry):
+        """
+        Count the features per label from their filter attribute alone:
+        object ids of the features in ``geometry``, then their attribute in
+        pages of ``maxRecordCount`` without geometry, fetched concurrently.
+        Each page becomes a typed NumPy array that is counted as it arrives
+        and dropped, so memory is bounded by the pages in flight and the
+        label counts (no GeoDataFrame).
+
+        Returns None when the layer has no filter attribute or symbols, or
+        a query fails, so the caller falls back to downloading the features.
+        """
+        filter_attr = self.get_color_attribute()
+        symbols = get_drawing_info(self.layer_info, self.service_name, self.layer_id)
+        if not filter_attr or not symbols:
+            return None
+
+        layer_url = f"{resolve_url(url).rstrip('/')}/{self.layer_id}"
+        try:
+            return self.count_attribute_pages(layer_url, geometry, filter_attr, symbols)
+        except (httpx.HTTPError, ArcGISQueryError, KeyError, ValueError) as e:
+            logger.warning(f"Attribute query failed, fetching the features instead: {e}")
+            return None
+
+    def count_attribute_pages(self, layer_url, geometry, filter_attr, symbols):
+        # A failed page raises IncompletePagesError at the end, so a partial
+        # count is never returned and read() moves on to the features. The
+        # shared loop only fetches; pages are decoded and counted here.
+        import numpy as np
+
+        by_value = self.get_drawing_info_value_attr(self.service_name, self.layer_id) == "value"
+        with stage("arcgis_oids", url=layer_url) as event:
+            oids = run(object_ids(layer_url, geometry))
+            event["rows"] = len(oids)
+        size = self.get_page_size(page_size(self.layer_info))
+        params = {"outFields": filter_attr, "returnGeometry": "false"}
+        totals = Counter()
+        pages = query_pages(layer_url, oids, params, size, self.max_concurrent_queries, decode=False)
+        for response in iterate(pages):
+            page = field_values(decode_page(response), filter_attr)
+            with stage("statistics", rows=len(page)):
+                if by_value:
+                    totals.update(self.count_labels_by_value(np.asarray(page, dtype=str), symbols))
+                else:
+                    totals.update(self.count_labels_by_range(numeric_column(page), symbols))
+        return self.statistics_records(totals, symbols)
+
+    def get_page_size(self, default):
+        """Features per request: the ``page_size`` metadata option, else ``default``."""
+        try:
+            return max(1, int(read_option(self, "page_size", default)))
+        except (TypeError, ValueError):
+            return default
+
+    def get_feature_statistics(self, url, geometry):
+        """
+        Count the features per label from the full features, one page at a
+        time: each page is labelled and reduced to counts as it arrives, so
+        memory stays bounded by the pages in flight instead of growing with
+        the number of features (see :meth:`get_river_features`). Pages are
+        parsed and counted in the calling thread, not on the shared loop.
+        """
+        totals = Counter()
+        for response in iterate(self.feature_pages(url, geometry)):
+            df = self.page_frame(response)
+            if df is None:
                 continue
-        if dfs:
-            df = pd.concat(dfs, ignore_index=True)
-            return df
-        else:
-            logger.warning("No river features found in any of the geometries.")
-            return pd.DataFrame()
+            df = self.add_symbols(df)
+            if "label" not in df:
+                return {}
+            with stage("statistics", rows=len(df)):
+                totals.update(self.count_labels(df))
+        symbols = get_drawing_info(self.layer_info, self.service_name, self.layer_id)
+        return self.statistics_records(totals, symbols or ())
+
+    @staticmethod
+    def count_labels(df):
+        """``{(label, color): count}`` of a labelled DataFrame."""
+        grouped = df.groupby(by=["label", "color"], observed=True).size()
+        return {key: int(count) for key, count in grouped.items()}
+
+    def count_labels_by_value(self, column, symbol_list):
+        """``{(label, color): count}`` of a column of unique value symbology values."""
+        import numpy as np
+
+        symbol_dict = {str(item["value"]): item for item in symbol_list}
+        totals = {}
+        values, counts = np.unique(column, return_counts=True)
+        for value, count in zip(values.tolist(), counts.tolist()):
+            label, color = self.get_label_and_color_for_value(value, symbol_dict)
+            if label is not None:
+                key = (label, rgb_to_hex(color))
+                totals[key] = totals.get(key, 0) + count
+        return totals
+
+    @staticmethod
+    def count_labels_by_range(column, symbol_list):
+        """
+        ``{(label, color): count}`` of a numeric column binned like
+        :meth:`assign_labels_and_colors_based_on_range` (``[0, max1]``,
+        ``(max1, max2]``, ..., ``(max_n-1, inf)``; NaN and negatives dropped).
+        """
+        import numpy as np
+
+        upper = [item["classMaxValue"] for item in symbol_list[:-1]]
+        valid = column[column >= 0]  # also drops NaN
+        counts = np.bincount(np.searchsorted(upper, valid, side="left"), minlength=len(symbol_list))
+        totals = {}
+        for item, count in zip(symbol_list, counts.tolist()):
+            key = (item["label"], rgb_to_hex(item["symbol"]["color"]))
+            totals[key] = totals.get(key, 0) + count
+        return totals
+
+    @staticmethod
+    def statistics_records(totals, symbol_list=()):
+        """
+        ``{(label, color): count}`` as the records :meth:`get_statistics`
+        returns, in the order of ``symbol_list`` (the legend order the
+        ``pd.cut`` categories used to give); labels not in it come last.
+        """
+        order = {}
+        for item in symbol_list:
+            order.setdefault((item["label"], rgb_to_hex(item["symbol"]["color"])), len(order))
+        records = [
+            {"label": label, "color": color, "value": totals[(label, color)]}
+            for label, color in sorted(totals, key=lambda key: (order.get(key, len(order)), key))
+            if totals[(label, color)] > 0
+        ]
+        return records or {}
 
     def get_statistics(self, df):
         """Compute statistics from the DataFrame."""
@@ -227,3 +478,15 @@ class NWMPService(base.DataSource):
         grouped = grouped.drop("size", axis=1)
         stats = grouped.to_dict("records")
         return stats
+
+
+def numeric_column(values):
+    """Float64 array of attribute values, non-numeric ones as NaN (like ``pd.to_numeric(errors="coerce")``)."""
+    import numpy as np
+
+    try:
+        return np.asarray(values, dtype=float)
+    except (TypeError, ValueError):
+        import pandas as pd
+
+        return pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").to_numpy(dtype=float)
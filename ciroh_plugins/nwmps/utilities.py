@@ -1,8 +1,9 @@
-import requests
 import httpx
 import logging
-from pygeoogc.exceptions import ZeroMatchedError
-from pygeohydro import WBD
+from ..async_runner import run
+from ..cache import METADATA_TTL, acached_get, cached_get, get_metadata_cache
+from ..instrumentation import decode_json
+from .huc_store import get_huc_store
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -579,26 +580,34 @@ def get_layer_info(service, layer_id):
     else:
         layer_url = f"{service}/{layer_id}"
     try:
-        response = requests.get(f"{layer_url}?f=json")
-        response.raise_for_status()
-        return response.json()
-    except requests.RequestException as e:
+        response = cached_get(layer_url, params={"f": "json"})
+        if response.status_code != 200:
+            logger.error(f"Error fetching layer info: {response.status_code}")
+            return {}
+        return decode_json(response)
+    except httpx.HTTPError as e:
         logger.error(f"Error fetching layer info: {e}")
         return {}
 
 
 def get_metadata_from_api(api_url, id, type_feature):
+    """Blocking :func:`aget_metadata_from_api`, run on the shared event loop."""
+    return run(aget_metadata_from_api(api_url, id, type_feature))
+
+
+async def aget_metadata_from_api(api_url, id, type_feature):
+    """Description of the gauge or reach ``id``, through the metadata cache."""
     try:
-        with httpx.Client(verify=False) as client:
-            r = client.get(
-                url=f"{api_url}/{type_feature}/{id}",
-                timeout=None,
-            )
-            if r.status_code != 200:
-                logger.error(f"Error: {r.status_code}")
-                return None
-            else:
-                return r.json()
+        r = await acached_get(
+            f"{api_url}/{type_feature}/{id}",
+            ttl=METADATA_TTL,
+            cache=get_metadata_cache(),
+        )
+        if r.status_code != 200:
+            logger.error(f"Error: {r.status_code}")
+            return None
+        else:
+            return decode_json(r)
     except httpx.HTTPError as exc:
         logger.error(
             f"Error while requesting {exc.request.url!r}: {str(exc.__class__.__name__)}"
@@ -611,12 +620,26 @@ def get_metadata_from_api(api_url, id, type_feature):
 
 def get_huc_boundary(huc_level, huc_id):
     """
-    Retrieve the watershed boundary geometry for a given HUC code.
+    Retrieve the watershed boundary geometry for a given HUC code, from the
+    local HUC store when it has it, else from the WBD service (and then
+    added to the store). Store failures are logged and never stop a WBD
+    boundary from being returned.
     """
-    wbd = WBD(huc_level)
+    store = None
     try:
-        gdf = wbd.byids(huc_level, huc_id)
-        return gdf.iloc[0]["geometry"]
+        store = get_huc_store()
+        geometry = store.get(huc_level, huc_id) if store is not None else None
+        if geometry is not None:
+            return geometry
+    except Exception as e:
+        logger.warning(f"Could not read HUC {huc_id} from the HUC store: {e}")
+
+    # pygeohydro pulls in the whole geospatial stack, so only load it here.
+    from pygeohydro import WBD
+    from pygeoogc.exceptions import ZeroMatchedError
+
+    try:
+        gdf = WBD(huc_level).byids(huc_level, huc_id)
     except ZeroMatchedError:
         logger.warning(f"No HUC boundary found for HUC ID {huc_id}")
         return None
@@ -624,9 +647,25 @@ def get_huc_boundary(huc_level, huc_id):
         logger.error(f"Error fetching HUC boundary: {e}")
         return None
 
+    if store is not None:
+        try:
+            store.add(huc_level, gdf)
+        except Exception as e:
+            logger.warning(f"Could not add HUC {huc_id} to the HUC store: {e}")
+    return gdf.iloc[0]["geometry"]
+
 
 def get_centroid_huc(huc_id):
     huc_level = f"huc{len(str(huc_id))}"
+    try:
+        store = get_huc_store()
+        centroid = store.centroid(huc_level, huc_id) if store is not None else None
+        if centroid is not None:
+            return centroid
+    except Exception as e:
+        logger.warning(f"Could not read HUC {huc_id} from the HUC store: {e}")
     geom = get_huc_boundary(huc_level, huc_id)
+    if geom is None:
+        return None
     centroid = geom.centroid
     return [centroid.x, centroid.y]
@@ -0,0 +1,216 @@
+"""
+Compact encodings of the plotly figures returned by the time series drivers.
+
+Traces are built with ``x``/``y`` as JSON lists (ISO date strings and
+numbers). The encoding is selected per driver with the ``encoding``
+metadata option or for the process with ``CIROH_PLUGINS_PLOTLY_ENCODING``:
+
+``json`` (default)
+    The traces as built.
+``compact``
+    Time axes on a fixed step (the hourly, 3-hourly and 6-hourly model
+    series) are sent as ``x0``/``dx`` instead of one date string per point.
+    Traces with gaps keep their explicit ``x``.
+``binary``
+    ``compact``, and the remaining numeric arrays become plotly.js typed
+    arrays, ``{"dtype": "f8", "bdata": "<base64>"}``, with dates as epoch
+    milliseconds. plotly.js (2.28+) then decodes each array in one go
+    instead of parsing a number or a date string per point.
+
+Only ISO 8601 date strings (``2025-01-06``, ``2025-01-06T13:00:00Z``) are
+treated as dates; other ``x`` values, such as ``YYYYMMDD`` strings or
+numbers, are left as they are.
+"""
+import base64
+import logging
+import os
+import re
+import warnings
+
+from .instrumentation import read_option, stage
+
+logger = logging.getLogger(__name__)
+
+ENCODINGS = ("json", "compact", "binary")
+DEFAULT_ENCODING = "json"
+# Trace attributes holding one value per point.
+ARRAY_KEYS = ("x", "y", "customdata")
+# plotly prints these raw in hover templates, so they keep every digit
+# (like the epoch milliseconds of time axes).
+EXACT_KEYS = ("customdata",)
+ISO_DATE = re.compile(r"\d{4}-\d{2}-\d{2}(?:[T ]|$)")
+
+
+def plotly_encoding(source):
+    """Return the encoding to use for the figures of ``source``."""
+    value = read_option(source, "encoding") or os.environ.get("CIROH_PLUGINS_PLOTLY_ENCODING")
+    if not value:
+        return DEFAULT_ENCODING
+    value = str(value).strip().lower()
+    if value not in ENCODINGS:
+        logger.warning(f"Unknown plotly encoding {value!r}, expected one of {ENCODINGS}")
+        return DEFAULT_ENCODING
+    return value
+
+
+def decimals(values, most=6):
+    """Fewest decimal places (up to ``most``) that ``values`` are written with, or None."""
+    import numpy as np
+
+    for places in range(most + 1):
+        if (np.round(values, places) == values).all():
+            return places
+    return None
+
+
+def typed_array(values, exact=False):
+    """
+    ``{"dtype", "bdata"}`` typed array of a float NumPy array. Whole numbers
+    that fit are sent as int32. Unless ``exact`` is set, values with few
+    enough significant digits for float32 to tell them apart at their
+    decimal precision (e.g. ``46.29``) are sent as float32. Both take half
+    the size of float64.
+    """
+    import numpy as np
+
+    finite = values[np.isfinite(values)]
+    places = decimals(finite) if finite.size else None
+    peak = np.abs(finite).max() if finite.size else 0
+    if places == 0 and finite.size == values.size and peak < 2**31:
+        values, dtype = values.astype("<i4"), "i4"
+    elif not exact and places is not None and peak * 10**places < 2**23:
+        values, dtype = values.astype("<f4"), "f4"
+    else:
+        values, dtype = values.astype("<f8"), "f8"
+    return {"dtype": dtype, "bdata": base64.b64encode(np.ascontiguousarray(values).data).decode("ascii")}
+
+
+def epoch_ms(values):
+    """
+    Float64 epoch milliseconds of ISO 8601 date strings (UTC). Raises
+    ValueError for anything else, as plotly would not read it as a date.
+    """
+    import numpy as np
+
+    if not all(isinstance(value, str) and ISO_DATE.match(value) for value in values):
+        raise ValueError("not ISO 8601 date strings")
+    strings = np.asarray(values, dtype=str)
+    try:
+        # NumPy parses ISO strings natively but rejects the UTC designator
+        # and only warns about other offsets, which pandas handles.
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            times = np.char.rstrip(strings, "Z").astype("datetime64[ms]")
+    except (ValueError, UserWarning):
+        import pandas as pd
+
+        times = pd.to_datetime(strings, utc=True).values.astype("datetime64[ms]")
+    return times.astype("i8").astype("f8")
+
+
+def regular_step(times):
+    """The step of evenly spaced, increasing ``times``, or None."""
+    import numpy as np
+
+    if len(times) < 3:
+        return None
+    steps = np.diff(times)
+    if steps[0] > 0 and (steps == steps[0]).all():
+        return steps[0]
+    return None
+
+
+def compress_time_axes(traces, key="x"):
+    """
+    Replace evenly spaced date arrays ``key`` of ``traces`` in place with
+    ``<key>0``/``d<key>`` (the step in milliseconds, as plotly expects on
+    date axes). Returns True if any trace was compressed.
+    """
+    compressed = False
+    for trace in traces:
+        values = trace.get(key)
+        if not isinstance(values, list) or not values:
+            continue
+        try:
+            step = regular_step(epoch_ms(values))
+        except ValueError:
+            continue
+        if step is None:
+            continue
+        del trace[key]
+        trace[f"{key}0"] = values[0]
+        trace[f"d{key}"] = int(step)
+        compressed = True
+    return compressed
+
+
+def json_values(values):
+    """Float array to list, with NaN (not valid JSON) as None."""
+    import numpy as np
+
+    if not np.isnan(values).any():
+        return values.tolist()
+    return [None if value != value else value for value in values.tolist()]
+
+
+def numeric(values):
+    """Float64 array of ``values`` (None as NaN), or None if not numeric."""
+    import numpy as np
+
+    try:
+        array = np.asarray(values, dtype=float)
+    except (TypeError, ValueError):
+        return None
+    return array if array.ndim == 1 else None
+
+
+def encode_traces(traces, time_keys=("x",)):
+    """
+    Replace the per-point lists of ``traces`` in place with typed arrays.
+    Returns True if a time axis was converted to epoch milliseconds.
+    """
+    converted_time = False
+    for trace in traces:
+        for key in ARRAY_KEYS:
+            values = trace.get(key)
+            if not isinstance(values, list) or not values:
+                continue
+            if key in time_keys:
+                try:
+                    array = epoch_ms(values)
+                except ValueError as e:
+                    logger.warning(f"Leaving trace {trace.get('name')!r} {key} as JSON: {e}")
+                    continue
+                converted_time = True
+            else:
+                array = numeric(values)
+                if array is None:
+                    continue
+            encoded = typed_array(array, exact=key in EXACT_KEYS or key in time_keys)
+            if key in EXACT_KEYS and encoded["dtype"] == "f8":
+                continue  # short decimals are smaller as JSON text than as float64
+            trace[key] = encoded
+    return converted_time
+
+
+def encode_figure(figure, encoding=DEFAULT_ENCODING):
+    """
+    Return ``figure`` in ``encoding``. ``figure`` is a plotly figure dict,
+    ``{"figures": [...]}`` or ``{"data": traces}``; it is modified in place
+    and its x axis is marked as a date axis when a time axis changed form.
+    """
+    if encoding == "json" or not isinstance(figure, dict):
+        return figure
+    if "figures" in figure:
+        for item in figure["figures"]:
+            encode_figure(item, encoding)
+        return figure
+    with stage("encode", encoding=encoding):
+        traces = figure.get("data", [])
+        dated = compress_time_axes(traces)
+        if encoding == "binary":
+            dated = encode_traces(traces) or dated
+        if dated and "layout" in figure:
+            # Without the x strings plotly could not infer the axis type.
+            figure["layout"].setdefault("xaxis", {})["type"] = "date"
+    return figure
@@ -0,0 +1,175 @@
+"""
+Opt-in profiling of driver ``read()`` calls.
+
+Profiling is switched on per process with ``CIROH_PLUGINS_PROFILE`` or per
+driver with the ``profile`` metadata option, both taking ``cprofile`` or
+``tracemalloc`` (``1``/``true`` mean ``cprofile``). Reports are keyed by the
+driver call, e.g. ``NWMPService(huc_id='1711', layer_id=0, service=...)``,
+and written to ``CIROH_PLUGINS_PROFILE_DIR`` (default
+``<cache dir>/profiles``):
+
+``cprofile``
+    ``<key>-<time>-<pid>.prof`` (pstats format, loadable by ``pstats`` or
+    snakeviz) and a ``.txt`` with the top functions by cumulative time.
+    The coroutines of a profiled read run in the calling thread (see
+    :func:`~ciroh_plugins.async_runner.calling_thread_loop`) so they show
+    up in the report.
+``tracemalloc``
+    ``<key>-<time>-<pid>.txt`` with the peak traced memory and the source
+    lines holding the most memory allocated during the read.
+
+``CIROH_PLUGINS_PROFILE_DRIVERS`` optionally restricts the environment
+switch to a comma separated list of driver class names, so a single slow
+widget can be profiled on a live deployment.
+"""
+import cProfile
+import functools
+import io
+import logging
+import os
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+
+from .async_runner import calling_thread_loop
+from .cache import cache_dir
+from .instrumentation import read_option
+
+logger = logging.getLogger(__name__)
+
+MODES = ("cprofile", "tracemalloc")
+REPORT_LINES = 50
+
+_tracemalloc_lock = threading.Lock()
+
+
+def _mode(value):
+    if value in (None, False, ""):
+        return None
+    value = str(value).strip().lower()
+    if value in ("0", "false", "off", "no"):
+        return None
+    if value in ("1", "true", "on", "yes"):
+        return "cprofile"
+    if value not in MODES:
+        logger.warning(f"Unknown profile mode {value!r}, expected one of {MODES}")
+        return None
+    return value
+
+
+def profile_mode(source):
+    """Return the profiler to use for ``source.read()``, or None."""
+    mode = _mode(read_option(source, "profile"))
+    if mode:
+        return mode
+    mode = _mode(os.environ.get("CIROH_PLUGINS_PROFILE"))
+    drivers = os.environ.get("CIROH_PLUGINS_PROFILE_DRIVERS")
+    if mode and drivers:
+        names = {name.strip() for name in drivers.split(",")}
+        if type(source).__name__ not in names:
+            return None
+    return mode
+
+
+def report_key(source):
+    """``ClassName(arg=value, ...)`` built from the driver's constructor arguments."""
+    args = [repr(a) for a in getattr(source, "_captured_init_args", ())]
+    kwargs = getattr(source, "_captured_init_kwargs", {})
+    args += [f"{k}={v!r}" for k, v in sorted(kwargs.items()) if k != "metadata"]
+    args = [a if len(a) <= 80 else a[:77] + "..." for a in args]
+    return f"{type(source).__name__}({', '.join(args)})"
+
+
+def report_dir():
+    directory = os.environ.get("CIROH_PLUGINS_PROFILE_DIR") or cache_dir("profiles")
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def _report_base(key):
+    safe = re.sub(r"[^A-Za-z0-9_.=-]+", "_", key).strip("_")[:150]
+    now = time.time()
+    stamp = time.strftime("%Y%m%dT%H%M%S", time.localtime(now)) + f".{int(now * 1000) % 1000:03d}"
+    return os.path.join(report_dir(), f"{safe}-{stamp}-{os.getpid()}")
+
+
+def _write_text(path, text):
+    with open(path, "w") as file:
+        file.write(text)
+
+
+def _run_cprofile(source, read, args, kwargs):
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:  # another profiler is active in this thread
+        logger.warning(f"Not profiling {type(source).__name__}.read(): {e}")
+        return read(source, *args, **kwargs)
+    start = time.perf_counter()
+    try:
+        with calling_thread_loop():
+            return read(source, *args, **kwargs)
+    finally:
+        profiler.disable()
+        elapsed = time.perf_counter() - start
+        key = report_key(source)
+        try:
+            base = _report_base(key)
+            profiler.dump_stats(f"{base}.prof")
+            stream = io.StringIO()
+            stream.write(f"{key}\nread() took {elapsed:.3f} s\n\n")
+            pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(REPORT_LINES)
+            _write_text(f"{base}.txt", stream.getvalue())
+            logger.info(f"Profile of {key} ({elapsed:.3f} s) written to {base}.prof")
+        except OSError as e:
+            logger.error(f"Could not write profile of {key}: {e}")
+
+
+def _run_tracemalloc(source, read, args, kwargs):
+    # tracemalloc is process wide, so only one read is traced at a time.
+    if not _tracemalloc_lock.acquire(blocking=False):
+        logger.warning(f"Not tracing {type(source).__name__}.read(): another read is being traced")
+        return read(source, *args, **kwargs)
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    if hasattr(tracemalloc, "reset_peak"):  # Python 3.9+
+        tracemalloc.reset_peak()
+    before = tracemalloc.take_snapshot()
+    start = time.perf_counter()
+    try:
+        return read(source, *args, **kwargs)
+    finally:
+        elapsed = time.perf_counter() - start
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        if started:
+            tracemalloc.stop()
+        _tracemalloc_lock.release()
+        key = report_key(source)
+        stats = after.compare_to(before, "lineno")[:REPORT_LINES]
+        lines = [key, f"read() took {elapsed:.3f} s, peak traced memory {peak / 2**20:.1f} MB", ""]
+        lines += [str(stat) for stat in stats]
+        try:
+            base = _report_base(key)
+            _write_text(f"{base}.txt", "\n".join(lines) + "\n")
+            logger.info(f"Allocation report of {key} (peak {peak / 2**20:.1f} MB) written to {base}.txt")
+        except OSError as e:
+            logger.error(f"Could not write allocation report of {key}: {e}")
+
+
+def profiled_read(read):
+    """Decorator for ``DataSource.read`` running it under the configured profiler."""
+
+    @functools.wraps(read)
+    def wrapper(self, *args, **kwargs):
+        mode = profile_mode(self)
+        if mode == "cprofile":
+            return _run_cprofile(self, read, args, kwargs)
+        if mode == "tracemalloc":
+            return _run_tracemalloc(self, read, args, kwargs)
+        return read(self, *args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,276 @@
+"""
+Process-wide pooled HTTP clients shared by every driver.
+
+All upstream requests go through one sync ``httpx.Client`` (and one
+``httpx.AsyncClient`` per running event loop) so that keep-alive connections
+and TLS sessions are reused across widgets instead of being renegotiated for
+every read.
+
+Settings are read from the environment:
+
+``CIROH_PLUGINS_HTTP_TIMEOUT``
+    Read/write/pool timeout in seconds (default 120).
+``CIROH_PLUGINS_HTTP_CONNECT_TIMEOUT``
+    Connect timeout in seconds (default 15).
+``CIROH_PLUGINS_HTTP_MAX_CONNECTIONS``
+    Total connections kept by a client (default 100).
+``CIROH_PLUGINS_HTTP_MAX_KEEPALIVE``
+    Idle keep-alive connections kept by a client (default 20).
+``CIROH_PLUGINS_HTTP_KEEPALIVE_EXPIRY``
+    Seconds an idle connection is kept open (default 30).
+``CIROH_PLUGINS_HTTP_MAX_PER_HOST``
+    Concurrent requests allowed per upstream host (default 10).
+``CIROH_PLUGINS_HTTP2``
+    Set to ``0`` to disable HTTP/2. It is used when the ``h2`` package is
+    installed (``httpx[http2]``), so concurrent requests to one host, like
+    the reach product fan-out, multiplex over a single connection.
+``CIROH_PLUGINS_HTTP_RETRIES``
+    Extra attempts for a request that fails with a transport error such as
+    a refused connection or a read timeout (default 0).
+``CIROH_PLUGINS_HTTP_INSECURE_HOSTS``
+    Comma separated hosts (e.g. ``droughtmonitor.unl.edu``) whose TLS
+    certificates are not verified, for upstreams with a broken chain.
+    Certificates of every other host are verified.
+``CIROH_PLUGINS_UPSTREAM_OVERRIDES``
+    Comma separated ``origin=replacement`` pairs used to point upstream base
+    URLs somewhere else, e.g.
+    ``https://api.water.noaa.gov=http://127.0.0.1:8000/api.water.noaa.gov``
+    (used by the offline benchmarks).
+"""
+import asyncio
+import atexit
+import functools
+import logging
+import os
+import threading
+import weakref
+from urllib.parse import urlsplit
+
+import httpx
+
+from .instrumentation import stage
+
+logger = logging.getLogger(__name__)
+
+
+def _env_number(name, default, cast=float):
+    value = os.environ.get(name)
+    if value in (None, ""):
+        return default
+    try:
+        return cast(value)
+    except ValueError:
+        logger.warning(f"Invalid value for {name}: {value!r}, using {default}")
+        return default
+
+
+HTTP_TIMEOUT = _env_number("CIROH_PLUGINS_HTTP_TIMEOUT", 120.0)
+HTTP_CONNECT_TIMEOUT = _env_number("CIROH_PLUGINS_HTTP_CONNECT_TIMEOUT", 15.0)
+MAX_CONNECTIONS = _env_number("CIROH_PLUGINS_HTTP_MAX_CONNECTIONS", 100, int)
+MAX_KEEPALIVE_CONNECTIONS = _env_number("CIROH_PLUGINS_HTTP_MAX_KEEPALIVE", 20, int)
+KEEPALIVE_EXPIRY = _env_number("CIROH_PLUGINS_HTTP_KEEPALIVE_EXPIRY", 30.0)
+MAX_CONNECTIONS_PER_HOST = _env_number("CIROH_PLUGINS_HTTP_MAX_PER_HOST", 10, int)
+HTTP_RETRIES = _env_number("CIROH_PLUGINS_HTTP_RETRIES", 0, int)
+HTTP2 = os.environ.get("CIROH_PLUGINS_HTTP2", "1") != "0"
+INSECURE_HOSTS = frozenset(
+    host.strip().lower()
+    for host in os.environ.get("CIROH_PLUGINS_HTTP_INSECURE_HOSTS", "").split(",")
+    if host.strip()
+)
+
+
+def _parse_overrides(value):
+    overrides = {}
+    for pair in (value or "").split(","):
+        if "=" in pair:
+            origin, replacement = pair.split("=", 1)
+            overrides[origin.strip().rstrip("/")] = replacement.strip().rstrip("/")
+    return overrides
+
+
+_upstream_overrides = _parse_overrides(os.environ.get("CIROH_PLUGINS_UPSTREAM_OVERRIDES"))
+_lock = threading.Lock()
+# verify -> Client
+_clients = {}
+_host_semaphores = {}
+# event loop -> ({verify: AsyncClient}, {host: asyncio.Semaphore})
+_async_clients = weakref.WeakKeyDictionary()
+
+
+@functools.lru_cache(maxsize=None)
+def _http2_available():
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.info("h2 is not installed, upstream requests use HTTP/1.1")
+        return False
+    return True
+
+
+def _client_options(verify=True):
+    return {
+        "http2": HTTP2 and _http2_available(),
+        "verify": verify,
+        "timeout": httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        "limits": httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+        "follow_redirects": True,
+    }
+
+
+def set_upstream_overrides(overrides):
+    """Replace the upstream base URL overrides (``{origin: replacement}``)."""
+    global _upstream_overrides
+    _upstream_overrides = {
+        origin.rstrip("/"): replacement.rstrip("/")
+        for origin, replacement in (overrides or {}).items()
+    }
+
+
+def resolve_url(url):
+    """Apply the configured upstream overrides to ``url``."""
+    if _upstream_overrides:
+        url = str(url)
+        for origin, replacement in _upstream_overrides.items():
+            if url.startswith(origin):
+                return replacement + url[len(origin):]
+    return url
+
+
+def _host(url):
+    return urlsplit(str(url)).netloc
+
+
+def _verify(url):
+    """Whether the TLS certificate of ``url``'s host is verified."""
+    return (urlsplit(str(url)).hostname or "") not in INSECURE_HOSTS
+
+
+def get_client(verify=True):
+    """Return the shared synchronous client, creating it on first use."""
+    client = _clients.get(verify)
+    if client is None:
+        with _lock:
+            client = _clients.get(verify)
+            if client is None:
+                client = _clients[verify] = httpx.Client(**_client_options(verify))
+    return client
+
+
+def get_async_client(verify=True):
+    """Return the async client bound to the running event loop."""
+    clients = _async_state()[0]
+    client = clients.get(verify)
+    if client is None:
+        client = clients[verify] = httpx.AsyncClient(**_client_options(verify))
+    return client
+
+
+def _async_state():
+    loop = asyncio.get_running_loop()
+    state = _async_clients.get(loop)
+    if state is None:
+        state = ({}, {})
+        _async_clients[loop] = state
+    return state
+
+
+def _host_semaphore(url):
+    host = _host(url)
+    semaphore = _host_semaphores.get(host)
+    if semaphore is None:
+        with _lock:
+            semaphore = _host_semaphores.setdefault(
+                host, threading.BoundedSemaphore(MAX_CONNECTIONS_PER_HOST)
+            )
+    return semaphore
+
+
+def _record(event, response):
+    event["status"] = response.status_code
+    event["bytes"] = len(response.content)
+
+
+def request(method, url, **kwargs):
+    """Send a request through the shared client, honoring the per-host limit."""
+    url = resolve_url(url)
+    with stage("http", method=method, url=str(url), retries=0) as event:
+        with _host_semaphore(url):
+            for attempt in range(HTTP_RETRIES + 1):
+                try:
+                    response = get_client(_verify(url)).request(method, url, **kwargs)
+                    break
+                except httpx.TransportError as exc:
+                    if attempt == HTTP_RETRIES:
+                        raise
+                    logger.warning(f"Retrying {method} {url} after {exc!r}")
+                    event["retries"] = attempt + 1
+        _record(event, response)
+        return response
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+async def arequest(method, url, **kwargs):
+    """Async counterpart of :func:`request` using the loop's shared client."""
+    url = resolve_url(url)
+    client = get_async_client(_verify(url))
+    semaphores = _async_state()[1]
+    host = _host(url)
+    semaphore = semaphores.get(host)
+    if semaphore is None:
+        semaphore = semaphores[host] = asyncio.Semaphore(MAX_CONNECTIONS_PER_HOST)
+    with stage("http", method=method, url=str(url), retries=0) as event:
+        async with semaphore:
+            for attempt in range(HTTP_RETRIES + 1):
+                try:
+                    response = await client.request(method, url, **kwargs)
+                    break
+                except httpx.TransportError as exc:
+                    if attempt == HTTP_RETRIES:
+                        raise
+                    logger.warning(f"Retrying {method} {url} after {exc!r}")
+                    event["retries"] = attempt + 1
+        _record(event, response)
+        return response
+
+
+async def aget(url, **kwargs):
+    return await arequest("GET", url, **kwargs)
+
+
+async def aclose_loop_clients():
+    """Close the async clients of the running event loop (for short-lived loops)."""
+    state = _async_clients.pop(asyncio.get_running_loop(), None)
+    if state is not None:
+        for client in state[0].values():
+            await client.aclose()
+
+
+def close_clients():
+    """Close the shared sync clients and forget every async client."""
+    with _lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+        _async_clients.clear()
+
+
+def _reset_after_fork():
+    # Pooled sockets must never be shared between a parent and its forked
+    # workers (e.g. gunicorn pre-fork), so children start with empty pools.
+    global _lock
+    _lock = threading.Lock()
+    _clients.clear()
+    _host_semaphores.clear()
+    _async_clients.clear()
+
+
+atexit.register(close_clients)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,48 @@
+import threading
+
+_UNSET = object()
+
+
+class classproperty:
+    """
+    Class attribute computed on every access, for ``visualization_args``
+    whose options change while the process runs (e.g. USDM release dates).
+    """
+
+    def __init__(self, func):
+        self.func = func
+        self.__doc__ = func.__doc__
+
+    def __get__(self, instance, owner=None):
+        return self.func(owner if owner is not None else type(instance))
+
+
+class cached_classproperty:
+    """
+    Class attribute computed on first access and cached afterwards.
+
+    Used for ``visualization_args`` whose options are expensive to build
+    (file reads, upstream calls), so importing a driver module only costs
+    bytecode loading and the options are produced when first requested.
+    """
+
+    def __init__(self, func):
+        self.func = func
+        self.__doc__ = func.__doc__
+        self._value = _UNSET
+        self._lock = threading.Lock()
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if self._value is _UNSET:
+            with self._lock:
+                if self._value is _UNSET:
+                    self._value = self.func(owner if owner is not None else type(instance))
+        return self._value
+
+    def reset(self):
+        """Drop the cached value so the next access recomputes it."""
+        with self._lock:
+            self._value = _UNSET
@@ -0,0 +1,170 @@
+import asyncio
+import threading
+
+import httpx
+from shapely.geometry import box
+
+from ciroh_plugins.async_runner import iterate
+from ciroh_plugins.nwmps import arcgis
+from ciroh_plugins.nwmps.arcgis import IncompletePagesError, query_pages
+from ciroh_plugins.nwmps.service import NWMPService
+
+SERVICE = "https://maps.water.noaa.gov/server/rest/services/nwm/ana_high_flow_magnitude/MapServer/"
+SYMBOLS = [
+    {"value": "2", "label": "2 year", "symbol": {"color": [0, 0, 255, 255]}},
+    {"value": "5", "label": "5 year", "symbol": {"color": [0, 40, 255, 255]}},
+    {"value": "10", "label": "10 year", "symbol": {"color": [0, 80, 255, 255]}},
+]
+LAYER_INFO = {
+    "name": "Est. Annual Exceedance Probability",
+    "maxRecordCount": 1000,
+    "drawingInfo": {"renderer": {"uniqueValueInfos": SYMBOLS}},
+}
+
+
+class FakeLayer:
+    """Stands in for ``transport.arequest`` against one feature layer (object ids 1..n)."""
+
+    def __init__(self, values, fail_from=()):
+        self.values = values
+        self.fail_from = set(fail_from)  # first object id of the pages that time out
+
+    async def __call__(self, method, url, data=None, **kwargs):
+        request = httpx.Request(method, url)
+        await asyncio.sleep(0)
+        if data.get("returnIdsOnly") == "true":
+            return httpx.Response(200, json={"objectIds": list(range(1, len(self.values) + 1))}, request=request)
+        oids = [int(oid) for oid in data["objectIds"].split(",")]
+        if oids[0] in self.fail_from:
+            raise httpx.ReadTimeout("timed out", request=request)
+        if data.get("f") == "geojson":
+            features = [
+                {
+                    "type": "Feature",
+                    "id": oid,
+                    "geometry": {"type": "Point", "coordinates": [0.5, 0.5]},
+                    "properties": {"OBJECTID": oid, "recur_cat": self.values[oid - 1]},
+                }
+                for oid in oids
+            ]
+            return httpx.Response(200, json={"type": "FeatureCollection", "features": features}, request=request)
+        features = [{"attributes": {"recur_cat": self.values[oid - 1]}} for oid in oids]
+        return httpx.Response(200, json={"features": features}, request=request)
+
+
+def collect(pages):
+    async def consume():
+        payloads = []
+        try:
+            async for payload in pages:
+                payloads.append(payload)
+        except IncompletePagesError as e:
+            return payloads, e
+        return payloads, None
+
+    return asyncio.run(consume())
+
+
+def make_service():
+    service = NWMPService(SERVICE, "1711", 0, metadata={"page_size": 3})
+    service.layer_info = LAYER_INFO
+    return service
+
+
+def test_query_pages_keeps_other_pages_after_a_failure(monkeypatch):
+    monkeypatch.setattr(arcgis, "arequest", FakeLayer(["2"] * 10, fail_from=[4]))
+    params = {"outFields": "recur_cat", "returnGeometry": "false"}
+    payloads, error = collect(query_pages("http://layer/0", list(range(1, 11)), params, size=3, concurrency=2))
+
+    values = [value for payload in payloads for value in arcgis.field_values(payload, "recur_cat")]
+    assert len(payloads) == 3
+    assert len(values) == 7
+    assert error is not None and (error.failed, error.total) == (1, 4)
+
+
+def test_query_pages_without_failures_ends_normally(monkeypatch):
+    monkeypatch.setattr(arcgis, "arequest", FakeLayer(["2"] * 10))
+    payloads, error = collect(query_pages("http://layer/0", list(range(1, 11)), {}, size=3, concurrency=4))
+    assert len(payloads) == 4
+    assert error is None
+
+
+def test_feature_statistics_count_the_pages_that_arrived(monkeypatch):
+    values = ["2", "5", "10", "2", "2", "2", "5", "10", "10"]
+    monkeypatch.setattr(arcgis, "arequest", FakeLayer(values, fail_from=[4]))
+    stats = make_service().get_feature_statistics(SERVICE, box(0, 0, 1, 1))
+
+    # Object ids 4-6 ("2" x 3) were on the failed page.
+    assert {record["label"]: record["value"] for record in stats} == {"2 year": 1, "5 year": 2, "10 year": 3}
+
+
+def test_attribute_statistics_fall_back_when_a_page_fails(monkeypatch):
+    monkeypatch.setattr(arcgis, "arequest", FakeLayer(["2"] * 9, fail_from=[4]))
+    assert make_service().get_attribute_statistics(SERVICE, box(0, 0, 1, 1)) is None
+
+
+def test_attribute_statistics_count_every_page(monkeypatch):
+    monkeypatch.setattr(arcgis, "arequest", FakeLayer(["2", "5", "10"] * 3))
+    stats = make_service().get_attribute_statistics(SERVICE, box(0, 0, 1, 1))
+    assert {record["label"]: record["value"] for record in stats} == {"2 year": 3, "5 year": 3, "10 year": 3}
+
+
+def test_statistics_follow_the_symbol_order(monkeypatch):
+    monkeypatch.setattr(arcgis, "arequest", FakeLayer(["10", "5", "2", "10"]))
+    service = make_service()
+    for stats in (
+        service.get_attribute_statistics(SERVICE, box(0, 0, 1, 1)),
+        service.get_feature_statistics(SERVICE, box(0, 0, 1, 1)),
+    ):
+        assert [record["label"] for record in stats] == ["2 year", "5 year", "10 year"]
+
+
+def test_class_break_statistics_follow_the_symbol_order():
+    import numpy as np
+
+    symbols = [
+        {"classMaxValue": max_value, "label": label, "symbol": {"color": [i, 0, 0, 255]}}
+        for i, (max_value, label) in enumerate([(3, "0 - 3 hours"), (12, "3 - 12 hours"), (None, "> 12 hours")])
+    ]
+    totals = NWMPService.count_labels_by_range(np.array([20.0, 1.0, 5.0, 30.0]), symbols)
+    records = NWMPService.statistics_records(totals, symbols)
+    assert [(record["label"], record["value"]) for record in records] == [
+        ("0 - 3 hours", 1), ("3 - 12 hours", 1), ("> 12 hours", 2)
+    ]
+
+
+def test_pages_are_processed_in_the_calling_thread(monkeypatch):
+    monkeypatch.setattr(arcgis, "arequest", FakeLayer(["2", "5", "10"] * 3))
+    threads = set()
+
+    def spy(method):
+        def wrapper(*args, **kwargs):
+            threads.add(threading.get_ident())
+            return method(*args, **kwargs)
+
+        return wrapper
+
+    monkeypatch.setattr(NWMPService, "page_frame", staticmethod(spy(NWMPService.page_frame)))
+    monkeypatch.setattr(NWMPService, "count_labels", staticmethod(spy(NWMPService.count_labels)))
+    monkeypatch.setattr(NWMPService, "count_labels_by_value", spy(NWMPService.count_labels_by_value))
+    service = make_service()
+    assert service.get_feature_statistics(SERVICE, box(0, 0, 1, 1))
+    assert service.get_attribute_statistics(SERVICE, box(0, 0, 1, 1))
+    assert threads == {threading.get_ident()}
+
+
+def test_iterate_closes_the_pages_when_stopped_early(monkeypatch):
+    monkeypatch.setattr(arcgis, "arequest", FakeLayer(["2"] * 10))
+    closed = []
+
+    async def pages():
+        try:
+            async for payload in query_pages("http://layer/0", list(range(1, 11)), {}, size=3, concurrency=2):
+                yield payload
+        finally:
+            closed.append(True)
+
+    for payload in iterate(pages()):
+        assert arcgis.field_values(payload, "recur_cat") == ["2"] * 3
+        break
+    assert closed == [True]
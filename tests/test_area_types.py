@@ -0,0 +1,65 @@
+import pytest
+
+from ciroh_plugins.drought.area_types import AreaTypeCatalog, get_area_type_catalog
+
+GROUPS = [
+    ("State", "state", [("06", "California"), ("41", "Oregon"), ("45", "South Carolina")]),
+    ("County", "county", [("06073", "San Diego County (CA)"), ("45001", "Abbeville County (SC)"),
+                          ("45003", "Aiken County (SC)")]),
+]
+
+
+def values(page):
+    return [option["value"] for option in page["options"]]
+
+
+@pytest.fixture
+def catalog():
+    return AreaTypeCatalog(GROUPS)
+
+
+def test_query_pages_through_everything(catalog):
+    assert values(catalog.query(limit=None)) == [
+        "state-06", "state-41", "state-45", "county-06073", "county-45001", "county-45003"
+    ]
+    page = catalog.query(offset=2, limit=3)
+    assert (page["total"], page["offset"], page["limit"]) == (6, 2, 3)
+    assert values(page) == ["state-45", "county-06073", "county-45001"]
+    assert values(catalog.query(offset=10)) == []
+
+
+def test_query_by_group_label_or_key(catalog):
+    assert values(catalog.query(group="County")) == values(catalog.query(group=" county "))
+    assert values(catalog.query(group="county", limit=1)) == ["county-06073"]
+    with pytest.raises(KeyError):
+        catalog.query(group="Watershed")
+
+
+def test_query_by_prefix_of_label_or_code(catalog):
+    assert values(catalog.query(prefix="SAN d")) == ["county-06073"]
+    assert values(catalog.query(prefix="450")) == ["county-45001", "county-45003"]
+    # "Oregon" by label; "06" matches California's code and San Diego's.
+    assert values(catalog.query(prefix="o")) == ["state-41"]
+    assert values(catalog.query(prefix="06")) == ["state-06", "county-06073"]
+    assert catalog.query(prefix="zz")["total"] == 0
+
+
+def test_query_by_group_and_prefix(catalog):
+    page = catalog.query(group="state", prefix="s", limit=1)
+    assert page["total"] == 1 and values(page) == ["state-45"]
+    assert values(catalog.query(group="county", prefix="a")) == ["county-45001", "county-45003"]
+
+
+def test_catalog_round_trips(catalog, tmp_path):
+    path = tmp_path / "catalog.json.gz"
+    catalog.save(path)
+    loaded = AreaTypeCatalog.load(path)
+    assert loaded.dropdown() == catalog.dropdown()
+    assert AreaTypeCatalog.from_dropdown(catalog.dropdown()).groups == catalog.groups
+    assert loaded.label_for("county-45003") == "Aiken County (SC)" and "state-41" in loaded
+
+
+def test_shipped_catalog_loads():
+    catalog = get_area_type_catalog()
+    assert len(catalog) > 3000
+    assert catalog.query(group="State", prefix="calif")["total"] == 1
@@ -0,0 +1,38 @@
+import asyncio
+
+import httpx
+
+from ciroh_plugins import transport
+from ciroh_plugins.cache import ResponseCache, acached_get, cached_get
+
+
+def fake_upstream(monkeypatch):
+    calls = []
+
+    async def aget(url, params=None, headers=None):
+        calls.append(url)
+        return httpx.Response(200, json={"n": len(calls)}, request=httpx.Request("GET", url))
+
+    monkeypatch.setattr(transport, "aget", aget)
+    monkeypatch.setenv("CIROH_PLUGINS_HTTP_CACHE", "1")
+    return calls
+
+
+def test_sync_and_async_lookups_share_the_cache(monkeypatch, tmp_path):
+    calls = fake_upstream(monkeypatch)
+    responses = ResponseCache(directory=str(tmp_path))
+    url = "https://api.water.noaa.gov/nwps/v1/gauges/x"
+
+    assert cached_get(url, ttl=60, cache=responses).json() == {"n": 1}
+    cached = asyncio.run(acached_get(url, ttl=60, cache=responses))
+    assert cached.from_cache and cached.json() == {"n": 1}
+    assert responses.get(url, ttl=60).json() == {"n": 1}
+    assert calls == [url]
+
+
+def test_sync_lookups_bypass_a_disabled_cache(monkeypatch, tmp_path):
+    calls = fake_upstream(monkeypatch)
+    monkeypatch.setenv("CIROH_PLUGINS_HTTP_CACHE", "0")
+    url = "https://api.water.noaa.gov/nwps/v1/gauges/x"
+    assert [cached_get(url).json()["n"] for _ in range(2)] == [1, 2]
+    assert len(calls) == 2
@@ -0,0 +1,73 @@
+import os
+import threading
+from datetime import date
+
+import pytest
+
+from ciroh_plugins.drought import dates, utilities
+from ciroh_plugins.drought.dates import UsdmDateIndex, get_date_index, store_cached_dates
+from ciroh_plugins.drought.drought_map import DroughtMap
+from ciroh_plugins.drought.drought_pie import DroughtDataGraph
+
+
+@pytest.fixture
+def fresh_index(tmp_path, monkeypatch):
+    """A process-wide date index persisted under a temporary cache directory."""
+    monkeypatch.setenv("CIROH_PLUGINS_CACHE_DIR", str(tmp_path))
+    for name, value in [("_index", None), ("_index_day", None), ("_index_mtime", None), ("_fetched_at", None)]:
+        monkeypatch.setattr(dates, name, value)
+    return dates.dates_cache_path()
+
+
+def date_values(driver):
+    return [option["value"] for option in driver.visualization_args["date"][0]["options"]]
+
+
+@pytest.mark.parametrize("driver", [DroughtMap, DroughtDataGraph])
+def test_visualization_args_follow_new_releases(monkeypatch, driver):
+    index = UsdmDateIndex([date(2024, 1, 2)])
+    monkeypatch.setattr(utilities, "get_date_index", lambda: index)
+    assert date_values(driver) == ["20240102"]
+
+    index = UsdmDateIndex([date(2024, 1, 2), date(2024, 1, 9)])
+    assert date_values(driver) == ["20240109", "20240102"]
+
+
+def test_index_is_rebuilt_when_the_persisted_list_changes(fresh_index):
+    store_cached_dates(fresh_index, list(dates.iter_release_dates()))
+    first = get_date_index(reconcile_upstream=False)
+
+    # Another worker reconciled the list: an off-schedule release appeared.
+    extra = date(2001, 1, 3)
+    store_cached_dates(fresh_index, first.dates + [extra])
+    os.utime(fresh_index, (os.path.getatime(fresh_index), os.path.getmtime(fresh_index) + 10))
+    second = get_date_index(reconcile_upstream=False)
+
+    assert extra not in first
+    assert extra in second
+    assert "20010103" in [option["value"] for option in second.options()]
+
+
+def test_stale_list_starts_a_background_refresh(fresh_index, monkeypatch):
+    refreshed = []
+    monkeypatch.setattr(dates, "_next_refresh", 0.0)
+    monkeypatch.setattr(dates, "refresh_cached_dates", lambda today, path: refreshed.append(path))
+    get_date_index()
+    for thread in threading.enumerate():
+        if thread.name == "usdm-date-refresh":
+            thread.join(5)
+    assert refreshed == [fresh_index]
+
+
+@pytest.mark.parametrize(
+    "make_driver",
+    [
+        lambda day: DroughtMap(day, "https://example.com/arcgis/rest/services/usdm/MapServer/"),
+        lambda day: DroughtDataGraph("state-TX", day),
+    ],
+)
+@pytest.mark.parametrize("day, expected", [("20240103", "20240102"), ("2024-01-09", "20240109"), (None, "20240109")])
+def test_drivers_resolve_dates_without_raising(monkeypatch, make_driver, day, expected):
+    index = UsdmDateIndex([date(2024, 1, 2), date(2024, 1, 9)])
+    monkeypatch.setattr(dates, "get_date_index", lambda: index)
+    assert make_driver(day).date == expected
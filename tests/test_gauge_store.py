@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from ciroh_plugins.nwmps.gauge_store import GaugeStore, SeriesBlock
+
+START = datetime(2025, 9, 1)
+
+
+def points(first, count, step=15):
+    """``count`` observations every ``step`` minutes from index ``first``, primary = index."""
+    return [
+        {
+            "validTime": (START + timedelta(minutes=step * i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "primary": float(i),
+            "secondary": float(i) / 10 if i % 5 else -999.0,
+        }
+        for i in range(first, first + count)
+    ]
+
+
+def dataset(first, count, issued="2025-09-01T12:00:00Z"):
+    return {"issuedTime": issued, "primaryUnits": "ft", "data": points(first, count)}
+
+
+def assert_matches(block, expected):
+    fresh = SeriesBlock.from_dataset(expected)
+    assert block.times.tolist() == fresh.times.tolist()
+    assert np.array_equal(block.primary, fresh.primary, equal_nan=True)
+    assert np.array_equal(block.secondary, fresh.secondary, equal_nan=True)
+    assert block.get("issuedTime") == expected["issuedTime"]
+
+
+def test_slide_by_one_converts_only_the_new_point(monkeypatch):
+    block = SeriesBlock.from_dataset(dataset(0, 100))
+    converted = []
+    from_points = SeriesBlock.from_points.__func__
+
+    def spy(cls, pts, meta):
+        converted.append(len(pts))
+        return from_points(cls, pts, meta)
+
+    monkeypatch.setattr(SeriesBlock, "from_points", classmethod(spy))
+    merged = block.merge(dataset(1, 100, issued="2025-09-01T12:15:00Z"))
+    assert converted == [1]
+    assert_matches(merged, dataset(1, 100, issued="2025-09-01T12:15:00Z"))
+
+
+def test_slide_by_several_and_a_shrinking_window():
+    block = SeriesBlock.from_dataset(dataset(0, 100))
+    assert_matches(block.merge(dataset(7, 96)), dataset(7, 96))
+
+
+def test_identical_refresh_keeps_the_arrays():
+    block = SeriesBlock.from_dataset(dataset(0, 100))
+    merged = block.merge(dataset(0, 100, issued="2025-09-01T12:05:00Z"))
+    assert merged.times is block.times and merged.primary is block.primary
+    assert merged.get("issuedTime") == "2025-09-01T12:05:00Z"
+
+
+def test_jump_past_the_window_rebuilds():
+    block = SeriesBlock.from_dataset(dataset(0, 100))
+    assert_matches(block.merge(dataset(200, 100)), dataset(200, 100))
+
+
+def test_upstream_going_back_in_time_rebuilds():
+    block = SeriesBlock.from_dataset(dataset(50, 100))
+    assert_matches(block.merge(dataset(0, 100)), dataset(0, 100))
+
+
+def test_empty_refreshes_rebuild():
+    block = SeriesBlock.from_dataset(dataset(0, 10))
+    assert len(block.merge({"issuedTime": None, "data": []})) == 0
+    assert_matches(SeriesBlock.from_dataset({"issuedTime": None, "data": []}).merge(dataset(0, 3)), dataset(0, 3))
+
+
+def test_store_replaces_the_forecast_only_when_reissued():
+    store = GaugeStore()
+    first = store.update("G1", {"observed": dataset(0, 10), "forecast": dataset(10, 20)})
+    same = store.update("G1", {"observed": dataset(1, 10), "forecast": dataset(10, 20)})
+    assert same["forecast"] is first["forecast"]
+    assert_matches(same["observed"], dataset(1, 10))
+
+    reissued = store.update("G1", {"observed": dataset(1, 10), "forecast": dataset(12, 20, issued="2025-09-01T18:00:00Z")})
+    assert reissued["forecast"] is not first["forecast"]
+    assert_matches(reissued["forecast"], dataset(12, 20, issued="2025-09-01T18:00:00Z"))
+
+
+def test_store_evicts_the_least_recently_refreshed_gauge():
+    store = GaugeStore(size=2)
+    for gauge_id in ("G1", "G2", "G1", "G3"):
+        store.update(gauge_id, {"observed": dataset(0, 3)})
+    assert store.get("G2") is None
+    assert store.get("G1") is not None and store.get("G3") is not None
+    assert GaugeStore(size=0).update("G1", {"observed": dataset(0, 3)})["observed"].primary.tolist() == [0.0, 1.0, 2.0]
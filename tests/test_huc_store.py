@@ -0,0 +1,103 @@
+import os
+
+import geopandas as gpd
+import pytest
+from shapely.geometry import Point, box
+
+from ciroh_plugins.nwmps import huc_store, utilities
+from ciroh_plugins.nwmps.huc_store import BASE_FILE, HucStore
+
+
+def boundaries(*hucs, column="huc4"):
+    """WBD-like boundaries: HUC ``i`` is the unit square at x = i."""
+    return gpd.GeoDataFrame(
+        {column: [huc for huc, _ in hucs]},
+        geometry=[box(x, 0, x + 1, 1) for _, x in hucs],
+        crs=4326,
+    )
+
+
+def files(store, huc_level):
+    return sorted(os.listdir(store.path(huc_level)))
+
+
+class FakeWBD:
+    calls = 0
+
+    def __init__(self, huc_level):
+        self.huc_level = huc_level
+
+    def byids(self, field, ids):
+        FakeWBD.calls += 1
+        return boundaries((ids, 0), column=field)
+
+
+@pytest.fixture
+def wbd(monkeypatch):
+    import pygeohydro
+
+    FakeWBD.calls = 0
+    monkeypatch.setattr(pygeohydro, "WBD", FakeWBD)
+    monkeypatch.setattr(huc_store, "_store", None)
+    return FakeWBD
+
+
+def test_add_writes_only_the_new_rows(tmp_path):
+    store = HucStore(str(tmp_path))
+    store.add("huc4", boundaries(("1711", 0)))
+    first = files(store, "huc4")
+    mtime = os.path.getmtime(store.path("huc4") + "/" + first[0])
+    store.add("huc4", boundaries(("1712", 1)))
+
+    names = files(store, "huc4")
+    assert len(names) == 2 and first[0] in names
+    assert os.path.getmtime(store.path("huc4") + "/" + first[0]) == mtime
+    assert len(gpd.read_parquet(store.path("huc4") + "/" + names[1])) == 1
+
+
+def test_other_processes_see_new_parts(tmp_path):
+    writer, reader = HucStore(str(tmp_path)), HucStore(str(tmp_path))
+    writer.add("huc4", boundaries(("1711", 0)))
+    assert reader.centroid("huc4", "1711") == [0.5, 0.5]
+    writer.add("huc4", boundaries(("1712", 3), ("1711", 5)))
+    assert reader.centroid("huc4", "1712") == [3.5, 0.5]
+    assert reader.centroid("huc4", "1711") == [5.5, 0.5]
+    assert reader.find("huc4", Point(3.5, 0.5)) == ["1712"]
+
+
+def test_parts_are_compacted(tmp_path, monkeypatch):
+    monkeypatch.setattr(huc_store, "COMPACT_PARTS", 3)
+    store = HucStore(str(tmp_path))
+    for i in range(3):
+        store.add("huc4", boundaries((f"17{i:02d}", i)))
+    assert files(store, "huc4") == [BASE_FILE]
+    assert HucStore(str(tmp_path)).find("huc4", box(0, 0, 3, 1), "contains") == ["1700", "1701", "1702"]
+    assert store.bounds("huc4", "1702") == (2.0, 0.0, 3.0, 1.0)
+
+
+def test_unwritable_store_still_returns_boundaries(wbd, monkeypatch):
+    monkeypatch.delenv("CIROH_PLUGINS_HUC_STORE_DIR", raising=False)
+    monkeypatch.setenv("CIROH_PLUGINS_CACHE_DIR", "/proc/nope")
+    assert huc_store.get_huc_store() is None
+    assert utilities.get_huc_boundary("huc4", "1711").equals(box(0, 0, 1, 1))
+    assert utilities.get_centroid_huc("1711") == [0.5, 0.5]
+
+
+def test_store_failures_keep_the_fetched_boundary(wbd, monkeypatch, tmp_path):
+    monkeypatch.setenv("CIROH_PLUGINS_HUC_STORE_DIR", str(tmp_path))
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("store broke")
+
+    monkeypatch.setattr(HucStore, "get", fail)
+    monkeypatch.setattr(HucStore, "add", fail)
+    assert utilities.get_huc_boundary("huc4", "1711").equals(box(0, 0, 1, 1))
+    assert wbd.calls == 1
+
+
+def test_fetched_boundaries_are_stored(wbd, monkeypatch, tmp_path):
+    monkeypatch.setenv("CIROH_PLUGINS_HUC_STORE_DIR", str(tmp_path))
+    utilities.get_huc_boundary("huc4", "1711")
+    assert utilities.get_centroid_huc("1711") == [0.5, 0.5]
+    assert utilities.get_huc_boundary("huc4", "1711").equals(box(0, 0, 1, 1))
+    assert wbd.calls == 1
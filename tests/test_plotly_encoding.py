@@ -0,0 +1,96 @@
+import base64
+
+import numpy as np
+import pytest
+
+from ciroh_plugins.plotly_encoding import (
+    compress_time_axes,
+    encode_figure,
+    epoch_ms,
+    plotly_encoding,
+    regular_step,
+    typed_array,
+)
+
+HOURS = ["2025-01-06T00:00:00Z", "2025-01-06T01:00:00Z", "2025-01-06T02:00:00Z", "2025-01-06T03:00:00Z"]
+
+
+def decode(array):
+    return np.frombuffer(base64.b64decode(array["bdata"]), dtype=f"<{array['dtype']}")
+
+
+class Source:
+    def __init__(self, metadata=None):
+        self.metadata = metadata or {}
+
+
+def test_json_is_the_default(monkeypatch):
+    monkeypatch.delenv("CIROH_PLUGINS_PLOTLY_ENCODING", raising=False)
+    figure = {"data": [{"x": list(HOURS), "y": [1, 2, 3, 4]}], "layout": {}}
+    assert plotly_encoding(Source()) == "json"
+    assert encode_figure(figure) == {"data": [{"x": HOURS, "y": [1, 2, 3, 4]}], "layout": {}}
+    assert plotly_encoding(Source({"encoding": "compact"})) == "compact"
+
+
+def test_evenly_spaced_times_become_x0_dx():
+    figure = {"data": [{"x": list(HOURS), "y": [1, 2, 3, 4]}], "layout": {}}
+    encode_figure(figure, "compact")
+    assert figure["data"] == [{"x0": HOURS[0], "dx": 3600000, "y": [1, 2, 3, 4]}]
+    assert figure["layout"]["xaxis"]["type"] == "date"
+
+
+def test_weekly_dates_become_x0_dx():
+    traces = [{"x": ["2024-01-02", "2024-01-09", "2024-01-16"]}]
+    assert compress_time_axes(traces)
+    assert traces == [{"x0": "2024-01-02", "dx": 7 * 86400000}]
+
+
+@pytest.mark.parametrize(
+    "x",
+    [
+        HOURS[:2] + HOURS[3:],  # a gap
+        HOURS[::-1],  # descending
+        [HOURS[0], HOURS[0], HOURS[0]],  # duplicates
+        HOURS[:2],  # too short to tell
+        ["20240102", "20240103", "20240104"],  # not ISO 8601
+        [1, 2, 3],
+    ],
+)
+def test_irregular_or_non_date_axes_keep_x(x):
+    figure = {"data": [{"x": list(x), "y": [0.0] * len(x)}], "layout": {}}
+    encode_figure(figure, "compact")
+    assert figure["data"][0]["x"] == list(x)
+    assert "xaxis" not in figure["layout"]
+
+
+def test_regular_step():
+    assert regular_step(np.array([0.0, 5.0, 10.0])) == 5.0
+    assert regular_step(np.array([0.0, 5.0, 11.0])) is None
+    assert regular_step(np.array([10.0, 5.0, 0.0])) is None
+    assert regular_step(np.array([1.0, 1.0, 1.0])) is None
+
+
+def test_epoch_ms():
+    expected = [1736121600000.0, 1736125200000.0]
+    assert epoch_ms(HOURS[:2]).tolist() == expected
+    assert epoch_ms(["2025-01-06T00:00:00+00:00", "2025-01-06T02:00:00+01:00"]).tolist() == expected
+    with pytest.raises(ValueError):
+        epoch_ms(["20250106"])
+
+
+def test_typed_array_dtypes():
+    assert typed_array(np.array([1.0, 2.0, 300.0]))["dtype"] == "i4"
+    assert typed_array(np.array([46.29, 1.5]))["dtype"] == "f4"
+    assert typed_array(np.array([46.29, 1.5]), exact=True)["dtype"] == "f8"
+    assert decode(typed_array(np.array([46.29, 1.5]))).tolist() == pytest.approx([46.29, 1.5])
+
+
+def test_binary_keeps_nan_y():
+    figure = {"data": [{"x": HOURS[:2] + HOURS[3:], "y": [1.0, None, 3.0]}], "layout": {}}
+    encode_figure(figure, "binary")
+    trace = figure["data"][0]
+    y = decode(trace["y"])
+    assert trace["y"]["dtype"] in ("f4", "f8")
+    assert y[0] == 1.0 and np.isnan(y[1]) and y[2] == 3.0
+    assert decode(trace["x"]).tolist() == epoch_ms(HOURS[:2] + HOURS[3:]).tolist()
+    assert figure["layout"]["xaxis"]["type"] == "date"
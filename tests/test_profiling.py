@@ -0,0 +1,82 @@
+import glob
+import os
+import pstats
+import threading
+
+import httpx
+
+from ciroh_plugins import async_runner
+from ciroh_plugins.drought import drought_map_layer_finder
+from ciroh_plugins.drought.drought_map_layer_finder import DroughtMapLayerFinder
+from ciroh_plugins.nwmps import gauges, nwmp_map_layer_finder
+from ciroh_plugins.nwmps.gauges import NWMPSGaugesSeries
+from ciroh_plugins.nwmps.nwmp_map import NWMPMap
+from ciroh_plugins.nwmps.nwmp_map_layer_finder import LayerFinder
+
+METADATA = {
+    "lid": "PRF01",
+    "name": "Profiled gauge",
+    "flood": {"stageUnits": "ft", "flowUnits": "kcfs", "categories": {"action": {"stage": 10.0, "flow": 17.0}}},
+}
+
+
+def stageflow(issued="2025-09-30T12:00:00Z", hours=24):
+    data = [
+        {"validTime": f"2025-09-{1 + hour // 24:02d}T{hour % 24:02d}:00:00Z", "primary": 8.0 + hour / 100, "secondary": 13.0}
+        for hour in range(hours)
+    ]
+    dataset = {"issuedTime": issued, "primaryName": "Stage", "primaryUnits": "ft",
+               "secondaryName": "Flow", "secondaryUnits": "kcfs", "data": data}
+    return {"observed": dataset, "forecast": dict(dataset, data=[])}
+
+
+def fake_api(monkeypatch):
+    threads = set()
+
+    async def aget(url, **kwargs):
+        threads.add(threading.get_ident())
+        return httpx.Response(200, json=stageflow(), request=httpx.Request("GET", url))
+
+    async def metadata(api_url, id, type_feature):
+        threads.add(threading.get_ident())
+        return METADATA
+
+    monkeypatch.setattr(gauges, "http_aget", aget)
+    monkeypatch.setattr(gauges, "aget_metadata_from_api", metadata)
+    return threads
+
+
+def test_cprofile_report_covers_the_gauge_coroutines(monkeypatch, tmp_path):
+    threads = fake_api(monkeypatch)
+    monkeypatch.setenv("CIROH_PLUGINS_PROFILE_DIR", str(tmp_path))
+    figure = NWMPSGaugesSeries("PRF01", metadata={"profile": "cprofile"}).read()
+
+    assert figure["data"]
+    assert threads == {threading.get_ident()}
+    (report,) = glob.glob(os.path.join(tmp_path, "*.prof"))
+    functions = {name for _, _, name in pstats.Stats(report).stats}
+    assert {"create_traces", "aget_gauge_data", "encode_figure"} <= functions
+
+
+def test_reads_outside_the_profiler_use_the_shared_loop(monkeypatch):
+    threads = fake_api(monkeypatch)
+    NWMPSGaugesSeries("PRF02").read()
+    async_runner.get_loop()
+    assert threads == {async_runner._thread.ident}
+
+
+def test_profile_drivers_covers_the_map_drivers(monkeypatch, tmp_path):
+    layers = [{"label": "Gauges", "value": "0"}]
+    monkeypatch.setattr(nwmp_map_layer_finder, "get_layers_dropdown", lambda key: layers)
+    monkeypatch.setattr(drought_map_layer_finder, "get_layers_dropdown", lambda key: layers)
+    monkeypatch.setenv("CIROH_PLUGINS_PROFILE", "cprofile")
+    monkeypatch.setenv("CIROH_PLUGINS_PROFILE_DRIVERS", "NWMPMap, LayerFinder, DroughtMapLayerFinder")
+    monkeypatch.setenv("CIROH_PLUGINS_PROFILE_DIR", str(tmp_path))
+    service = "https://maps.water.noaa.gov/server/rest/services/nwm/ana_high_flow_magnitude/MapServer"
+
+    assert NWMPMap(service, **{"service.Layer": "0"}).read()["layers"]
+    assert LayerFinder(service).read()["variable_options_source"] == layers
+    assert DroughtMapLayerFinder(service).read()["variable_options_source"] == layers
+    assert NWMPMap(service, metadata={"timings": True}, **{"service.Layer": "0"}).read()["timings"]["total_ms"] >= 0
+    reports = sorted(os.path.basename(path).split("_")[0] for path in glob.glob(os.path.join(tmp_path, "*.prof")))
+    assert reports == ["DroughtMapLayerFinder", "LayerFinder", "NWMPMap", "NWMPMap"]
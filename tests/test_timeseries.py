@@ -0,0 +1,117 @@
+import asyncio
+import threading
+
+import httpx
+import numpy as np
+
+from ciroh_plugins.nwmps import gauges, reaches
+from ciroh_plugins.nwmps.gauges import NWMPSGaugesSeries
+from ciroh_plugins.nwmps.reaches import NWMPSReachesSeries, summarize_members
+
+
+def hourly(key, count, start=0):
+    return [{"validTime": f"2025-09-01T{hour:02d}:00:00Z", key: 100.0 + hour} for hour in range(start, start + count)]
+
+
+def gauge_payload(url):
+    dataset = {"issuedTime": "2025-09-01T12:00:00Z", "primaryName": "Stage", "primaryUnits": "ft",
+               "secondaryName": "Flow", "secondaryUnits": "kcfs", "data": []}
+    data = [dict(row, primary=row["flow"], secondary=1.0) for row in hourly("flow", 6)]
+    return {"observed": dict(dataset, data=data), "forecast": dataset}
+
+
+def reach_payload(url, params):
+    return {"shortRange": {"series": {"referenceTime": "2025-09-01T00:00:00Z", "units": "ft³/s",
+                                      "data": hourly("flow", 6)}}}
+
+
+def spy_threads(monkeypatch, cls, names):
+    """Record the threads running the ``names`` methods of ``cls``."""
+    threads = {}
+    for name in names:
+        method = getattr(cls, name)
+
+        def wrapper(*args, _name=name, _method=method, **kwargs):
+            threads.setdefault(_name, set()).add(threading.get_ident())
+            return _method(*args, **kwargs)
+
+        monkeypatch.setattr(cls, name, wrapper)
+    return threads
+
+
+def fake_api(monkeypatch, module, payload):
+    async def aget(url, params=None, **kwargs):
+        request = httpx.Request("GET", url)
+        body = payload(url) if params is None else payload(url, params)
+        return httpx.Response(200, json=body, request=request)
+
+    async def metadata(api_url, id, type_feature):
+        return {"name": f"Fake {type_feature} {id}", "flood": {}}
+
+    monkeypatch.setattr(module, "http_aget", aget)
+    monkeypatch.setattr(module, "aget_metadata_from_api", metadata)
+
+
+def test_gauge_figures_are_built_in_the_calling_thread(monkeypatch):
+    fake_api(monkeypatch, gauges, gauge_payload)
+    threads = spy_threads(monkeypatch, NWMPSGaugesSeries, ["create_figure", "create_combined_figure"])
+    assert NWMPSGaugesSeries("TST01").read()["data"]
+    assert NWMPSGaugesSeries("TST02,TST03").read()["data"]
+    assert threads == {name: {threading.get_ident()} for name in ("create_figure", "create_combined_figure")}
+
+
+def test_async_gauge_reads_build_off_the_event_loop(monkeypatch):
+    fake_api(monkeypatch, gauges, gauge_payload)
+    threads = spy_threads(monkeypatch, NWMPSGaugesSeries, ["create_figure"])
+
+    async def read():
+        return threading.get_ident(), await NWMPSGaugesSeries("TST04").read_async()
+
+    loop_thread, figure = asyncio.run(read())
+    assert figure["data"]
+    assert loop_thread not in threads["create_figure"]
+
+
+def test_reach_figures_are_built_in_the_calling_thread(monkeypatch):
+    fake_api(monkeypatch, reaches, reach_payload)
+    threads = spy_threads(monkeypatch, NWMPSReachesSeries, ["create_plotly_data"])
+    driver = NWMPSReachesSeries("23001592", products="short_range")
+    figure = driver.read()
+    assert [trace["meta"]["key"] for trace in figure["data"]] == ["short_range"]
+    assert driver.read_series("short_range")["data"]
+    assert threads == {"create_plotly_data": {threading.get_ident()}}
+
+
+def test_summarize_members_matches_nanpercentile():
+    rng = np.random.default_rng(0)
+    members = [
+        [{"validTime": f"2025-09-01T{hour:02d}:00:00Z", "flow": float(value)}
+         for hour, value in zip(range(start, 12), rng.uniform(0, 100, 12))]
+        for start in (0, 0, 2, 5, 11)
+    ]
+    members.append([{"flow": 1.0}])  # no validTime: ignored
+    times, stats = summarize_members(members)
+    assert times.tolist() == [f"2025-09-01T{hour:02d}:00:00Z" for hour in range(12)]
+
+    grid = np.full((5, 12), np.nan)
+    for row, points in zip(grid, members):
+        for point in points:
+            row[int(point["validTime"][11:13])] = point["flow"]
+    for name, q in (("min", 0), ("q25", 25), ("median", 50), ("q75", 75), ("max", 100)):
+        np.testing.assert_allclose(stats[name], np.nanpercentile(grid, q, axis=0), atol=1e-3)
+
+
+def test_summarize_members_single_point_and_missing_flows():
+    times, stats = summarize_members([
+        [{"validTime": "2025-09-01T00:00:00Z", "flow": 5.0}],
+        [{"validTime": "2025-09-01T00:00:00Z", "flow": None}],
+    ])
+    assert times.tolist() == ["2025-09-01T00:00:00Z"]
+    assert {name: values.tolist() for name, values in stats.items()} == {
+        name: [5.0] for name in ("min", "q25", "median", "q75", "max")
+    }
+
+
+def test_summarize_members_without_points():
+    assert summarize_members([]) == (None, None)
+    assert summarize_members([[], [{"flow": 1.0}]]) == (None, None)
@@ -0,0 +1,38 @@
+import asyncio
+
+import httpx
+import pytest
+
+from ciroh_plugins import transport
+
+
+@pytest.fixture
+def clients(monkeypatch):
+    """Shared clients that answer with whether they verify certificates."""
+    def client(cls, verify):
+        return cls(transport=httpx.MockTransport(lambda request: httpx.Response(200, json={"verify": verify})))
+
+    monkeypatch.setattr(transport, "INSECURE_HOSTS", frozenset({"droughtmonitor.unl.edu"}))
+    monkeypatch.setattr(transport, "_clients", {True: client(httpx.Client, True), False: client(httpx.Client, False)})
+    monkeypatch.setattr(transport, "_async_clients", transport.weakref.WeakKeyDictionary())
+    return client
+
+
+def test_certificates_are_verified_by_default():
+    assert transport._client_options()["verify"] is True
+
+
+def test_only_listed_hosts_skip_verification(clients):
+    assert transport.get("https://api.water.noaa.gov/nwps/v1/gauges/x").json() == {"verify": True}
+    assert transport.get("https://droughtmonitor.unl.edu/data/json/usdm_20240102.json").json() == {"verify": False}
+
+
+def test_async_requests_skip_verification_for_listed_hosts(clients):
+    async def fetch(url):
+        state = transport._async_state()[0]
+        state.setdefault(True, clients(httpx.AsyncClient, True))
+        state.setdefault(False, clients(httpx.AsyncClient, False))
+        return (await transport.aget(url)).json()
+
+    assert asyncio.run(fetch("https://maps.water.noaa.gov/server/rest/services")) == {"verify": True}
+    assert asyncio.run(fetch("https://droughtmonitor.unl.edu/Maps")) == {"verify": False}